@@ -0,0 +1,3 @@
+"""
+Scripts de benchmark das funções de dados do dashboard, executados sem Streamlit
+"""
@@ -0,0 +1,110 @@
+"""
+Compara a limpeza vetorizada (utils.data.clean_code) com a implementação
+anterior, linha a linha, e mede o tempo de leitura + limpeza das duas em
+datasets sintéticos de 1x, 10x e 100x o tamanho do train.csv.
+
+Uso: python -m benchmarks.clean_code [multiplicadores...]
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import BASE_ROWS, synthetic_csv
+from utils.data import CATEGORICAL_COLUMNS, clean_code, read_raw
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def legacy_clean_code(df1):
+    """
+    Implementação original da limpeza, mantida apenas como referência de
+    resultado e de tempo para a versão vetorizada
+    """
+    df = df1
+
+    select_age = df['Delivery_person_Age'] != "NaN "
+    select_rating = df['Delivery_person_Ratings'] != "NaN "
+    select_deliveries = df['multiple_deliveries'] != "NaN "
+    select_weather = df['Weatherconditions'] != "conditions NaN"
+    select_festival = df['Festival'] != "NaN "
+    select_city = df['City'] != "NaN "
+
+    df1 = df1.loc[select_age, :]
+    df1 = df1.loc[select_rating, :]
+    df1 = df1.loc[select_deliveries, :]
+    df1 = df1.loc[select_weather, :]
+    df1 = df1.loc[select_festival, :]
+    df1 = df1.loc[select_city, :].copy()
+
+    df1["Delivery_person_Age"] = df1['Delivery_person_Age'].astype(int)
+    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
+    df1['Order_Date'] = pd.to_datetime( df['Order_Date'], format='%d-%m-%Y' )
+    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split( '(min) ' )[1] )
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
+
+    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
+    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
+    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
+    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
+    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
+    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
+
+    return df1
+
+def check_equivalence(legacy, vectorized):
+    """
+    Verifica se a limpeza vetorizada gera os mesmos valores da implementação
+    original. As colunas categóricas e o ID são comparados como texto; os
+    tipos numéricos compactos (int8, float32) são comparados pelo valor
+    """
+    vectorized = vectorized.copy()
+    for col in CATEGORICAL_COLUMNS + ['ID']:
+        vectorized[col] = vectorized[col].astype(object)
+
+    pd.testing.assert_frame_equal(legacy, vectorized, check_like = True, check_dtype = False)
+
+def timed(func, *args):
+    """
+    Executa a função e retorna uma tupla (resultado, segundos)
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def run(multipliers):
+    """
+    Gera um CSV sintético para cada multiplicador, confere a equivalência das
+    duas limpezas e imprime os tempos de leitura + limpeza
+    """
+    print('{:>6} {:>10} {:>12} {:>12} {:>8}'.format('escala', 'linhas', 'original(s)', 'vetorial(s)', 'ganho'))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for multiplier in multipliers:
+            n_rows = BASE_ROWS * multiplier
+            path = synthetic_csv(os.path.join(tmp, 'train_{}x.csv'.format(multiplier)), n_rows)
+
+            legacy, t_legacy = timed(lambda: legacy_clean_code(pd.read_csv(path)))
+            vectorized, t_vectorized = timed(lambda: clean_code(read_raw(path)))
+
+            check_equivalence(legacy, vectorized)
+            del legacy, vectorized
+
+            print('{:>5}x {:>10} {:>12.2f} {:>12.2f} {:>7.1f}x'.format(
+                multiplier, n_rows, t_legacy, t_vectorized, t_legacy / t_vectorized))
+
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [1, 10, 100])
@@ -0,0 +1,128 @@
+"""
+Relatório do tempo de importação de cada página (partida a frio).
+
+Extrai as importações de nível de módulo de cada página e as executa em um
+processo Python novo com -X importtime, sem rodar a página nem carregar o
+dataset. Importações feitas dentro de funções (carregadas só quando a seção
+que as usa é desenhada) não entram na conta, que é o custo pago por toda
+sessão que abre a página.
+
+O streamlit é importado antes da marcação e fica fora da conta, pois já
+está carregado no servidor quando a página é executada (ver --preload).
+Para cada página são impressos o tempo total e os módulos de primeiro nível
+mais caros (tempo acumulado, incluindo as dependências). Com --json, o
+relatório é gravado em arquivo para acompanhar a evolução entre versões.
+
+Uso:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time pages/1_visao_empresa.py --top 5 --json import_time.json
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PAGES = ['Home.py'] + sorted(glob.glob(os.path.join(ROOT, 'pages', '*.py')))
+
+# Módulos já carregados pelo servidor do Streamlit antes de executar a página
+PRELOADED = ['streamlit']
+
+# Marca, na saída do -X importtime, o início das importações da página
+MARKER = '-- page imports --'
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def module_imports(path):
+    """
+    Retorna o código das importações de nível de módulo do arquivo
+    """
+    with open(path, encoding = 'utf-8') as f:
+        tree = ast.parse(f.read(), filename = path)
+
+    nodes = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return '\n'.join(ast.unparse(node) for node in nodes)
+
+def parse_importtime(stderr):
+    """
+    Lê a saída do -X importtime e retorna uma lista de (módulo, microssegundos
+    acumulados) dos módulos de primeiro nível importados depois da marcação,
+    na ordem de importação
+    """
+    modules = []
+    lines = stderr.splitlines()
+    for line in lines[lines.index(MARKER) + 1:]:
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Módulos de primeiro nível não têm recuo além do espaço do separador
+        if not name[1:].startswith(' '):
+            modules.append((name.strip(), int(cumulative)))
+    return modules
+
+def page_report(path, preload = PRELOADED):
+    """
+    Importa as dependências da página em um processo novo, depois dos módulos
+    de preload, e retorna um dicionário {'total_ms': ..., 'modules': {módulo: ms}}
+    """
+    code = '\n'.join(['import sys'] + ['import ' + module for module in preload] +
+                      ['sys.stderr.write({!r})'.format(MARKER + '\n'), module_imports(path)])
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd = ROOT, capture_output = True, text = True)
+    if result.returncode != 0:
+        raise RuntimeError('Falha ao importar as dependências de {}:\n{}'.format(path, result.stderr[-2000:]))
+
+    modules = parse_importtime(result.stderr)
+    return {
+        'total_ms': round(sum(us for _, us in modules) / 1000, 1),
+        'modules': {name: round(us / 1000, 1) for name, us in modules},
+    }
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Tempo de importação de cada página')
+    parser.add_argument('pages', nargs = '*', default = DEFAULT_PAGES, help = 'arquivos das páginas')
+    parser.add_argument('--top', type = int, default = 8, help = 'quantidade de módulos listados por página')
+    parser.add_argument('--json', help = 'grava o relatório neste arquivo JSON')
+    parser.add_argument('--preload', nargs = '*', default = PRELOADED,
+                        help = 'módulos importados antes da página, fora da conta')
+    args = parser.parse_args(argv)
+
+    report = {}
+    for path in args.pages:
+        name = os.path.relpath(os.path.join(ROOT, path), ROOT)
+        report[name] = page_report(os.path.join(ROOT, path), args.preload)
+
+        print('{}: {:.0f} ms'.format(name, report[name]['total_ms']))
+        ranking = sorted(report[name]['modules'].items(), key = lambda item: -item[1])
+        for module, ms in ranking[:args.top]:
+            print('  {:<30} {:>8.1f} ms'.format(module, ms))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent = 2)
+        print('Relatório gravado em', args.json)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Teste de carga da API de indicadores (utils.api).
+
+Dispara consultas concorrentes, em várias combinações de filtros, contra uma
+instância local e imprime as requisições por segundo e a latência (p50, p99)
+de cada rota. Sem --url, uma instância da API é iniciada neste processo, em
+uma porta livre, sobre o dataset informado.
+
+Uso:
+    python -m benchmarks.load_api                                  # instância própria
+    python -m benchmarks.load_api --url http://127.0.0.1:8502 --requests 5000
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from utils.api import make_server
+from utils.cube import load_cube
+from utils.data import DATASET_PATH
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+ROUTES = ['/orders/day', '/orders/week', '/orders/week-person', '/ratings?by=traffic',
+          '/ratings?by=weather', '/delivery-time/festival', '/delivery-time/city']
+
+# Combinações de filtros usadas nas consultas
+FILTERS = ['', 'date=2022-03-20', 'traffic=Low,High', 'date=2022-02-20&traffic=Jam']
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def worker(host, port, targets):
+    """
+    Executa as consultas em uma conexão persistente e retorna a lista de
+    (rota, segundos, status)
+    """
+    conn = HTTPConnection(host, port)
+    results = []
+    for route, target in targets:
+        start = time.perf_counter()
+        conn.request('GET', target)
+        response = conn.getresponse()
+        response.read()
+        results.append((route, time.perf_counter() - start, response.status))
+    conn.close()
+    return results
+
+def run(url, n_requests, concurrency):
+    """
+    Distribui n_requests consultas entre concurrency conexões e imprime o resumo.
+    Retorna a quantidade de respostas com erro
+    """
+    parts = urlsplit(url)
+    targets = []
+    for i in range(n_requests):
+        route = ROUTES[i % len(ROUTES)]
+        params = FILTERS[(i // len(ROUTES)) % len(FILTERS)]
+        separator = '&' if '?' in route else '?'
+        targets.append((route.split('?')[0], route + (separator + params if params else '')))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        chunks = [pool.submit(worker, parts.hostname, parts.port, targets[i::concurrency])
+                  for i in range(concurrency)]
+        results = [item for chunk in chunks for item in chunk.result()]
+    elapsed = time.perf_counter() - start
+
+    errors = sum(status != 200 for _, _, status in results)
+    print('{} requisições em {:.2f}s: {:.0f} req/s, {} erros'.format(len(results), elapsed, len(results) / elapsed, errors))
+    print('{:<26} {:>8} {:>10} {:>10}'.format('rota', 'n', 'p50 (ms)', 'p99 (ms)'))
+    for route in sorted({route for route, _, _ in results}):
+        latencies = np.array([seconds for name, seconds, _ in results if name == route]) * 1000
+        print('{:<26} {:>8} {:>10.2f} {:>10.2f}'.format(
+            route, len(latencies), np.percentile(latencies, 50), np.percentile(latencies, 99)))
+
+    return errors
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Teste de carga da API de indicadores')
+    parser.add_argument('--url', help = 'endereço de uma API já em execução')
+    parser.add_argument('--dataset', default = DATASET_PATH, help = 'CSV base do dataset (instância própria)')
+    parser.add_argument('--requests', type = int, default = 2000, help = 'total de requisições')
+    parser.add_argument('--concurrency', type = int, default = 8, help = 'conexões simultâneas')
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if url is None:
+        load_cube(args.dataset)
+        server = make_server(port = 0, path = args.dataset)
+        threading.Thread(target = server.serve_forever, daemon = True).start()
+        url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+    try:
+        errors = run(url, args.requests, args.concurrency)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Relatório de memória do dataframe limpo, por coluna, antes e depois do
+esquema compacto de utils.data.clean_code:
+  - antes: limpeza original (benchmarks.clean_code.legacy_clean_code), com
+    textos como objetos Python, inteiros int64 e coordenadas float64
+  - depois: prepare_data, com categorias, inteiros reduzidos, coordenadas
+    float32 e o ID em buffer do Arrow
+
+Mede o dataset informado (--dataset) ou datasets sintéticos de 1x e 10x o
+tamanho do train.csv e confere que os valores das duas versões são iguais.
+
+Uso:
+    python -m benchmarks.memory                       # sintéticos 1x e 10x
+    python -m benchmarks.memory --dataset ./datasets/train.csv
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import argparse
+import sys
+
+import pandas as pd
+
+from benchmarks.clean_code import check_equivalence, legacy_clean_code
+from benchmarks.synthetic import BASE_ROWS, synthetic_raw
+from utils.data import clean_code, raw_types
+from utils.geo import add_distance
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def memory_by_column(df):
+    """
+    Recebe como parâmetro um dataframe e retorna uma Series com os MB de cada
+    coluna, contando o conteúdo dos textos (deep = True)
+    """
+    return df.memory_usage(index = False, deep = True) / 1024 ** 2
+
+def read_raw_like(raw):
+    """
+    Converte um dataframe bruto lido sem tipos para os tipos usados por
+    read_raw (categorias, números e marcadores de ausência), como se tivesse
+    sido lido do CSV
+    """
+    return raw_types(raw)
+
+def report(raw, label):
+    """
+    Limpa o dataframe bruto das duas formas, confere os valores e imprime a
+    memória de cada coluna. Retorna a razão entre o total antes e depois
+    """
+    before = legacy_clean_code(raw.copy())
+    after = clean_code(read_raw_like(raw))
+    check_equivalence(before, after)
+
+    before, after = add_distance(before), add_distance(after)
+    mb_before, mb_after = memory_by_column(before), memory_by_column(after)
+
+    print('\n{} ({} linhas)'.format(label, len(after)))
+    print('{:<30} {:>16} {:>10} {:>18} {:>10}'.format('coluna', 'antes', 'MB', 'depois', 'MB'))
+    for col in after.columns:
+        print('{:<30} {:>16} {:>10.2f} {:>18} {:>10.2f}'.format(
+            col, str(before[col].dtype), mb_before[col], str(after[col].dtype), mb_after[col]))
+
+    ratio = mb_before.sum() / mb_after.sum()
+    print('{:<30} {:>16} {:>10.2f} {:>18} {:>10.2f}   ({:.1f}x menor)'.format(
+        'total', '', mb_before.sum(), '', mb_after.sum(), ratio))
+    return ratio
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Memória do dataframe limpo antes e depois do esquema compacto')
+    parser.add_argument('--dataset', help = 'CSV no formato do train.csv')
+    parser.add_argument('multipliers', nargs = '*', type = int, default = [1, 10],
+                        help = 'tamanhos dos datasets sintéticos, em múltiplos do train.csv')
+    args = parser.parse_args(argv)
+
+    if args.dataset:
+        report(pd.read_csv(args.dataset), args.dataset)
+    else:
+        for multiplier in args.multipliers:
+            report(synthetic_raw(BASE_ROWS * multiplier), 'sintético {}x'.format(multiplier))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
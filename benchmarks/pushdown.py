@@ -0,0 +1,96 @@
+"""
+Filtro da sidebar (data limite e tipos de trânsito) com e sem a poda de
+partições de utils.data.filter_data.
+
+Gera um CSV sintético de --multiplier vezes o train.csv, carrega com
+load_data (linhas ordenadas por dia e trânsito) e, para datas limite que
+selecionam frações crescentes do período, mede o filtro por partições e a
+máscara sobre todas as linhas (o mesmo dataset, concatenado em um único
+dataframe com Dataset.to_frame). Os dois resultados precisam ser iguais,
+ou o script termina com código 1.
+
+Uso: python -m benchmarks.pushdown [--multiplier 20] [--repeat 5]
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import BASE_ROWS, synthetic_csv
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Datas limite (fração do período de 55 dias do dataset sintético) e tipos de trânsito
+CUTOFFS = ['2022-02-13', '2022-02-17', '2022-02-25', '2022-03-05', '2022-03-20', '2022-04-07']
+TRAFFIC = [['Low', 'Medium', 'High', 'Jam'], ['Jam']]
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def best_time(func, repeat):
+    """
+    Executa a função repeat vezes e retorna uma tupla (resultado, menor tempo em segundos)
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Filtro da sidebar com e sem a poda de partições')
+    parser.add_argument('--multiplier', type = int, default = 20, help = 'tamanho em múltiplos do train.csv')
+    parser.add_argument('--repeat', type = int, default = 5, help = 'repetições de cada medida')
+    args = parser.parse_args(argv)
+
+    from utils.data import filter_data, load_data
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = synthetic_csv(os.path.join(tmp, 'train.csv'), BASE_ROWS * args.multiplier)
+        df1 = load_data(path)
+        scan = df1.to_frame()
+        partitions = sum(len(index) for index in df1.partitions if index is not None)
+        print('{} linhas, {} partições (dia x trânsito)\n'.format(len(df1), partitions))
+
+        print('{:<12} {:<24} {:>9} {:>14} {:>14} {:>8}'.format(
+            'data limite', 'trânsito', 'linhas', 'máscara (ms)', 'partições (ms)', 'ganho'))
+        for traffic_options in TRAFFIC:
+            for cutoff in CUTOFFS:
+                date_slider = pd.Timestamp(cutoff).to_pydatetime()
+                expected, t_scan = best_time(lambda: filter_data(scan, date_slider, traffic_options), args.repeat)
+                result, t_pruned = best_time(lambda: filter_data(df1, date_slider, traffic_options), args.repeat)
+
+                try:
+                    pd.testing.assert_frame_equal(expected, result)
+                    status = ''
+                except AssertionError:
+                    failures += 1
+                    status = '  DIFERENTE'
+
+                print('{:<12} {:<24} {:>8.1%} {:>14.2f} {:>14.2f} {:>7.1f}x{}'.format(
+                    cutoff, ','.join(traffic_options), len(result) / len(df1),
+                    t_scan * 1000, t_pruned * 1000, t_scan / t_pruned, status))
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
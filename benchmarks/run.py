@@ -0,0 +1,238 @@
+"""
+Benchmark das funções de dados das páginas, sem Streamlit.
+
+Gera dados sintéticos no esquema do Kaggle em cada tamanho pedido, executa
+as funções usadas por cada página e mede o tempo e o pico de memória de
+cada uma. Os resultados podem ser gravados como baseline e comparados com
+execuções seguintes: uma função mais lenta que o baseline além do limite
+(--threshold) é reportada como regressão e o script termina com código 1.
+Sem baseline (arquivo ausente ou sem o tamanho pedido), não há com o que
+comparar e o script termina com código 2.
+
+O baseline.json versionado registra a máquina e o dataset em que foi
+medido (chave '_machine'); tempos de outra máquina não são comparáveis, e
+a diferença é avisada. Sem --sizes, a comparação usa os tamanhos do baseline.
+
+Uso:
+    python -m benchmarks.run                         # tamanhos do baseline
+    python -m benchmarks.run --sizes 45593 1000000
+    python -m benchmarks.run --save-baseline         # 45k, 1M e 10M linhas
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import BASE_ROWS, synthetic_raw
+from utils.cube import Cube, build_cube, filter_cube
+from utils.data import clean_code, filter_data, raw_types
+from utils.geo import add_distance, bin_locations
+from utils.metrics import (avg_distance, festival_mean, orders_by_week_person,
+                           rank_delivers, rating_avg_std, rating_by_deliver, time_avg_std,
+                           top_deliver)
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+DEFAULT_SIZES = [BASE_ROWS, 1_000_000, 10_000_000]
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Chave do baseline com a máquina e o dataset da medição
+MACHINE_KEY = '_machine'
+
+# Filtros padrão da sidebar
+DATE_SLIDER = datetime(2022, 3, 5)
+TRAFFIC_OPTIONS = ['Low', 'Medium', 'High', 'Jam']
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def _clear_stats(args):
+    """
+    Descarta as estatísticas já calculadas (stats_cache) dos cubos recebidos
+    como argumento, para que cada execução medida refaça o cálculo em vez de
+    reaproveitar o da execução anterior ou de outra função
+    """
+    for arg in args:
+        if isinstance(arg, Cube):
+            arg.stats_cache.clear()
+
+def measure(func, *args, memory = True):
+    """
+    Executa a função e retorna (resultado, segundos, pico de memória em MB).
+    O tempo é medido sem o tracemalloc; o pico de memória, em uma segunda
+    execução com o tracemalloc ligado. As duas execuções partem de cubos sem
+    estatísticas calculadas (ver _clear_stats)
+    """
+    _clear_stats(args)
+    gc.collect()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+
+    peak_mb = None
+    if memory:
+        del result
+        _clear_stats(args)
+        gc.collect()
+        tracemalloc.start()
+        result = func(*args)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+
+    return result, seconds, peak_mb
+
+def page_functions(df1, cube):
+    """
+    Lista (página, nome, função, argumentos) das funções de dados de cada página
+    """
+    return [
+        ('empresa', 'filter_data', filter_data, (df1, DATE_SLIDER, TRAFFIC_OPTIONS)),
+        ('empresa', 'filter_cube', filter_cube, (cube, DATE_SLIDER, TRAFFIC_OPTIONS)),
+        ('empresa', 'orders_by_week_person', orders_by_week_person, (cube,)),
+        ('empresa', 'bin_locations', bin_locations, (df1,)),
+        ('entregadores', 'top_deliver', top_deliver, (df1, True)),
+        ('entregadores', 'rank_delivers_p90', rank_delivers, (df1, 10, 'p90')),
+        ('entregadores', 'rating_by_deliver', rating_by_deliver, (df1,)),
+        ('entregadores', 'rating_avg_std', rating_avg_std, (cube, 'Road_traffic_density')),
+        ('restaurantes', 'distance', avg_distance, (cube, ['City'])),
+        ('restaurantes', 'festival_mean', festival_mean, (cube, 'Yes')),
+        ('restaurantes', 'time_avg_std', time_avg_std, (cube, ['City', 'Type_of_order'])),
+    ]
+
+def run_size(n_rows, memory = True):
+    """
+    Executa o benchmark para um tamanho de dataset e retorna um dicionário
+    {função: {'seconds': ..., 'peak_mb': ...}}
+    """
+    results = {}
+
+    def record(page, name, func, *args):
+        result, seconds, peak_mb = measure(func, *args, memory = memory)
+        results['{}.{}'.format(page, name)] = {'seconds': round(seconds, 6), 'peak_mb': peak_mb and round(peak_mb, 2)}
+        print('  {:<40} {:>10.4f}s {:>10} MB'.format(
+            '{}.{}'.format(page, name), seconds, '-' if peak_mb is None else '{:.1f}'.format(peak_mb)))
+        return result
+
+    # Com os tipos de read_raw, como o CSV lido pelas páginas
+    raw = raw_types(synthetic_raw(n_rows))
+    df1 = record('dados', 'clean_code', clean_code, raw)
+    del raw
+    df1 = record('dados', 'add_distance', add_distance, df1)
+    cube = record('dados', 'build_cube', build_cube, df1)
+
+    for page, name, func, args in page_functions(df1, cube):
+        record(page, name, func, *args)
+
+    return results
+
+def machine_info():
+    """
+    Descrição da máquina e do dataset em que o benchmark foi executado,
+    gravada junto com o baseline
+    """
+    cpu = platform.processor()
+    if os.path.exists('/proc/cpuinfo'):
+        with open('/proc/cpuinfo') as f:
+            cpu = next((line.split(':', 1)[1].strip() for line in f if line.startswith('model name')), cpu)
+    return {
+        'platform': platform.platform(),
+        'cpu': cpu,
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'dataset': 'benchmarks.synthetic.synthetic_raw (seed 42), tipos de read_raw',
+        'recorded': datetime.now().strftime('%Y-%m-%d'),
+    }
+
+def compare(results, baseline, threshold):
+    """
+    Compara os tempos com o baseline e retorna a lista de regressões
+    (tamanho, função, segundos do baseline, segundos atuais)
+    """
+    regressions = []
+    for size, functions in results.items():
+        for name, current in functions.items():
+            reference = baseline.get(size, {}).get(name)
+            if reference and current['seconds'] > reference['seconds'] * (1 + threshold):
+                regressions.append((size, name, reference['seconds'], current['seconds']))
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmark das funções de dados do dashboard')
+    parser.add_argument('--sizes', type = int, nargs = '+',
+                        help = 'quantidades de linhas do dataset sintético (padrão: as do baseline; '
+                               'ao gravar o baseline, 45k, 1M e 10M)')
+    parser.add_argument('--baseline', default = BASELINE_PATH, help = 'arquivo JSON do baseline')
+    parser.add_argument('--save-baseline', action = 'store_true', help = 'grava os resultados como baseline')
+    parser.add_argument('--threshold', type = float, default = 0.2,
+                        help = 'aumento relativo de tempo considerado regressão (0.2 = 20%%)')
+    parser.add_argument('--no-memory', action = 'store_true', help = 'não mede o pico de memória')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if not args.save_baseline:
+        if not os.path.exists(args.baseline):
+            print('ERRO: sem baseline para comparar ({}); grave um com --save-baseline'.format(args.baseline),
+                  file = sys.stderr)
+            return 2
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        sizes = args.sizes or [int(size) for size in baseline if size != MACHINE_KEY]
+        missing = [n_rows for n_rows in sizes if str(n_rows) not in baseline]
+        if missing:
+            print('ERRO: o baseline {} não tem os tamanhos {}'.format(args.baseline, missing), file = sys.stderr)
+            return 2
+
+        machine, recorded = machine_info(), baseline.get(MACHINE_KEY, {})
+        for key in ['cpu', 'cpus', 'python', 'pandas', 'numpy']:
+            if recorded.get(key) != machine[key]:
+                print('AVISO: baseline medido com {} = {}, esta execução com {}'.format(
+                    key, recorded.get(key), machine[key]))
+    else:
+        sizes = args.sizes or DEFAULT_SIZES
+
+    results = {}
+    for n_rows in sizes:
+        print('{} linhas'.format(n_rows))
+        results[str(n_rows)] = run_size(n_rows, memory = not args.no_memory)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(dict(results, **{MACHINE_KEY: machine_info()}), f, indent = 2)
+        print('Baseline gravado em', args.baseline)
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for size, name, before, after in regressions:
+        print('REGRESSÃO {} linhas {}: {:.4f}s -> {:.4f}s'.format(size, name, before, after))
+    if not regressions:
+        print('Sem regressões acima de {:.0%}'.format(args.threshold))
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Leitura local da telemetria (utils.telemetry).
+
+Lê o endpoint /metrics no formato texto do Prometheus e imprime os principais
+números: latência por página (média e p90 estimado pelos baldes), tempo de
+carregamento, taxa de acerto do cache, linhas lidas por execução e memória.
+Sem --url, uma instância da API é iniciada neste processo, recebe algumas
+consultas e tem a própria telemetria lida, o que confere o formato de ponta
+a ponta sem nenhum serviço externo.
+
+Uso:
+    python -m benchmarks.scrape_metrics                                 # instância própria
+    python -m benchmarks.scrape_metrics --url http://127.0.0.1:9464/metrics
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import argparse
+import re
+import sys
+import threading
+from collections import defaultdict
+from urllib.request import urlopen
+
+from utils.api import make_server
+from utils.data import DATASET_PATH
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Consultas feitas à instância própria antes da leitura
+QUERIES = ['/orders/day', '/orders/week', '/ratings?by=traffic', '/orders/day',
+           '/delivery-time/city?traffic=Low,High', '/delivery-time/city?traffic=Low,High']
+
+_LINE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def parse_metrics(text):
+    """
+    Recebe como parâmetro o texto do /metrics e retorna uma lista de
+    (nome, rótulos, valor). Linhas de comentário são ignoradas
+    """
+    samples = []
+    for line in text.splitlines():
+        match = _LINE.match(line)
+        if match is None or line.startswith('#'):
+            continue
+        name, labels, value = match.groups()
+        samples.append((name, dict(_LABEL.findall(labels or '')), float(value)))
+    return samples
+
+def histogram_summary(samples, name, label):
+    """
+    Agrupa o histograma name pelo rótulo label e retorna um dicionário
+    valor do rótulo -> (execuções, média, p90 pelo limite do balde)
+    """
+    buckets = defaultdict(list)
+    totals = defaultdict(dict)
+    for metric, labels, value in samples:
+        key = labels.get(label, '')
+        if metric == name + '_bucket':
+            buckets[key].append((float(labels['le']), value))
+        elif metric in (name + '_sum', name + '_count'):
+            totals[key][metric[len(name) + 1:]] = value
+
+    summary = {}
+    for key, values in totals.items():
+        count = values.get('count', 0)
+        if not count:
+            continue
+        p90 = next((bound for bound, cumulative in sorted(buckets[key]) if cumulative >= 0.9 * count), float('inf'))
+        summary[key] = (int(count), values['sum'] / count, p90)
+    return summary
+
+def report(text):
+    """
+    Imprime o resumo da telemetria e retorna a quantidade de métricas
+    esperadas que não foram encontradas
+    """
+    samples = parse_metrics(text)
+    values = {name: value for name, labels, value in samples if not labels}
+
+    print('{:<22} {:>6} {:>12} {:>12}'.format('página', 'n', 'média (ms)', 'p90 (ms) <='))
+    for page, (count, mean, p90) in sorted(histogram_summary(samples, 'curry_page_run_seconds', 'page').items()):
+        print('{:<22} {:>6} {:>12.2f} {:>12}'.format(page, count, mean * 1000, '{:g}'.format(p90 * 1000)))
+
+    print('\n{:<22} {:>6} {:>16}'.format('página', 'n', 'linhas/execução'))
+    for page, (count, mean, _) in sorted(histogram_summary(samples, 'curry_page_rows_scanned', 'page').items()):
+        print('{:<22} {:>6} {:>16.0f}'.format(page, count, mean))
+
+    print('\n{:<22} {:>6} {:>12}'.format('carregamento', 'n', 'média (ms)'))
+    for name, label in [('curry_data_load_seconds', 'source'), ('curry_cube_build_seconds', 'mode')]:
+        for key, (count, mean, _) in sorted(histogram_summary(samples, name, label).items()):
+            print('{:<22} {:>6} {:>12.2f}'.format('{} ({})'.format(name.split('_')[1], key), count, mean * 1000))
+
+    print()
+    expected = ['curry_cache_hit_ratio', 'curry_cache_hits_total', 'curry_cache_misses_total',
+                'curry_process_resident_memory_mb', 'curry_process_peak_resident_memory_mb']
+    for name in expected:
+        print('{:<40} {}'.format(name, values.get(name, 'ausente')))
+
+    return sum(name not in values for name in expected)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Resumo da telemetria do dashboard')
+    parser.add_argument('--url', help = 'endpoint /metrics de um processo em execução')
+    parser.add_argument('--dataset', default = DATASET_PATH, help = 'CSV base do dataset (instância própria)')
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if url is None:
+        server = make_server(port = 0, path = args.dataset)
+        threading.Thread(target = server.serve_forever, daemon = True).start()
+        base = 'http://127.0.0.1:{}'.format(server.server_address[1])
+        for query in QUERIES:
+            urlopen(base + query).read()
+        url = base + '/metrics'
+
+    try:
+        with urlopen(url) as response:
+            text = response.read().decode('utf-8')
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    return 1 if report(text) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
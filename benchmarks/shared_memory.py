@@ -0,0 +1,130 @@
+"""
+Memória do dataset com vários processos na mesma máquina (somente Linux).
+
+Gera um dataset sintético, prepara o arquivo colunar e inicia N processos
+que carregam o dataframe com utils.data.load_data e percorrem as colunas,
+como os servidores do Streamlit e a API. Com todos os processos vivos, lê
+o /proc/<pid>/smaps_rollup de cada um e imprime o aumento de memória após o
+carregamento: RSS, memória anônima (privada do processo) e PSS (memória
+compartilhada dividida entre os processos que a usam). A soma do PSS é a
+memória que o dataset ocupa na máquina.
+
+Cada tamanho é medido nos dois modos de utils.data: compartilhado (arquivo
+mapeado em memória, padrão) e CURRY_SHARED_DATASET=0 (uma cópia por processo).
+Com --batches, lotes incrementais são ingeridos antes da medição, como na
+operação diária: os lotes também são mapeados, e não copiados.
+
+Uso: python -m benchmarks.shared_memory [--workers 4] [--multiplier 20] [--batches 2]
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import BASE_ROWS, synthetic_csv
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def smaps(pid = 'self'):
+    """
+    Retorna um dicionário com os campos Rss, Pss e Anonymous (em MB) do
+    /proc/<pid>/smaps_rollup
+    """
+    values = {}
+    with open('/proc/{}/smaps_rollup'.format(pid)) as f:
+        for line in f:
+            parts = line.split()
+            if parts[0].rstrip(':') in ('Rss', 'Pss', 'Anonymous'):
+                values[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return values
+
+def worker(path):
+    """
+    Processo de teste: informa a memória após as importações, carrega e
+    percorre o dataset, avisa que está pronto e espera o fim da medição
+    """
+    from utils.data import load_data
+
+    before = smaps()
+    for df1 in load_data(path).segments:
+        for col in df1.columns:
+            serie = df1[col]
+            if serie.dtype == 'category':
+                serie.cat.codes.max()
+            elif serie.dtype == 'string':
+                serie.str.len().max()
+            else:
+                serie.max()
+
+    print('{Rss} {Pss} {Anonymous}'.format(**before), flush = True)
+    sys.stdin.read()
+
+def measure(path, n_workers, shared):
+    """
+    Inicia n_workers processos no modo informado e retorna a lista com o
+    aumento de (Rss, Pss, Anonymous) de cada um, medido com todos vivos
+    """
+    env = dict(os.environ, CURRY_SHARED_DATASET = '1' if shared else '0')
+    processes = [subprocess.Popen([sys.executable, '-m', 'benchmarks.shared_memory', '--worker', path],
+                                  stdin = subprocess.PIPE, stdout = subprocess.PIPE, env = env, text = True)
+                 for _ in range(n_workers)]
+    try:
+        before = [[float(value) for value in p.stdout.readline().split()] for p in processes]
+        after = [smaps(p.pid) for p in processes]
+    finally:
+        for p in processes:
+            p.stdin.close()
+            p.wait()
+
+    return [(a['Rss'] - b[0], a['Pss'] - b[1], a['Anonymous'] - b[2]) for a, b in zip(after, before)]
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Memória do dataset com vários processos')
+    parser.add_argument('--workers', type = int, default = 4, help = 'processos simultâneos')
+    parser.add_argument('--multiplier', type = int, default = 20, help = 'tamanho em múltiplos do train.csv')
+    parser.add_argument('--batches', type = int, default = 2, help = 'lotes incrementais ingeridos antes da medição')
+    parser.add_argument('--worker', help = argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(args.worker)
+        return 0
+
+    from utils.data import load_data
+    from utils.ingest import incoming_dir, ingest_batches
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = synthetic_csv(os.path.join(tmp, 'train.csv'), BASE_ROWS * args.multiplier)
+        load_data(path)
+        os.makedirs(incoming_dir(path))
+        for seed in range(args.batches):
+            synthetic_csv(os.path.join(incoming_dir(path), 'lote-{:03d}.csv'.format(seed)), BASE_ROWS // 10, seed)
+        ingest_batches(path)
+        dataset = load_data(path)
+        size = sum(df1.memory_usage(deep = True).sum() for df1 in dataset.segments) / 1024 ** 2
+        print('{} linhas, {:.1f} MB por cópia do dataframe, {} processos'.format(len(dataset), size, args.workers))
+        del dataset
+
+        print('{:<16} {:>14} {:>14} {:>14} {:>16}'.format('modo', 'RSS/proc (MB)', 'anônima/proc', 'PSS/proc', 'PSS total (MB)'))
+        for shared in (False, True):
+            deltas = measure(path, args.workers, shared)
+            rss, pss, anon = [sum(values) / len(deltas) for values in zip(*deltas)]
+            print('{:<16} {:>14.1f} {:>14.1f} {:>14.1f} {:>16.1f}'.format(
+                'compartilhado' if shared else 'cópia', rss, anon, pss, pss * len(deltas)))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
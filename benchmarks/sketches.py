@@ -0,0 +1,123 @@
+"""
+Confere a precisão dos sketches do cubo contra os valores exatos calculados
+sobre as linhas, em datasets sintéticos de 1x e 10x o tamanho do train.csv:
+  - entregadores distintos (HyperLogLog): total, por semana e por cidade,
+    com erro relativo de no máximo 3 erros padrão (1,04 / sqrt(2^precisão))
+  - percentis do tempo de entrega (histogramas): p50, p90 e p99 por cidade e
+    por cidade e trânsito, que devem ser iguais aos do pandas para tempos
+    inteiros, e com erro de no máximo 0,5 minuto para tempos fracionários
+
+O script termina com código 1 se algum limite for ultrapassado.
+
+Uso: python -m benchmarks.sketches [multiplicadores...]
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.synthetic import BASE_ROWS, synthetic_raw
+from utils.cube import build_cube, distinct_count, filter_cube
+from utils.data import filter_data, prepare_data, raw_types
+from utils.metrics import time_percentiles
+from utils.sketches import HLL_PRECISION, hist_counts, hist_quantile
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Limite de erro relativo do HyperLogLog: 3 erros padrão
+HLL_MAX_ERROR = 3 * 1.04 / np.sqrt(1 << HLL_PRECISION)
+
+# Filtro usado para conferir que os sketches combinam corretamente
+DATE_SLIDER = datetime(2022, 3, 5)
+TRAFFIC_OPTIONS = ['Low', 'High', 'Jam']
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def check_distinct(cube, df1):
+    """
+    Retorna o maior erro relativo das estimativas de entregadores distintos
+    (total, por semana e por cidade)
+    """
+    errors = [abs(distinct_count(cube) / df1['Delivery_person_ID'].nunique() - 1)]
+
+    weeks = df1.groupby(df1['Order_Date'].dt.strftime('%U'))['Delivery_person_ID'].nunique()
+    estimate = distinct_count(cube, 'week_of_year').set_index('week_of_year')['distinct']
+    errors += list((estimate / weeks - 1).abs())
+
+    cities = df1.groupby('City', observed = True)['Delivery_person_ID'].nunique()
+    estimate = distinct_count(cube, 'City').set_index('City')['distinct']
+    errors += list((estimate / cities - 1).abs())
+
+    return max(errors)
+
+def check_percentiles(cube, df1, dims):
+    """
+    Retorna a maior diferença, em minutos, entre os percentis do cubo e os
+    percentis exatos por dimensões
+    """
+    sketch = time_percentiles(cube, dims, QUANTILES).set_index(dims).sort_index()
+    exact = ( df1.groupby(dims, observed = True)['Time_taken(min)']
+                 .quantile(list(QUANTILES))
+                 .unstack() )
+    exact.columns = ['p{:g}'.format(q * 100) for q in exact.columns]
+
+    return float(np.nanmax(np.abs(sketch.to_numpy() - exact.loc[sketch.index, sketch.columns].to_numpy())))
+
+def check_fractional(n_values = 100_000, seed = 42):
+    """
+    Retorna a maior diferença, em minutos, entre os percentis do histograma e
+    os exatos para tempos fracionários
+    """
+    values = np.random.default_rng(seed).gamma(4.0, 7.0, n_values)
+    counts = hist_counts(values, np.zeros(n_values, dtype = np.int64), 1)[0]
+    return max(abs(hist_quantile(counts, q) - np.quantile(values, q)) for q in QUANTILES)
+
+def run(multipliers):
+    """
+    Confere os sketches em cada tamanho, com e sem filtro, e retorna True
+    quando todos os limites são respeitados
+    """
+    ok = True
+    print('{:>6} {:>10} {:>8} {:>14} {:>16}'.format('escala', 'linhas', 'filtro', 'erro distintos', 'erro percentis'))
+
+    for multiplier in multipliers:
+        df1 = prepare_data(raw_types(synthetic_raw(BASE_ROWS * multiplier)))
+        cube = build_cube(df1)
+
+        for label, rows, sketches in [('não', df1, cube),
+                                      ('sim', filter_data(df1, DATE_SLIDER, TRAFFIC_OPTIONS),
+                                       filter_cube(cube, DATE_SLIDER, TRAFFIC_OPTIONS))]:
+            distinct_error = check_distinct(sketches, rows)
+            percentile_error = max(check_percentiles(sketches, rows, ['City']),
+                                   check_percentiles(sketches, rows, ['City', 'Road_traffic_density']))
+            ok = ok and distinct_error <= HLL_MAX_ERROR and percentile_error == 0
+
+            print('{:>5}x {:>10} {:>8} {:>13.2%} {:>12.2f} min'.format(
+                multiplier, len(rows), label, distinct_error, percentile_error))
+
+    fractional_error = check_fractional()
+    ok = ok and fractional_error <= 0.5
+    print('Percentis de tempos fracionários: erro máximo {:.2f} min'.format(fractional_error))
+    print('Limite do HyperLogLog: {:.2%}'.format(HLL_MAX_ERROR))
+
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run([int(arg) for arg in sys.argv[1:]] or [1, 10]) else 1)
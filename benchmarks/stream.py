@@ -0,0 +1,177 @@
+"""
+Leitura em blocos (utils.stream) de um dataset maior que o orçamento de memória.
+
+1. Equivalência: um dataset sintético do tamanho do train.csv é processado
+   em blocos pequenos, e o cubo resultante (células, HyperLogLog e
+   histogramas) e as linhas do armazenamento particionado são comparados
+   com os da leitura completa (prepare_data + build_cube). A leitura de uma
+   só partição é comparada com o filtro do dataframe completo.
+2. Memória: um CSV sintético de --multiplier vezes o train.csv, gravado em
+   partes, é processado em um processo separado com o orçamento --budget. O
+   aumento do pico de memória (VmHWM) do processo precisa ficar dentro
+   do orçamento, mesmo com o dataframe bruto completo sendo várias vezes maior.
+
+Termina com código 1 se alguma das verificações falhar.
+
+Somente Linux (lê /proc/self/status).
+
+Uso: python -m benchmarks.stream [--budget 96] [--multiplier 20]
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import BASE_ROWS, synthetic_csv, synthetic_raw
+from utils.cube import DIMENSIONS, SKETCH_DIMENSIONS, build_cube
+from utils.data import CATEGORICAL_COLUMNS, prepare_data, read_raw
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def peak_mb():
+    """
+    Pico de memória residente do processo, em MB (VmHWM de /proc/self/status,
+    somente Linux). O ru_maxrss não serve aqui: após o exec, o processo
+    filho herda o pico do processo que o iniciou
+    """
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+
+def as_plain(df, keys):
+    """
+    Converte as colunas categóricas em texto e ordena pelas chaves, para
+    comparar dataframes com categorias e ordens de linhas diferentes
+    """
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype) or df[col].dtype == 'string':
+            df[col] = df[col].astype(object)
+    return df.sort_values(keys).reset_index(drop = True)
+
+def sketches_by_key(cube):
+    """
+    Registradores do HyperLogLog e histogramas do cubo em um dicionário
+    chave (dia, trânsito, cidade) -> (registradores, histograma)
+    """
+    keys = cube.sketch_keys.loc[:, SKETCH_DIMENSIONS].astype(object).itertuples(index = False, name = None)
+    return {key: (cube.distinct_registers[i], cube.histograms['Time_taken(min)'][i]) for i, key in enumerate(keys)}
+
+def check_equivalence(tmp):
+    """
+    Processa um dataset sintético em blocos e compara com a leitura completa.
+    Retorna a quantidade de diferenças encontradas
+    """
+    from utils.stream import read_partitions, stream_dataset
+
+    path = synthetic_csv(os.path.join(tmp, 'train.csv'), BASE_ROWS)
+    full = prepare_data(read_raw(path))
+    full_cube = build_cube(full)
+    cube, manifest = stream_dataset(path, chunk_rows = 5000)
+
+    failures = 0
+    checks = [
+        ('células do cubo', lambda: pd.testing.assert_frame_equal(
+            as_plain(full_cube.cells, DIMENSIONS), as_plain(cube.cells, DIMENSIONS), check_dtype = False)),
+        ('linhas do armazenamento', lambda: pd.testing.assert_frame_equal(
+            as_plain(full, ['ID']), as_plain(read_partitions(path), ['ID']), check_dtype = False)),
+        ('partição 2022-03 / Urban', lambda: pd.testing.assert_frame_equal(
+            as_plain(full[(full['Order_Date'].dt.strftime('%Y-%m') == '2022-03') & (full['City'] == 'Urban')], ['ID']),
+            as_plain(read_partitions(path, months = ['2022-03'], cities = ['Urban']), ['ID']), check_dtype = False)),
+    ]
+    for label, check in checks:
+        try:
+            check()
+            print('{:<28} ok'.format(label))
+        except AssertionError as error:
+            failures += 1
+            print('{:<28} DIFERENTE\n{}'.format(label, error))
+
+    expected, streamed = sketches_by_key(full_cube), sketches_by_key(cube)
+    same = expected.keys() == streamed.keys() and all(
+        np.array_equal(expected[key][0], streamed[key][0]) and np.array_equal(expected[key][1], streamed[key][1])
+        for key in expected)
+    failures += not same
+    print('{:<28} {}'.format('sketches do cubo', 'ok' if same else 'DIFERENTE'))
+    print('{} linhas em {} blocos de 5000, {} partições'.format(
+        manifest['rows'], -(-BASE_ROWS // 5000), len(manifest['partitions'])))
+
+    return failures
+
+def write_large_csv(path, n_rows, piece_rows = BASE_ROWS):
+    """
+    Grava um CSV sintético de n_rows linhas em partes de piece_rows, sem
+    manter o arquivo inteiro na memória. Cada parte usa uma semente diferente
+    """
+    written = 0
+    for seed in range(-(-n_rows // piece_rows)):
+        piece = synthetic_raw(min(piece_rows, n_rows - written), seed = seed)
+        piece['ID'] = ['0x{:06x} '.format(written + i) for i in range(len(piece))]
+        piece.to_csv(path, mode = 'a' if seed else 'w', header = not seed, index = False)
+        written += len(piece)
+    return path
+
+def worker(path, budget):
+    """
+    Processo de medição: processa o CSV em blocos e imprime o pico de memória
+    antes e depois, as linhas processadas e o tamanho do bloco
+    """
+    from utils.stream import stream_dataset
+
+    before = peak_mb()
+    cube, manifest = stream_dataset(path, budget)
+    print(before, peak_mb(), manifest['rows'], manifest['chunk_rows'], len(manifest['partitions']))
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Leitura em blocos de um dataset maior que o orçamento de memória')
+    parser.add_argument('--budget', type = float, default = 96, help = 'orçamento de memória em MB')
+    parser.add_argument('--multiplier', type = int, default = 20, help = 'tamanho em múltiplos do train.csv')
+    parser.add_argument('--worker', nargs = 2, help = argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(args.worker[0], float(args.worker[1]))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        failures = check_equivalence(tmp)
+
+        path = write_large_csv(os.path.join(tmp, 'large.csv'), BASE_ROWS * args.multiplier)
+        sample = read_raw(path, nrows = 10000)
+        sample[CATEGORICAL_COLUMNS] = sample[CATEGORICAL_COLUMNS].astype(object)
+        n_rows = BASE_ROWS * args.multiplier
+        in_memory = sample.memory_usage(index = False, deep = True).sum() / len(sample) * n_rows / 1024 ** 2
+
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.stream', '--worker', path, str(args.budget)],
+                                capture_output = True, text = True, check = True).stdout
+        before, after, rows, chunk_rows, partitions = output.split()
+        growth = float(after) - float(before)
+
+        print('\nCSV: {} linhas, {:.0f} MB em disco, ~{:.0f} MB em memória lido de uma vez ({:.1f}x o orçamento)'.format(
+            n_rows, os.path.getsize(path) / 1024 ** 2, in_memory, in_memory / args.budget))
+        print('blocos de {} linhas, {} linhas limpas, {} partições'.format(chunk_rows, rows, partitions))
+        print('aumento do pico de memória: {:.1f} MB (orçamento {:.0f} MB)'.format(growth, args.budget))
+        if growth > args.budget:
+            failures += 1
+            print('ACIMA DO ORÇAMENTO')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import numpy as np
+import pandas as pd
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Quantidade de linhas do dataset original do Kaggle (train.csv)
+BASE_ROWS = 45593
+
+CITIES = ['Metropolitian ', 'Urban ', 'Semi-Urban ']
+TRAFFIC = ['Low ', 'Medium ', 'High ', 'Jam ']
+WEATHER = ['Sunny', 'Stormy', 'Sandstorms', 'Cloudy', 'Fog', 'Windy']
+ORDERS = ['Snack ', 'Meal ', 'Drinks ', 'Buffet ']
+VEHICLES = ['motorcycle ', 'scooter ', 'electric_scooter ', 'bicycle ']
+REGIONS = ['INDO', 'BANG', 'MYS', 'SUR', 'HYD', 'CHEN', 'RANCHI', 'MUM',
+           'JAP', 'PUNE', 'KOC', 'LUDH', 'KNP', 'AGR', 'ALH', 'DEH',
+           'KOL', 'AURG', 'VAD', 'BHP', 'GOA', 'COIMB']
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def _with_nan(rng, values, rate, nan_value = 'NaN '):
+    """
+    Substitui aleatoriamente uma fração (rate) dos valores pelo texto de NaN
+    usado no dataset original
+    """
+    values = values.astype(object)
+    values[rng.random(len(values)) < rate] = nan_value
+    return values
+
+def synthetic_raw(n_rows = BASE_ROWS, seed = 42, start = '2022-02-11', days = 55):
+    """
+    Recebe como parâmetro a quantidade de linhas e retorna um dataframe bruto
+    com o mesmo esquema e a mesma sujeira do train.csv do Kaggle (espaços no
+    final dos textos, 'NaN ' como texto, '(min) ' na coluna de tempo).
+    A quantidade de entregadores e restaurantes cresce com o número de linhas
+    """
+    rng = np.random.default_rng(seed)
+    scale = max(1, n_rows // BASE_ROWS)
+
+    # Entregadores: ~1300 por 45 mil pedidos, no formato 'INDORES13DEL02 '
+    n_people = 1320 * scale
+    people = np.array([
+        '{}RES{:02d}DEL{:02d} '.format(REGIONS[i % len(REGIONS)], (i // len(REGIONS)) % 20 + 1, i // (len(REGIONS) * 20) + 1)
+        for i in range(n_people)
+    ], dtype = object)
+
+    # Restaurantes espalhados pelas regiões, com entregas em um raio pequeno
+    n_restaurants = 400 * scale
+    rest_lat = rng.uniform(9.0, 31.0, n_restaurants).round(6)
+    rest_lon = rng.uniform(72.0, 89.0, n_restaurants).round(6)
+    restaurant = rng.integers(0, n_restaurants, n_rows)
+
+    dates = pd.date_range(start, periods = days).strftime('%d-%m-%Y').to_numpy(dtype = object)
+
+    df = pd.DataFrame({
+        'ID': ['0x{:04x} '.format(i) for i in range(n_rows)],
+        'Delivery_person_ID': people[rng.integers(0, n_people, n_rows)],
+        'Delivery_person_Age': _with_nan(rng, rng.integers(20, 40, n_rows).astype(str), 0.04),
+        'Delivery_person_Ratings': _with_nan(rng, rng.integers(25, 51, n_rows).astype(str), 0.04),
+        'Restaurant_latitude': rest_lat[restaurant],
+        'Restaurant_longitude': rest_lon[restaurant],
+        'Delivery_location_latitude': (rest_lat[restaurant] + rng.uniform(-0.1, 0.1, n_rows)).round(6),
+        'Delivery_location_longitude': (rest_lon[restaurant] + rng.uniform(-0.1, 0.1, n_rows)).round(6),
+        'Order_Date': dates[rng.integers(0, days, n_rows)],
+        'Time_Orderd': _with_nan(rng, np.array(['{:02d}:{:02d}:00'.format(h, m) for h, m in
+                                                 zip(rng.integers(8, 24, n_rows), rng.integers(0, 60, n_rows))]), 0.04),
+        'Time_Order_picked': np.array(['{:02d}:{:02d}:00'.format(h, m) for h, m in
+                                        zip(rng.integers(8, 24, n_rows), rng.integers(0, 60, n_rows))], dtype = object),
+        'Weatherconditions': _with_nan(rng, np.char.add('conditions ', rng.choice(WEATHER, n_rows)), 0.01, 'conditions NaN'),
+        'Road_traffic_density': _with_nan(rng, rng.choice(TRAFFIC, n_rows), 0.01),
+        'Vehicle_condition': rng.integers(0, 4, n_rows),
+        'Type_of_order': rng.choice(ORDERS, n_rows).astype(object),
+        'Type_of_vehicle': rng.choice(VEHICLES, n_rows).astype(object),
+        'multiple_deliveries': _with_nan(rng, rng.integers(0, 4, n_rows).astype(str), 0.02),
+        'Festival': _with_nan(rng, rng.choice(['No ', 'Yes '], n_rows, p = [0.98, 0.02]), 0.005),
+        'City': _with_nan(rng, rng.choice(CITIES, n_rows, p = [0.75, 0.22, 0.03]), 0.03),
+        'Time_taken(min)': np.char.add('(min) ', rng.integers(10, 55, n_rows).astype(str)).astype(object),
+    })
+
+    # Notas com uma casa decimal, como no dataset original ('4.9')
+    ratings = df['Delivery_person_Ratings']
+    valid = ratings != 'NaN '
+    df.loc[valid, 'Delivery_person_Ratings'] = (ratings[valid].astype(int) / 10).astype(str)
+
+    return df
+
+def synthetic_csv(path, n_rows = BASE_ROWS, seed = 42):
+    """
+    Gera o dataframe bruto sintético e o grava em CSV no caminho informado
+    """
+    synthetic_raw(n_rows, seed).to_csv(path, index = False)
+    return path
@@ -0,0 +1,79 @@
+"""
+Efeito do aquecimento do cache (utils.warmup) na primeira visita.
+
+Executa cada página, fora do servidor do Streamlit, duas vezes: com o cache
+de resultados vazio (primeira visita sem aquecimento) e depois de
+warm_filters para os filtros padrão (primeira visita com aquecimento). Na
+segunda, nenhum resultado pode ser calculado pela página: todas as chamadas
+a cached() devem ser leituras do cache, ou o script termina com código 1
+(sinal de que a lista de painéis de utils.warmup não acompanha as páginas).
+
+Deve ser executado na raiz do projeto, como o Streamlit:
+    python -m benchmarks.warmup
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import runpy
+import sys
+import time
+import warnings
+
+from utils import warmup
+from utils.api import DEFAULT_DATE, DEFAULT_TRAFFIC
+from utils.cube import load_cube
+from utils.data import load_data
+from utils.memo import panel_cache
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+PAGES = ['pages/1_visao_empresa.py', 'pages/2_visao_entregadores.py', 'pages/3_visao_restaurantes.py']
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def run_page(page):
+    """
+    Executa a página e retorna uma tupla (segundos, resultados calculados)
+    """
+    misses = panel_cache.stats()['misses']
+    start = time.perf_counter()
+    runpy.run_path(page, run_name = '__main__')
+    return time.perf_counter() - start, panel_cache.stats()['misses'] - misses
+
+def main():
+    # O aquecimento é feito aqui, de forma explícita, e não pela thread
+    warmup.WARMUP_ENABLED = False
+    warnings.simplefilter('ignore')
+
+    load_data()
+    load_cube()
+    print('{:<32} {:>14} {:>14} {:>12}'.format('página', 'sem aquecer (ms)', 'aquecido (ms)', 'calculados'))
+
+    failures = 0
+    for page in PAGES:
+        panel_cache.clear()
+        cold, _ = run_page(page)
+
+        panel_cache.clear()
+        warmup.warm_filters(DEFAULT_DATE, DEFAULT_TRAFFIC)
+        warm, computed = run_page(page)
+
+        failures += computed
+        print('{:<32} {:>14.0f} {:>14.0f} {:>12}'.format(page, cold * 1000, warm * 1000, computed))
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
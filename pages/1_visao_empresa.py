@@ -4,223 +4,116 @@
 
 
 import pandas as pd
-from haversine import haversine
-import plotly.express as px
 import streamlit as st
-import folium
-from streamlit_folium import folium_static
+import streamlit.components.v1 as components
 from PIL import Image
+import os
+import time
 from datetime import datetime
+from utils.data import load_data, filter_data
+from utils.cube import load_cube, filter_cube
+from utils.memo import cached, filter_key
+from utils.profiling import PROFILE_ENABLED, finish_profiling, start_profiling, timed
+from utils.telemetry import finish_run, start_run
+from utils.warmup import start_warmup
+from utils.figures import (MAP_HEIGHT, MAP_WIDTH, map_html, order_by_week, order_by_week_person, order_metric,
+                           traffic_order_share_pie, traffic_order_share_scatter)
+from utils.geo import bin_locations, city_centers
 
 st.set_page_config(page_title = 'Visão Empresa', page_icon = '🏭', layout = 'wide')
 
+# Telemetria da execução (latência, linhas lidas, cache e memória)
+start_run('visao_empresa')
+
+# Aquecimento do cache em segundo plano (uma thread por processo)
+start_warmup()
+
+# Modo de perfil (variável CURRY_PROFILE ou opção da sidebar)
+profiler = start_profiling('visao_empresa', st.session_state.get('perfil', PROFILE_ENABLED),
+                           st.session_state.get('perfil_gravar', False))
+
+# Com CURRY_LAZY_TABS=0, as três visões são desenhadas em abas a cada execução
+# (modo anterior); no padrão, só a visão selecionada é calculada
+LAZY_TABS = os.environ.get('CURRY_LAZY_TABS', '1') != '0'
+
 
 # ===================================
 #               Funções
 # ===================================
 
 
-def clean_code(df1):
-    
-    """ 
-     Esta função tem a responsabilidade de limpar o dataframe
-     Tipos de limpeza:
-      1. Remoção dos dados NaN
-      2. Mudança do tipo de coluna de dados
-      3. Remoção dos espaços vazios das variáveis de texto
-      2. Formatação da coluna de data
-      2. Limpeza da coluna de tempo (remoção do texto da variável numérica) 
-      
-      Input: Dataframe
-      Output: Dataframe
-    """
-    
-    # 1 - Selecionando as linhas que não possuem o valor NaN
-    select_age = df['Delivery_person_Age'] != "NaN "
-    select_rating = df['Delivery_person_Ratings'] != "NaN "
-    select_deliveries = df['multiple_deliveries'] != "NaN "
-    select_weather = df['Weatherconditions'] != "conditions NaN"
-    select_festival = df['Festival'] != "NaN "
-    select_city = df['City'] != "NaN "
-
-    df1 = df1.loc[select_age, :]
-    df1 = df1.loc[select_rating, :]
-    df1 = df1.loc[select_deliveries, :]
-    df1 = df1.loc[select_weather, :]
-    df1 = df1.loc[select_festival, :]
-    df1 = df1.loc[select_city, :]
-
-    # 2 - Convertendo a coluna Delivery_person_Age para int
-    df1["Delivery_person_Age"] = df1['Delivery_person_Age'].astype(int)
-
-    # 3 - Convertendo a coluna Delivery_person_Ratings para float
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
-
-    # 4 - Convertendo a coluna Order_Date para datetime
-    df1['Order_Date'] = pd.to_datetime( df['Order_Date'], format='%d-%m-%Y' )
-
-    # 5 - Convertendo a coluna multiple_deliveries para int
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
-
-    # 6 - Limpando a coluna time taken
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split( '(min) ' )[1] )
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
-
-    # 7 - Removendo os espaços dentro de strings
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
-    
-    return df1
-
-def order_metric(df1):
-    """
-    Esta função recebe como parâmetro um dataframe e retorna um gráfico de barras da 
-    quantidade de pedidos feitos por dia
+def country_maps(filtros, centers, bins):
     """
-    df_aux = df1.loc[:, ['ID', 'Order_Date']].groupby('Order_Date').count().reset_index()
-    fig = px.bar(df_aux, x = 'Order_Date', y = 'ID')
-    fig.update_layout(
-        title = {
-            'text': 'Quantidade de Pedidos por Dia',
-            'y': 0.95,
-            'x': 0.5,
-            'xanchor': 'center',
-            'yanchor': 'top',
-            'font': {'size': 16}
-        }
-    )
-    fig.update_xaxes(title_text = None)
-    fig.update_yaxes(title_text = None)
-    return fig
-
-def traffic_order_share_pie(df1):
+    Esta função recebe como parâmetro o estado dos filtros, a localização
+    central de cada cidade e tipo de trânsito e as células da grade de
+    entregas e desenha o mapa. O HTML do mapa vem do cache de resultados
     """
-    Esta função recebe como parâmetro um dataframe e retorna um gráfico de pizza da
-    distribuição da quantidade de pedidos por tipo de tráfego
-    """
-    df_aux = df1.loc[:, ['ID', 'Road_traffic_density']]. groupby('Road_traffic_density').count().reset_index()
-
-    # Criando uma coluna com a porcentagem
-    df_aux['perc_ID'] = 100 * (df_aux['ID'] / df_aux['ID'].sum())
-
-    # Formatando o gráfico
-    fig = px.pie( df_aux, values = 'perc_ID', names = 'Road_traffic_density')
-    fig.update_layout(
-    title = {
-        'text': 'Quantidade de Pedidos por Tráfego',
-        'y': 0.95,
-        'x': 0.5,
-        'xanchor': 'center',
-        'yanchor': 'top',
-        'font': {'size': 16}
-        },
-    legend = dict(orientation="h", yanchor="bottom", y = -0.15, xanchor="center", x=0.5)
-    )
-    fig.update_traces(
-        hovertemplate="Tipo de tráfego: %{label}")
-    return fig
-
-def traffic_order_share_scatter(df1):
+    html = cached(map_html, filtros, (centers, bins))
+    components.html( html, height = MAP_HEIGHT + 10, width = MAP_WIDTH )
+
+    return None
+
+def gerencial_view(filtros, cube, rows):
     """
-    Esta função recebe como parâmetro um dataframe e retorna um gráfico de bolha da
-    quantidade de pedidos por cidade e tipo de tráfego
+    Visão Gerencial: pedidos por dia, por tipo de tráfego e por cidade e tráfego
     """
-    df_aux = ( df1.loc[:, ['ID', 'City', 'Road_traffic_density']]
-                  .groupby( ['City', 'Road_traffic_density'] )
-                  .count()
-                  .reset_index() )
-    fig = px.scatter(df_aux, x = 'City', y = 'Road_traffic_density', size = 'ID')
-    fig.update_layout(
-        title = {
-            'text': 'Quantidade de Pedidos por Cidade e Tráfego',
-            'y': 0.95,
-            'x': 0.5,
-            'xanchor': 'center',
-            'yanchor': 'top',
-            'font': {'size': 16}
-        }
-    )
-    return fig
+    with st.container():
+        # Gráfico de Barras da Quantidade de Pedidos por Dia
+        fig = cached(order_metric, filtros, cube)
+        st.plotly_chart( fig, use_container_width = True )
     
-def order_by_week(df1):
-    """
-    Esta função recebe como parâmetro um dataframe e retorna um gráfico de linhas da
-    quantidade de pedidos por semana
-    """ 
-    # Criando uma coluna com a semana do ano
-    df1['week_of_year'] = df1['Order_Date'].dt.strftime( "%U" )
-
-    df_aux = df1.loc[:, ['ID', 'week_of_year']].groupby('week_of_year').count().reset_index()
-
-    fig = px.line(df_aux, x = 'week_of_year', y = 'ID')
-    fig.update_layout(
-        title = {
-            'text': 'Quantidade de Pedidos por Semana',
-            'y': 0.95,
-            'x': 0.5,
-            'xanchor': 'center',
-            'yanchor': 'top',
-            'font': {'size': 16}
-        }
-    )
-    return fig
-
-def order_by_week_person(df1):
+    with st.container():    
+        # Criando 2 colunas
+        col1, col2 = st.columns(2)
+
+        with col1:
+            
+            # Gráfico de Pizza de Quantidade de Pedidos por Tráfego
+            fig = cached(traffic_order_share_pie, filtros, cube)
+            st.plotly_chart( fig, use_container_width = True )            
+        
+        with col2:
+            
+            # Gráfico de Bolha de Quantidade de Pedidos por Ciade e Tráfego
+            fig = cached(traffic_order_share_scatter, filtros, cube)
+            st.plotly_chart( fig, use_container_width = True )
+
+def tatica_view(filtros, cube, rows):
     """
-    Esta função recebe como parâmetro um dataframe e retorna um gráfico de linhas da
-    quantidade de pedidos por semana e por entregador
+    Visão Tática: pedidos por semana e pedidos por entregador por semana
     """
-    df_aux1 = df1.loc[:, ['ID', 'week_of_year']].groupby('week_of_year').count().reset_index()
-    df_aux2 = df1.loc[:, ['Delivery_person_ID', 'week_of_year']].groupby('week_of_year').nunique().reset_index()
-
-    # Fazendo a junção dos data frames anteriores
-    df_aux = pd.merge(df_aux1, df_aux2, how = 'inner')
-
-    # Fazendo o calculo
-    df_aux['order_by_delivery'] = df_aux['ID'] / df_aux['Delivery_person_ID']
-
-    # Grafico
-    fig = px.line(df_aux, x = 'week_of_year', y = 'order_by_delivery')
-    fig.update_layout(
-        title = {
-            'text': 'Quantidade de Pedidos por Entregador por Semana',
-            'y': 0.95,
-            'x': 0.5,
-            'xanchor': 'center',
-            'yanchor': 'top',
-            'font': {'size': 16}
-        }
-    )
-    return fig
-
-def country_maps(df1):
+    # Gráfico de Pedidos por Semana
+    with st.container():
+        fig = cached(order_by_week, filtros, cube)
+        st.plotly_chart( fig, use_container_width = True )
+    
+    # Gráfico de Pedidos por Entregador por Semana
+    with st.container():
+        fig = cached(order_by_week_person, filtros, cube)
+        st.plotly_chart( fig, use_container_width = True )
+
+def geografica_view(filtros, cube, rows):
     """
-    Esta função recebe como parâmetro um dataframe e retorna um mapa de
-    acordo com a latitude e longitude
+    Visão Geográfica: mapa com as localizações centrais e as entregas. É a
+    única visão que precisa das linhas, filtradas só quando ela é desenhada
     """
-    col = ['City','Road_traffic_density','Delivery_location_latitude','Delivery_location_longitude']
-    col_groupby = ['City', 'Road_traffic_density']
+    df_aux = rows()
 
-    df1 = df1.loc[:, col].groupby(col_groupby).median().reset_index()
-    df_aux = df1.head()
+    # Mapa (localizações agregadas no servidor e guardadas por filtro)
+    centers = cached(city_centers, filtros, df_aux)
+    bins = cached(bin_locations, filtros, df_aux)
+    country_maps(filtros, centers, bins)
 
-    map = folium.Map()
-
-    for index, location_info in df_aux.iterrows():
-        folium.Marker(
-            [
-                location_info['Delivery_location_latitude'],
-                location_info['Delivery_location_longitude']
-            ]
-        ).add_to(map)
-
-    folium_static( map )
+def timed_view(name, view, filtros, cube, rows):
+    """
+    Desenha a visão e guarda, na sessão, o tempo gasto em ms
+    """
+    start = time.perf_counter()
+    view(filtros, cube, rows)
+    elapsed = (time.perf_counter() - start) * 1000
 
-    return None
+    st.session_state.setdefault('tempo_visoes', {})[name] = elapsed
+    st.caption( '{} calculada em {:.0f} ms'.format(name, elapsed) )
 
     
 # ===================================
@@ -228,11 +121,11 @@ def country_maps(df1):
 # ===================================
 
 
-# Importando dataset
-df = pd.read_csv('./datasets/train.csv')
-
-# Limpando o dataframe
-df1 = clean_code(df)
+# Importando o dataset limpo e o cubo de agregados (cache compartilhado pelo processo)
+with timed('dados', 'load_data'):
+    df1 = load_data()
+with timed('dados', 'load_cube'):
+    cube = load_cube()
 
 
 # ===================================
@@ -272,17 +165,21 @@ traffic_options = st.sidebar.multiselect(
 
 st.sidebar.markdown('---')
 
+if st.sidebar.checkbox('Modo de perfil', value = PROFILE_ENABLED, key = 'perfil'):
+    st.sidebar.checkbox('Gravar perfil completo', key = 'perfil_gravar')
+
+st.sidebar.markdown('---')
+
 st.sidebar.caption('Desenvolvido por Vanderson P. Amorim')
 
 # Utilizando o filtro no Dataset
 
-# Filtro data
-linhas_selecionadas = df1['Order_Date'] < date_slider
-df1 = df1.loc[linhas_selecionadas, :]
+# Filtro data e trânsito (resultados guardados por combinação de filtros)
+filtros = filter_key(date_slider, traffic_options)
+cube = cached(filter_cube, filtros, cube, date_slider, traffic_options)
 
-# Filtro trânsito
-linhas_selecionadas = df1['Road_traffic_density'].isin( traffic_options )
-df1 = df1.loc[linhas_selecionadas, :]
+# As linhas filtradas só são calculadas pela visão que precisa delas
+rows = lambda: cached(filter_data, filtros, df1, date_slider, traffic_options)
 
 
 # ===================================
@@ -292,45 +189,27 @@ df1 = df1.loc[linhas_selecionadas, :]
 
 st.header( 'Marketplace - Visão Cliente' )
 
-tab1, tab2, tab3 = st.tabs( ['Visão Gerencial', 'Visão Tática', 'Visão Geográfica'] )
-
-with tab1:
-    
-    with st.container():
-        # Gráfico de Barras da Quantidade de Pedidos por Dia
-        fig = order_metric(df1)
-        st.plotly_chart( fig, use_container_width = True )
-    
-    with st.container():    
-        # Criando 2 colunas
-        col1, col2 = st.columns(2)
-
-        with col1:
-            
-            # Gráfico de Pizza de Quantidade de Pedidos por Tráfego
-            fig = traffic_order_share_pie(df1)
-            st.plotly_chart( fig, use_container_width = True )            
-        
-        with col2:
-            
-            # Gráfico de Bolha de Quantidade de Pedidos por Ciade e Tráfego
-            fig = traffic_order_share_scatter(df1)
-            st.plotly_chart( fig, use_container_width = True )
-
-    
-with tab2:
-    
-    # Gráfico de Pedidos por Semana
-    with st.container():
-        fig = order_by_week(df1)
-        st.plotly_chart( fig, use_container_width = True )
-    
-    # Gráfico de Pedidos por Entregador por Semana
-    with st.container():
-        fig = order_by_week_person(df1)
-        st.plotly_chart( fig, use_container_width = True )
-
-with tab3:
-    
-    # Mapa
-    country_maps(df1)
+VIEWS = {
+    'Visão Gerencial': gerencial_view,
+    'Visão Tática': tatica_view,
+    'Visão Geográfica': geografica_view,
+}
+
+if LAZY_TABS:
+    # Só a visão selecionada é calculada; as outras ficam para quando forem
+    # escolhidas (e então seus resultados ficam no cache por filtro)
+    visao = st.radio( 'Visão', list(VIEWS), horizontal = True, label_visibility = 'collapsed', key = 'visao' )
+    timed_view(visao, VIEWS[visao], filtros, cube, rows)
+else:
+    for tab, (name, view) in zip(st.tabs( list(VIEWS) ), VIEWS.items()):
+        with tab:
+            timed_view(name, view, filtros, cube, rows)
+
+tempos = st.session_state.get('tempo_visoes', {})
+if tempos:
+    with st.sidebar.expander('Tempo de cálculo por visão'):
+        for name, elapsed in tempos.items():
+            st.write( '{}: {:.0f} ms'.format(name, elapsed) )
+
+finish_profiling(profiler)
+finish_run()
@@ -3,195 +3,39 @@
 # ===================================
 
 import pandas as pd
-from haversine import haversine
-import plotly.express as px
-import plotly.graph_objects as go
 import streamlit as st
-import folium
-from streamlit_folium import folium_static
 from PIL import Image
-import numpy as np
 from datetime import datetime
+from utils.cube import load_cube, filter_cube, distinct_count
+from utils.memo import cached, filter_key
+from utils.profiling import PROFILE_ENABLED, finish_profiling, start_profiling, timed
+from utils.telemetry import finish_run, start_run
+from utils.warmup import start_warmup
+from utils.metrics import festival_mean, festival_std, time_avg_std, time_percentiles
+from utils.figures import avg_std_time_graph, distance, percentile_time_graph, std_distribution_chart
+from utils.data import load_data, filter_data
+from utils.spatial import load_spatial_index, orders_within, nearest_restaurants
 
 st.set_page_config(page_title = 'Visão Restaurantes', page_icon = '🍽️', layout = 'wide')
 
+# Telemetria da execução (latência, linhas lidas, cache e memória)
+start_run('visao_restaurantes')
 
-# ===================================
-#               Funções
-# ===================================
-
-
-def clean_code(df1):
-    
-    """ 
-     Esta função tem a responsabilidade de limpar o dataframe
-     Tipos de limpeza:
-      1. Remoção dos dados NaN
-      2. Mudança do tipo de coluna de dados
-      3. Remoção dos espaços vazios das variáveis de texto
-      2. Formatação da coluna de data
-      2. Limpeza da coluna de tempo (remoção do texto da variável numérica) 
-      
-      Input: Dataframe
-      Output: Dataframe
-    """
-    
-    # 1 - Selecionando as linhas que não possuem o valor NaN
-    select_age = df['Delivery_person_Age'] != "NaN "
-    select_rating = df['Delivery_person_Ratings'] != "NaN "
-    select_deliveries = df['multiple_deliveries'] != "NaN "
-    select_weather = df['Weatherconditions'] != "conditions NaN"
-    select_festival = df['Festival'] != "NaN "
-    select_city = df['City'] != "NaN "
-
-    df1 = df1.loc[select_age, :]
-    df1 = df1.loc[select_rating, :]
-    df1 = df1.loc[select_deliveries, :]
-    df1 = df1.loc[select_weather, :]
-    df1 = df1.loc[select_festival, :]
-    df1 = df1.loc[select_city, :]
-
-    # 2 - Convertendo a coluna Delivery_person_Age para int
-    df1["Delivery_person_Age"] = df1['Delivery_person_Age'].astype(int)
-
-    # 3 - Convertendo a coluna Delivery_person_Ratings para float
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
-
-    # 4 - Convertendo a coluna Order_Date para datetime
-    df1['Order_Date'] = pd.to_datetime( df['Order_Date'], format='%d-%m-%Y' )
-
-    # 5 - Convertendo a coluna multiple_deliveries para int
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
-
-    # 6 - Limpando a coluna time taken
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split( '(min) ' )[1] )
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
-
-    # 7 - Removendo os espaços dentro de strings
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
-    
-    return df1
-
-def distance(df1, fig):
-    """
-    Recebe como parâmetro um dataframe e calcula a distância média entre
-    restaurante e entrega, adicionando uma coluna chamada 'distance' que
-    informa a distancia dentro de cada linha
-    Parâmetro fig:
-        - True: retorna o gráfico da distância média para o tipo de cidade
-        - False: retorna o valor da distância média geral
-    """
-    col = ['Delivery_location_latitude', 'Delivery_location_longitude', 'Restaurant_latitude', 'Restaurant_longitude']
-    df1['distance'] = ( df1.loc[:, col]
-                       .apply(lambda x: haversine (
-                                    (x['Delivery_location_latitude'],x['Delivery_location_longitude']),
-                                    (x['Restaurant_latitude'], x['Restaurant_longitude'])
-                                                ),
-                              axis = 1
-                                  ) )
-    
-    if fig:
-        avg_distance = df1.loc[:, ['City', 'distance']].groupby('City').mean().reset_index()
-    
-        fig = go.Figure(
-            data = [ go.Pie( labels = avg_distance['City'],
-                            values = avg_distance['distance'],
-                            pull = [0, 0.1, 0] ) ] 
-        )
-        fig.update_layout(
-        title = {
-            'text': 'Distância Média por Cidade',
-            'y': 0.95,
-            'x': 0.5,
-            'xanchor': 'center',
-            'yanchor': 'top',
-            'font': {'size': 16}
-        }
-    )
-        return fig
-    else:
-        dist_med = df1['distance'].mean()
-        dist_med = round(dist_med, 2)
-        return dist_med
-
-    
+# Aquecimento do cache em segundo plano (uma thread por processo)
+start_warmup()
 
-def festival_mean(df1, festival):
-    """
-    Recebe como parâmetro um dataframe e calcula o tempo médio de entrega
-    quando tem ou não festival ('Yes' ou 'No')
-    """
-    df_aux = df1.loc[:, ['Time_taken(min)', 'Festival']].groupby('Festival').mean().reset_index()
-    df_aux = df_aux.loc[df_aux['Festival'] == festival, 'Time_taken(min)']
-    tempo = round(df_aux, 2)
-    return tempo
-        
-def festival_std(df1, festival):
-    """
-    Recebe como parâmetro um dataframe e calcula o desvio padrão do tempo de entrega
-    quando tem ou não festival ('Yes' ou 'No')
-    """
-    df_aux = df1.loc[:, ['Time_taken(min)', 'Festival']].groupby('Festival').std().reset_index()
-    df_aux = df_aux.loc[df_aux['Festival'] == festival, 'Time_taken(min)']
-    tempo = round(df_aux, 2)
-    return tempo
-
-def avg_std_time_graph(df1):
-    """
-    Recebe como parâmetro um dataframe e retorna um gráfico de linha com
-    a média e desvio padrão do tempo de entrega por cidade
-    """
-    cols = ['City', 'Time_taken(min)']
-    df_aux = df1.loc[:, cols].groupby('City').agg( {'Time_taken(min)': ['mean', 'std']} )
-
-    df_aux.columns = ['avg_time', 'std_time']
-    df_aux = df_aux.reset_index()
-    fig = go.Figure()
-    fig.add_trace( go.Bar( name = 'Control',
-                           x = df_aux['City'],
-                           y = df_aux['avg_time'],
-                          error_y = dict( type = 'data', array = df_aux['std_time'] )) )
-    fig.update_layout(barmode = 'group')
-    return fig
-
-def std_distribution_chart(df1):
-    """
-    Recebe como parâmetro um dataframe e retorna um gráfico de explosão solar com
-    o desvio padrão do tempo de entrega por cidade e trânsito
-    """
-    cols = ['City', 'Time_taken(min)', 'Road_traffic_density']
-    df_aux = df1.loc[:, cols].groupby( ['City', 'Road_traffic_density'] ).agg( {'Time_taken(min)': ['mean', 'std']} )
-    df_aux.columns = ['avg_time', 'std_time']
-    df_aux = df_aux.reset_index()
-    fig = px.sunburst(df_aux, path = ['City', 'Road_traffic_density'], values = 'avg_time', color = 'std_time',
-                     color_continuous_scale = 'RdBu_r', color_continuous_midpoint = np.average(df_aux['std_time']))
-    fig.update_layout(
-        title = {
-            'text': 'Distribuição do desvio padrão por<br>cidade e trânsito',
-            'y': 0.95,
-            'x': 0.5,
-            'xanchor': 'center',
-            'yanchor': 'top',
-            'font': {'size': 16}
-        }
-    )
-    return fig
+# Modo de perfil (variável CURRY_PROFILE ou opção da sidebar)
+profiler = start_profiling('visao_restaurantes', st.session_state.get('perfil', PROFILE_ENABLED),
+                           st.session_state.get('perfil_gravar', False))
 
 
 # ===================================
 #               Dataset
 # ===================================
 
-# Importando dataset
-df = pd.read_csv('./datasets/train.csv')
-
-# Limpando o dataframe
-df1 = clean_code(df)
+# Importando o cubo de agregados (cache compartilhado pelo processo)
+with timed('dados', 'load_cube'):
+    cube = load_cube()
 
 
 # ===================================
@@ -231,17 +75,18 @@ traffic_options = st.sidebar.multiselect(
 
 st.sidebar.markdown('---')
 
+if st.sidebar.checkbox('Modo de perfil', value = PROFILE_ENABLED, key = 'perfil'):
+    st.sidebar.checkbox('Gravar perfil completo', key = 'perfil_gravar')
+
+st.sidebar.markdown('---')
+
 st.sidebar.caption('Desenvolvido por Vanderson P. Amorim')
 
 # Utilizando o filtro no Dataset
 
-# Filtro data
-linhas_selecionadas = df1['Order_Date'] < date_slider
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro trânsito
-linhas_selecionadas = df1['Road_traffic_density'].isin( traffic_options )
-df1 = df1.loc[linhas_selecionadas, :]
+# Filtro data e trânsito (resultados guardados por combinação de filtros)
+filtros = filter_key(date_slider, traffic_options)
+cube = cached(filter_cube, filtros, cube, date_slider, traffic_options)
 
 
 # ===================================
@@ -258,33 +103,33 @@ with st.container():
     col1, col2 = st.columns(2)
     
     with col1:
-        ent_unic = df1['Delivery_person_ID'].nunique()
+        ent_unic = cached(distinct_count, filtros, cube)
         col1.metric('Entreg. \n únicos', ent_unic)
        
     with col2:
-        dist_med = distance(df1, False)
+        dist_med = cached(distance, filtros, cube, False)
         col2.metric( 'Dist. média', dist_med )
         
     col1, col2 = st.columns(2)
 
         
     with col1:
-        tempo = festival_mean(df1, 'Yes')
+        tempo = cached(festival_mean, filtros, cube, 'Yes')
         col1.metric('Tempo médio entrega c/ festival', tempo)
         
     with col2:
-        tempo = festival_std(df1, 'Yes')
+        tempo = cached(festival_std, filtros, cube, 'Yes')
         col2.metric('Desvio Padrão entrega c/ festival', tempo)
     
     col1, col2 = st.columns(2)
     
     
     with col1:
-        tempo = festival_mean(df1, 'No')
+        tempo = cached(festival_mean, filtros, cube, 'No')
         col1.metric('Tempo médio entrega s/ festival', tempo)
         
     with col2:
-        tempo = festival_std(df1, 'No')
+        tempo = cached(festival_std, filtros, cube, 'No')
         col2.metric('Desvio Padrão entrega s/ festival', tempo)
     
 st.markdown('---')
@@ -296,14 +141,22 @@ with st.container():
     col1, col2 = st.columns(2)
     
     with col1:
-        fig = avg_std_time_graph(df1)
+        fig = cached(avg_std_time_graph, filtros, cube)
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
-        cols = ['City', 'Time_taken(min)', 'Type_of_order']
-        df_aux = df1.loc[:, cols].groupby(['City', 'Type_of_order']).agg( {'Time_taken(min)': ['mean', 'std']} )
-        df_aux.columns = ['avg_time', 'std_time']
-        df_aux = df_aux.reset_index()
+        df_aux = cached(time_avg_std, filtros, cube, ['City', 'Type_of_order'])
+        st.dataframe(df_aux)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # Percentis do tempo de entrega por cidade
+        fig = cached(percentile_time_graph, filtros, cube)
+        st.plotly_chart(fig, use_container_width=True)
+
+    with col2:
+        df_aux = cached(time_percentiles, filtros, cube, ['City', 'Road_traffic_density'])
         st.dataframe(df_aux)
     
 
@@ -318,10 +171,49 @@ with st.container():
     
     with col1:
         # Gráfico da Distância média por cidade
-        fig = distance(df1, True)
+        fig = cached(distance, filtros, cube, True)
         st.plotly_chart(fig, use_container_width=True)
         
     with col2:
         # Distribuição do desvio padrão por cidade e trânsito
-        fig = std_distribution_chart(df1)
+        fig = cached(std_distribution_chart, filtros, cube)
         st.plotly_chart(fig, use_container_width=True)
+
+st.markdown('---')
+
+with st.container():
+
+    st.title('Consultas geográficas')
+
+    with timed('dados', 'load_spatial_index'):
+        index = load_spatial_index()
+    restaurantes = index.restaurants
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown( '##### Pedidos no raio de um restaurante' )
+        restaurante = st.selectbox(
+            'Restaurante (latitude, longitude)',
+            restaurantes.index,
+            format_func = lambda i: '{:.6f}, {:.6f}'.format(*restaurantes.loc[i])
+        )
+        raio = st.slider('Raio (km)', 1, 50, 10)
+
+        lat, lon = restaurantes.loc[restaurante]
+        pedidos = orders_within(index, load_data(), lat, lon, raio)
+        pedidos = filter_data(pedidos, date_slider, traffic_options)
+
+        col1.metric('Pedidos no raio', len(pedidos))
+        st.dataframe(pedidos.loc[:, ['ID', 'Order_Date', 'City', 'Road_traffic_density', 'distance_km']].head(100))
+
+    with col2:
+        st.markdown( '##### Restaurantes mais próximos de um local de entrega' )
+        lat = st.number_input('Latitude', value = float(restaurantes['Restaurant_latitude'].median()), format = '%.6f')
+        lon = st.number_input('Longitude', value = float(restaurantes['Restaurant_longitude'].median()), format = '%.6f')
+        k = st.slider('Quantidade de restaurantes', 1, 20, 5)
+
+        st.dataframe(nearest_restaurants(index, lat, lon, k))
+
+finish_profiling(profiler)
+finish_run()
@@ -0,0 +1,38 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import pytest
+
+from benchmarks.synthetic import synthetic_csv, synthetic_raw
+from utils.cube import build_cube
+from utils.data import prepare_data, raw_types
+
+
+# ===================================
+#               Fixtures
+# ===================================
+
+
+@pytest.fixture(scope = 'session')
+def df1():
+    """
+    Dataframe limpo de um dataset sintético pequeno, no esquema do train.csv
+    """
+    return prepare_data(raw_types(synthetic_raw(5000)))
+
+@pytest.fixture(scope = 'session')
+def cube(df1):
+    """
+    Cubo de agregados do dataset sintético
+    """
+    return build_cube(df1)
+
+@pytest.fixture(scope = 'session')
+def dataset_path(tmp_path_factory):
+    """
+    CSV sintético em um diretório temporário, para as funções que carregam
+    o dataset pelo caminho (load_data, load_cube, API)
+    """
+    return synthetic_csv(str(tmp_path_factory.mktemp('datasets') / 'train.csv'), 5000)
@@ -0,0 +1,71 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import json
+import threading
+from http.client import HTTPConnection
+
+import pytest
+
+from utils import api
+from utils.api import ROUTES, make_server, respond
+
+
+# ===================================
+#               Fixtures
+# ===================================
+
+
+@pytest.fixture
+def server(dataset_path):
+    """
+    Instância da API em uma porta livre, atendendo em uma thread
+    """
+    server = make_server(port = 0, path = dataset_path)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# ===================================
+#               Testes
+# ===================================
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+@pytest.mark.parametrize('query', [{'date': '2022-01-01'}, {'traffic': ''}, {'date': '2022-02-11', 'traffic': 'Jam'}])
+@pytest.mark.parametrize('route', list(ROUTES))
+def test_empty_filter_range(dataset_path, route, query):
+    status, body = respond(route, query, dataset_path)
+
+    assert status == 200
+    assert isinstance(json.loads(body), list)
+
+@pytest.mark.parametrize('route', [route for route in ROUTES if route != '/ratings'])
+def test_by_only_checked_by_ratings(dataset_path, route):
+    # 'by' é parâmetro só de /ratings: as outras rotas o ignoram
+    assert respond(route, {'by': 'city'}, dataset_path)[0] == 200
+
+def test_invalid_by_returns_400(dataset_path):
+    status, body = respond('/ratings', {'by': 'city'}, dataset_path)
+    assert status == 400
+    assert "'by'" in json.loads(body)['error']
+
+def test_route_error_returns_500(dataset_path, server, monkeypatch):
+    def broken(cube, query):
+        raise RuntimeError('falha no painel')
+    monkeypatch.setitem(api.ROUTES, '/broken', broken)
+
+    connection = HTTPConnection('127.0.0.1', server.server_address[1])
+    connection.request('GET', '/broken?date=2022-03-01')
+    response = connection.getresponse()
+    assert response.status == 500
+    assert 'falha no painel' in json.loads(response.read())['error']
+
+    # A conexão continua utilizável depois do erro
+    connection.request('GET', '/health')
+    assert connection.getresponse().status == 200
+    connection.close()
@@ -0,0 +1,84 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.cube import SKETCH_DIMENSIONS, build_cube, distinct_count, merge_cubes
+from utils.metrics import time_percentiles
+from utils.sketches import HLL_PRECISION
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Três erros padrão relativos do HyperLogLog (1,04 / sqrt(2^HLL_PRECISION))
+HLL_TOLERANCE = 3 * 1.04 / np.sqrt(2 ** HLL_PRECISION)
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def _sorted_sketches(cube):
+    """
+    Chaves, registradores e histogramas dos sketches do cubo, na ordem das
+    SKETCH_DIMENSIONS, para comparar cubos montados em ordens diferentes
+    """
+    order = cube.sketch_keys.sort_values(SKETCH_DIMENSIONS).index.to_numpy()
+    return (cube.sketch_keys.loc[order].reset_index(drop = True),
+            cube.distinct_registers[order],
+            {measure: counts[order] for measure, counts in cube.histograms.items()})
+
+
+# ===================================
+#               Testes
+# ===================================
+
+
+def test_merge_matches_full_build(df1, cube):
+    half = len(df1) // 2
+    merged = merge_cubes(build_cube(df1.iloc[:half]), build_cube(df1.iloc[half:]))
+
+    keys, registers, histograms = _sorted_sketches(merged)
+    expected_keys, expected_registers, expected_histograms = _sorted_sketches(cube)
+
+    pd.testing.assert_frame_equal(keys.astype(object), expected_keys.astype(object))
+    assert registers.dtype == np.uint8
+    np.testing.assert_array_equal(registers, expected_registers)
+    for measure, counts in histograms.items():
+        np.testing.assert_array_equal(counts, expected_histograms[measure])
+    assert merged.cells['count'].sum() == cube.cells['count'].sum() == len(df1)
+
+
+def test_distinct_count_within_error(df1, cube):
+    expected = df1['Delivery_person_ID'].nunique()
+    assert abs(distinct_count(cube) - expected) <= HLL_TOLERANCE * expected
+
+    weeks = df1['Order_Date'].dt.strftime('%U')
+    by_week = distinct_count(cube, 'week_of_year').set_index('week_of_year')['distinct']
+    expected = df1.groupby(weeks)['Delivery_person_ID'].nunique()
+    assert by_week.index.tolist() == expected.index.tolist()
+    assert (abs(by_week - expected) <= HLL_TOLERANCE * expected).all()
+
+@pytest.mark.parametrize('offset, tolerance', [(0, 0), (0.3, 0.5), (-0.45, 0.5)])
+def test_time_percentiles_within_error(df1, offset, tolerance):
+    # Tempos inteiros: percentis exatos, iguais aos do pandas; tempos
+    # fracionários: arredondados, erro de até 0,5 minuto
+    df1 = df1.assign(**{'Time_taken(min)': df1['Time_taken(min)'] + offset})
+    dims = ['City', 'Road_traffic_density']
+    percentis = time_percentiles(build_cube(df1), dims, QUANTILES).set_index(dims)
+
+    grouped = df1.groupby(dims, observed = True)['Time_taken(min)']
+    for q in QUANTILES:
+        expected = grouped.quantile(q)
+        column = percentis['p{:g}'.format(q * 100)].loc[expected.index]
+        assert (abs(column - expected) <= tolerance + 1e-9).all()
@@ -0,0 +1,168 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from benchmarks.clean_code import check_equivalence, legacy_clean_code
+from benchmarks.synthetic import synthetic_csv, synthetic_raw
+from utils import data, telemetry
+from utils.data import (RAW_NA_VALUES, clean_code, columnar_path, compact_batches,
+                        filter_data, load_data, raw_types, read_batches, read_raw,
+                        read_snapshot)
+from utils.ingest import incoming_dir, ingest_batches
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+FILTERS = [(datetime(2022, 2, 20), ['Low', 'Medium', 'High', 'Jam']),
+           (datetime(2022, 3, 10), ['Jam', 'Low']),
+           (datetime(2022, 4, 30), ['Medium'])]
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def _raw_with_bad_times():
+    """
+    Dataframe bruto sintético com os marcadores de ausência e valores de
+    tempo que a limpeza precisa tratar: marcadores inválidos em linhas
+    descartadas por outro NaN e espaços sobrando em linhas válidas
+    """
+    raw = synthetic_raw(2000, seed = 3)
+    for col, markers in RAW_NA_VALUES.items():
+        assert raw[col].isin(markers).any()
+
+    dropped = raw.index[raw['Delivery_person_Age'] == 'NaN '][:3]
+    raw.loc[dropped, 'Time_taken(min)'] = ['(min) NaN', '(min) ', 'NaN ']
+    kept = legacy_clean_code(raw.copy()).index[:2]
+    raw.loc[kept, 'Time_taken(min)'] = ['(min) 24 ', '(min) 7']
+    return raw
+
+def _add_batch(path, name, n_rows, seed):
+    """
+    Ingere um lote sintético de n_rows linhas e retorna o lote já limpo
+    """
+    os.makedirs(incoming_dir(path), exist_ok = True)
+    synthetic_csv(os.path.join(incoming_dir(path), name + '.csv'), n_rows, seed)
+    assert ingest_batches(path) == [name]
+    return read_batches(path, [name])[0]
+
+
+# ===================================
+#               Testes
+# ===================================
+
+
+def test_batch_refresh_keeps_base_snapshot(tmp_path):
+    path = synthetic_csv(str(tmp_path / 'train.csv'), 3000)
+    base = load_data(path)
+    snapshot_mtime = os.stat(columnar_path(path)).st_mtime_ns
+
+    batch = _add_batch(path, 'lote-001', 1000, seed = 7)
+    df1 = load_data(path)
+
+    # O arquivo base não é regravado: o lote entra como outro segmento
+    assert len(df1) == len(base) + len(batch)
+    assert len(df1.segments) == 2
+    assert os.stat(columnar_path(path)).st_mtime_ns == snapshot_mtime
+    assert read_snapshot(path)[0] == ()
+
+    # Nenhum segmento é uma cópia privada: as colunas apontam para os
+    # arquivos mapeados (somente leitura)
+    for segment in df1.segments:
+        assert not segment['Delivery_person_Age'].to_numpy().flags.writeable
+
+    # Um processo novo (sem o cache) chega ao mesmo dataset
+    del data._cache[path]
+    pd.testing.assert_frame_equal(load_data(path).to_frame(), df1.to_frame())
+
+
+def test_compact_batches(tmp_path):
+    path = synthetic_csv(str(tmp_path / 'train.csv'), 3000)
+    _add_batch(path, 'lote-001', 1000, seed = 7)
+    df1 = load_data(path)
+
+    assert compact_batches(path) == 1
+    included, snapshot = read_snapshot(path)
+    assert included == ('lote-001',)
+    assert len(snapshot) == len(df1)
+    assert snapshot['ID'].sort_values().tolist() == df1.to_frame()['ID'].sort_values().tolist()
+
+
+@pytest.mark.parametrize('date_slider, traffic_options', FILTERS)
+def test_partitions_cover_base_and_batches(tmp_path, date_slider, traffic_options):
+    path = synthetic_csv(str(tmp_path / 'train.csv'), 3000)
+    load_data(path)
+    _add_batch(path, 'lote-001', 1000, seed = 7)
+    _add_batch(path, 'lote-002', 500, seed = 8)
+    df1 = load_data(path)
+
+    # Um intervalo por dia e trânsito em cada arquivo, cobrindo todas as linhas
+    assert len(df1.segments) == 3
+    for segment, partitions in zip(df1.segments, df1.partitions):
+        assert partitions is not None
+        assert (partitions['stop'] - partitions['start']).sum() == len(segment)
+        assert (partitions['start'].to_numpy()[1:] == partitions['stop'].to_numpy()[:-1]).all()
+
+    # A mesma seleção e a mesma ordem da máscara aplicada a todas as linhas
+    expected = filter_data(df1.to_frame(), date_slider, traffic_options)
+    pd.testing.assert_frame_equal(filter_data(df1, date_slider, traffic_options), expected)
+
+
+def test_dataframe_uses_mask(dataset_path):
+    df1 = load_data(dataset_path)
+    frame = df1.to_frame()
+
+    key = ('curry_filter_calls_total', (('mode', 'mask'),))
+    before = telemetry._counters[key]
+    date_slider, traffic_options = FILTERS[1]
+    pd.testing.assert_frame_equal(filter_data(frame, date_slider, traffic_options),
+                                  filter_data(df1, date_slider, traffic_options))
+    assert telemetry._counters[key] == before + 1
+
+
+def test_refresh_reads_only_new_batches(tmp_path, monkeypatch):
+    path = synthetic_csv(str(tmp_path / 'train.csv'), 3000)
+    _add_batch(path, 'lote-001', 1000, seed = 7)
+    before = load_data(path)
+    _add_batch(path, 'lote-002', 500, seed = 8)
+
+    # A atualização não pode ler o arquivo base nem os lotes já carregados
+    read = []
+    read_columnar = data.read_columnar
+
+    def tracked(batch, version = None):
+        read.append(os.path.basename(batch))
+        return read_columnar(batch, version)
+
+    monkeypatch.setattr(data, 'read_snapshot', lambda *args: pytest.fail('arquivo base relido'))
+    monkeypatch.setattr(data, 'read_columnar', tracked)
+    df1 = load_data(path)
+
+    assert read == ['lote-002.feather']
+    assert all(new is old for new, old in zip(df1.segments, before.segments))
+    assert len(df1) == len(before) + len(df1.segments[2])
+
+
+def test_clean_code_matches_legacy(tmp_path):
+    raw = _raw_with_bad_times()
+    path = str(tmp_path / 'train.csv')
+    raw.to_csv(path, index = False)
+
+    legacy = legacy_clean_code(pd.read_csv(path))
+    assert legacy['Time_taken(min)'].loc[legacy.index[:2]].tolist() == [24, 7]
+
+    # Do CSV (read_raw) e de um dataframe em memória (raw_types)
+    check_equivalence(legacy, clean_code(read_raw(path)))
+    check_equivalence(legacy, clean_code(raw_types(raw)))
@@ -0,0 +1,62 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import pandas as pd
+import pytest
+
+from utils.metrics import rank_delivers
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+CITIES = ['Metropolitian', 'Semi-Urban', 'Urban']
+
+# Tempo de entrega de cada entregador; na Urban, B, C e D empatam em 20
+# minutos, no limite de k = 2 dos dois lados
+TIMES = [('Urban', 'A', 10), ('Urban', 'D', 20), ('Urban', 'C', 20), ('Urban', 'B', 20),
+         ('Urban', 'E', 30), ('Metropolitian', 'F', 15), ('Metropolitian', 'G', 25)]
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def _frame(rows):
+    """
+    Dataframe com as colunas usadas pelo ranking, nos tipos do dataset limpo
+    """
+    df1 = pd.DataFrame(rows, columns = ['City', 'Delivery_person_ID', 'Time_taken(min)'])
+    df1['City'] = df1['City'].astype(pd.CategoricalDtype(CITIES))
+    df1['Delivery_person_ID'] = df1['Delivery_person_ID'].astype('category')
+    return df1
+
+
+# ===================================
+#               Testes
+# ===================================
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_rank_order_is_deterministic(seed):
+    # A ordem das linhas não muda o resultado: as cidades seguem as categorias
+    # (Metropolitian antes de Urban, embora Urban apareça primeiro) e os
+    # empates no limite de k ficam com o menor ID
+    df1 = _frame(TIMES).sample(frac = 1, random_state = seed)
+    df_rapidos, df_lentos = rank_delivers(df1, 2)
+
+    assert df_rapidos['City'].tolist() == ['Metropolitian', 'Metropolitian', 'Urban', 'Urban']
+    assert df_rapidos['Delivery_person_ID'].tolist() == ['F', 'G', 'A', 'B']
+    assert df_lentos['Delivery_person_ID'].tolist() == ['G', 'F', 'E', 'B']
+
+def test_rank_ties_inside_k():
+    # O limite de k = 3 corta o empate de três: entram os dois menores IDs
+    df_rapidos, df_lentos = rank_delivers(_frame(TIMES), 3)
+
+    assert df_rapidos.loc[df_rapidos['City'] == 'Urban', 'Delivery_person_ID'].tolist() == ['A', 'B', 'C']
+    assert df_lentos.loc[df_lentos['City'] == 'Urban', 'Delivery_person_ID'].tolist() == ['E', 'B', 'C']
@@ -0,0 +1,41 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+from datetime import datetime
+
+import pytest
+
+from utils.cube import filter_cube
+from utils.warmup import CUBE_PANELS
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+TRAFFIC = ['Low', 'Medium', 'High', 'Jam']
+
+# Filtros que não selecionam nenhum pedido: trânsito vazio e a data mínima
+# do slider (o filtro de data é estrito)
+EMPTY_FILTERS = [
+    (datetime(2022, 3, 5), []),
+    (datetime(2022, 2, 11), TRAFFIC),
+]
+
+
+# ===================================
+#               Testes
+# ===================================
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+@pytest.mark.parametrize('date_slider, traffic_options', EMPTY_FILTERS)
+@pytest.mark.parametrize('func, params', CUBE_PANELS, ids = lambda value: getattr(value, '__name__', repr(value)))
+def test_cube_panels_with_empty_filter(cube, func, params, date_slider, traffic_options):
+    empty = filter_cube(cube, date_slider, traffic_options)
+    assert empty.cells.empty
+
+    func(empty, *params)
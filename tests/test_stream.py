@@ -0,0 +1,96 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from benchmarks.stream import write_large_csv
+from benchmarks.synthetic import BASE_ROWS, synthetic_csv
+from utils import cube as cube_module
+from utils.cube import MEASURES, build_cube, load_cube, order_count
+from utils.data import load_data, prepare_data, read_raw
+from utils.stats import group_stats
+from utils.stream import (partition_path, read_manifest, read_partitions,
+                          read_stream_cube, stream_dataset)
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Orçamento da leitura em blocos no teste de memória (CURRY_MEMORY_BUDGET_MB)
+BUDGET_MB = 64
+
+# Processo de medição: o orçamento vem da variável de ambiente e o aumento do
+# pico (VmHWM) mede só a leitura em blocos
+MEASURE = '''
+import sys
+from benchmarks.stream import peak_mb
+from utils.stream import stream_dataset
+before = peak_mb()
+stream_dataset(sys.argv[1])
+print(before, peak_mb())
+'''
+
+
+# ===================================
+#               Testes
+# ===================================
+
+
+def test_load_cube_uses_streamed_cube(tmp_path):
+    path = synthetic_csv(str(tmp_path / 'train.csv'), 3000)
+    streamed, manifest = stream_dataset(path, chunk_rows = 1000)
+
+    cube = load_cube(path)
+    assert manifest['rows'] == len(load_data(path))
+    assert (cube.distinct_registers == streamed.distinct_registers).all()
+
+    dims = ['City', 'Road_traffic_density']
+    expected = order_count(build_cube(load_data(path).to_frame()), dims).sort_values(dims, ignore_index = True)
+    pd.testing.assert_frame_equal(order_count(cube, dims).sort_values(dims, ignore_index = True), expected)
+
+
+def test_stale_store_is_ignored(tmp_path):
+    path = synthetic_csv(str(tmp_path / 'train.csv'), 3000)
+    stream_dataset(path, chunk_rows = 1000)
+    assert read_stream_cube(path) is not None
+
+    # Um CSV novo invalida o cubo gravado: load_cube volta a agregar as linhas
+    synthetic_csv(path, 2000, seed = 7)
+    os.utime(path, ns = (0, 0))
+    cube_module._cache.pop(path, None)
+    assert read_stream_cube(path) is None
+    assert order_count(load_cube(path), ['City'])['count'].sum() == len(load_data(path))
+
+
+def test_stream_stays_within_budget(tmp_path):
+    path = write_large_csv(str(tmp_path / 'large.csv'), BASE_ROWS * 8)
+    raw_mb = pd.read_csv(path).memory_usage(index = False, deep = True).sum() / 1024 ** 2
+    assert raw_mb > 3 * BUDGET_MB
+
+    env = dict(os.environ, CURRY_MEMORY_BUDGET_MB = str(BUDGET_MB))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', MEASURE, path], cwd = root, env = env,
+                            capture_output = True, text = True, check = True).stdout
+    before, after = map(float, output.split())
+    assert after - before < BUDGET_MB
+
+    # Linhas de cada partição e totais do cubo iguais aos da leitura completa
+    full = prepare_data(read_raw(path))
+    months = full['Order_Date'].dt.strftime('%Y-%m')
+    expected = full.groupby([months, 'City'], observed = True).size()
+    manifest = read_manifest(path)
+    assert manifest['rows'] == len(full)
+    assert manifest['partitions'] == {partition_path('', month, city): rows for (month, city), rows in expected.items()}
+    assert len(read_partitions(path)) == len(full)
+
+    totals = group_stats(read_stream_cube(path), [], MEASURES)
+    assert totals.loc[0, 'count'] == len(full)
+    pd.testing.assert_frame_equal(totals, group_stats(build_cube(full), [], MEASURES))
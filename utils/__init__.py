@@ -0,0 +1,3 @@
+"""
+Módulos compartilhados pelas páginas do dashboard da Curry Company
+"""
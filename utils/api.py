@@ -0,0 +1,226 @@
+"""
+API HTTP local com os indicadores do dashboard em JSON.
+
+Os números são os mesmos das páginas, calculados pelas mesmas funções sobre
+o cubo de agregados e guardados no mesmo cache de resultados (utils.memo),
+com os mesmos filtros da sidebar:
+    date     data limite no formato AAAA-MM-DD (padrão 2022-03-05)
+    traffic  tipos de trânsito separados por vírgula (padrão Low,Medium,High,Jam;
+             vazio, nenhum tipo, como a sidebar sem seleção)
+
+Rotas:
+    /orders/day               pedidos por dia
+    /orders/week              pedidos por semana
+    /orders/week-person       pedidos por entregador por semana
+    /ratings?by=traffic       avaliação média e desvio padrão por trânsito
+    /ratings?by=weather       avaliação média e desvio padrão por clima
+    /delivery-time/festival   tempo médio e desvio padrão com e sem festival
+    /delivery-time/city       tempo médio e desvio padrão por cidade
+    /health                   versão do dataset e contadores do cache
+    /metrics                  telemetria no formato texto do Prometheus (utils.telemetry)
+
+Uso: python -m utils.api [--host 127.0.0.1] [--port 8502]
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import argparse
+import json
+import logging
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from utils.cube import filter_cube, load_cube, order_count
+from utils.data import DATASET_PATH, dataset_version
+from utils.memo import cached, filter_key, panel_cache
+from utils.metrics import festival_mean, festival_std, orders_by_week_person, rating_avg_std, time_avg_std
+from utils.telemetry import finish_run, render_prometheus, start_run
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Filtros padrão da sidebar
+DEFAULT_DATE = datetime(2022, 3, 5)
+DEFAULT_TRAFFIC = ['Low', 'Medium', 'High', 'Jam']
+
+# Coluna do cubo de cada valor do parâmetro 'by' de /ratings
+RATING_COLUMNS = {'traffic': 'Road_traffic_density', 'weather': 'Weatherconditions'}
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def _records(df):
+    """
+    Converte um dataframe em lista de dicionários, com datas no formato ISO
+    """
+    return json.loads(df.to_json(orient = 'records', date_format = 'iso'))
+
+def _festival(cube):
+    """
+    Tempo médio e desvio padrão de entrega com ('Yes') e sem ('No') festival
+    """
+    return [{'Festival': festival, 'avg_time': festival_mean(cube, festival), 'std_time': festival_std(cube, festival)}
+            for festival in ['Yes', 'No']]
+
+def _ratings_params(query):
+    """
+    Parâmetros de /ratings que entram na chave do cache: ('by', valor).
+    Gera ValueError para valores inválidos
+    """
+    by = query.get('by', 'traffic')
+    if by not in RATING_COLUMNS:
+        raise ValueError("Parâmetro 'by' deve ser {}".format(' ou '.join(RATING_COLUMNS)))
+    return (('by', by),)
+
+# Rota -> função que recebe o cubo filtrado e os parâmetros da consulta
+ROUTES = {
+    '/orders/day': lambda cube, query: _records(order_count(cube, ['Order_Date'])),
+    '/orders/week': lambda cube, query: _records(order_count(cube, ['week_of_year'])),
+    '/orders/week-person': lambda cube, query: _records(orders_by_week_person(cube)),
+    '/ratings': lambda cube, query: _records(rating_avg_std(cube, RATING_COLUMNS[query['by']])),
+    '/delivery-time/festival': lambda cube, query: _festival(cube),
+    '/delivery-time/city': lambda cube, query: _records(time_avg_std(cube, ['City'])),
+}
+
+# Rota -> função que valida os parâmetros próprios da rota e retorna os que
+# entram na chave do cache; as demais rotas ignoram os parâmetros além dos filtros
+ROUTE_PARAMS = {
+    '/ratings': _ratings_params,
+}
+
+def parse_filters(query):
+    """
+    Recebe como parâmetro os parâmetros da consulta e retorna uma tupla
+    (data limite, lista de tipos de trânsito). Gera ValueError para valores inválidos
+    """
+    date_slider = datetime.strptime(query['date'], '%Y-%m-%d') if 'date' in query else DEFAULT_DATE
+    traffic_options = DEFAULT_TRAFFIC
+    if 'traffic' in query:
+        traffic_options = [value for value in query['traffic'].split(',') if value]
+
+    unknown = set(traffic_options) - set(DEFAULT_TRAFFIC)
+    if unknown:
+        raise ValueError('Tipo de trânsito desconhecido: {}'.format(', '.join(sorted(unknown))))
+
+    return date_slider, traffic_options
+
+def render(cube, route, query):
+    """
+    Executa a rota e retorna o corpo da resposta em JSON (bytes)
+    """
+    return json.dumps(ROUTES[route](cube, dict(query)), ensure_ascii = False).encode('utf-8')
+
+def respond(route, query, path = DATASET_PATH):
+    """
+    Recebe como parâmetro a rota e os parâmetros da consulta e retorna uma
+    tupla (status HTTP, corpo em JSON). As respostas ficam no cache de
+    resultados, por estado dos filtros, como os gráficos das páginas. Um erro
+    no cálculo vira uma resposta 500 com a mensagem em 'error'
+    """
+    if route == '/health':
+        mtime_ns, size, batches = dataset_version(path)
+        body = {'dataset': {'mtime_ns': mtime_ns, 'size': size, 'batches': list(batches)},
+                'cache': panel_cache.stats()}
+        return 200, json.dumps(body).encode('utf-8')
+    if route not in ROUTES:
+        return 404, json.dumps({'error': 'Rota desconhecida: {}'.format(route)}).encode('utf-8')
+
+    try:
+        date_slider, traffic_options = parse_filters(query)
+        # Só os parâmetros usados pela rota são validados e entram na chave do cache
+        extra = ROUTE_PARAMS[route](query) if route in ROUTE_PARAMS else ()
+    except ValueError as error:
+        return 400, json.dumps({'error': str(error)}, ensure_ascii = False).encode('utf-8')
+
+    try:
+        filtros = filter_key(date_slider, traffic_options, path)
+        cube = cached(filter_cube, filtros, load_cube(path), date_slider, traffic_options)
+        return 200, cached(render, filtros, cube, route, extra)
+    except Exception as error:
+        logging.getLogger('curry.api').exception('Falha ao calcular a rota %s', route)
+        body = {'error': '{}: {}'.format(type(error).__name__, error)}
+        return 500, json.dumps(body, ensure_ascii = False).encode('utf-8')
+
+def make_server(host = '127.0.0.1', port = 8502, path = DATASET_PATH):
+    """
+    Cria o servidor da API (uma thread por conexão) sem iniciá-lo
+    """
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.dataset_path = path
+    return server
+
+
+# ===================================
+#               Classes
+# ===================================
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """
+    Atende as consultas GET da API. O caminho do dataset vem do servidor
+    (server.dataset_path)
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    # Cabeçalho e corpo são enviados em escritas separadas; sem desligar o
+    # algoritmo de Nagle, cada resposta espera o ACK atrasado do cliente (~40 ms)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        # Valores vazios são mantidos: traffic= é a seleção sem nenhum tipo
+        query = {key: values[-1] for key, values in parse_qs(url.query, keep_blank_values = True).items()}
+        route = url.path.rstrip('/') or '/'
+
+        if route == '/metrics':
+            status, body = 200, render_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            # Cada consulta conta como uma execução da 'página' api na telemetria
+            start_run('api')
+            try:
+                status, body = respond(route, query, self.server.dataset_path)
+            finally:
+                finish_run()
+            content_type = 'application/json; charset=utf-8'
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Sem log por requisição: com centenas de consultas por segundo, o
+        # log no terminal passa a ser o gargalo
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'API HTTP com os indicadores do dashboard')
+    parser.add_argument('--host', default = '127.0.0.1', help = 'endereço de escuta')
+    parser.add_argument('--port', type = int, default = 8502, help = 'porta de escuta')
+    parser.add_argument('--dataset', default = DATASET_PATH, help = 'CSV base do dataset')
+    args = parser.parse_args()
+
+    # Carrega o dataset e o cubo antes de aceitar conexões
+    load_cube(args.dataset)
+
+    server = make_server(args.host, args.port, args.dataset)
+    print('API em http://{}:{}'.format(args.host, server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,233 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.data import (DATASET_PATH, batch_names, concat_frames, load_data,
+                        read_batches, source_version)
+from utils.sketches import (hash_values, hist_counts, hll_estimate, hll_merge,
+                             hll_registers)
+from utils.stats import group_stats, merge_stats, sufficient_stats
+from utils.telemetry import observe
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Dimensões do cubo: os filtros da sidebar (dia e trânsito) e as quebras
+# usadas pelos gráficos
+DIMENSIONS = ['Order_Date', 'Road_traffic_density', 'City',
+              'Weatherconditions', 'Type_of_order', 'Festival']
+
+# Dimensões em que os sketches (entregadores distintos e percentis) são mantidos
+SKETCH_DIMENSIONS = ['Order_Date', 'Road_traffic_density', 'City']
+
+# Medidas numéricas com estatísticas suficientes em cada célula
+MEASURES = ['Time_taken(min)', 'Delivery_person_Ratings', 'distance',
+            'Delivery_person_Age', 'Vehicle_condition']
+
+# Medidas com histograma para percentis
+QUANTILE_MEASURES = ['Time_taken(min)']
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+# ===================================
+#               Classes
+# ===================================
+
+
+class Cube:
+    """
+    Cubo de agregados dos pedidos.
+      - cells: uma linha por combinação das DIMENSIONS com a contagem de
+        pedidos e, para cada medida, soma, soma dos quadrados, mínimo e máximo
+      - sketch_keys: uma linha por combinação das SKETCH_DIMENSIONS
+      - distinct_registers: HyperLogLog dos entregadores, um por linha de sketch_keys
+      - histograms: histograma de cada QUANTILE_MEASURES, um por linha de sketch_keys
+      - stats_cache: estatísticas já calculadas por group_stats, por dimensões
+    """
+
+    def __init__(self, cells, sketch_keys, distinct_registers, histograms):
+        self.cells = cells
+        self.sketch_keys = sketch_keys
+        self.distinct_registers = distinct_registers
+        self.histograms = histograms
+        self.stats_cache = {}
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def _week_of_year(dates):
+    """
+    Semana do ano no mesmo formato usado pelos gráficos ('%U'), formatada uma
+    vez por dia distinto
+    """
+    codes, days = pd.factorize(dates)
+    return pd.Series(np.asarray(days.strftime( "%U" ), dtype = object)[codes], index = dates.index)
+
+def _group_keys(keys, groups):
+    """
+    Uma linha de chaves por código de grupo (na ordem dos códigos), com a
+    semana do ano
+    """
+    group_keys = ( keys.assign(group = groups)
+                       .drop_duplicates('group')
+                       .sort_values('group')
+                       .drop(columns = 'group')
+                       .reset_index(drop = True) )
+    group_keys['week_of_year'] = _week_of_year(group_keys['Order_Date'])
+    return group_keys
+
+def _combine_rows(ufunc, rows_a, rows_b, groups_a, groups_b, n_groups):
+    """
+    Combina as linhas de dois cubos por código de grupo (0 a n_groups - 1)
+    com ufunc (np.maximum, np.add). As chaves de cada cubo são únicas, então
+    cada grupo recebe no máximo uma linha de cada lado: as linhas de rows_a
+    são copiadas e as de rows_b reduzidas sobre elas em operações vetorizadas
+    """
+    combined = np.zeros((n_groups, rows_a.shape[1]), dtype = rows_a.dtype)
+    combined[groups_a] = rows_a
+    combined[groups_b] = ufunc(combined[groups_b], rows_b)
+    return combined
+
+def build_cube(df1):
+    """
+    Recebe como parâmetro o dataframe limpo e retorna o cubo de agregados,
+    a partir do qual todos os gráficos de contagem, média e desvio padrão
+    podem ser respondidos sem voltar às linhas
+    """
+    cells = sufficient_stats(df1, DIMENSIONS, MEASURES)
+    cells['week_of_year'] = _week_of_year(cells['Order_Date'])
+
+    # Sketches por dia, trânsito e cidade: HyperLogLog dos entregadores e
+    # histogramas dos tempos
+    groups = df1.groupby(SKETCH_DIMENSIONS, observed = True, sort = False).ngroup().to_numpy()
+    sketch_keys = _group_keys(df1.loc[:, SKETCH_DIMENSIONS], groups)
+    registers = hll_registers(hash_values(df1['Delivery_person_ID']), groups, len(sketch_keys))
+    histograms = {measure: hist_counts(df1[measure].to_numpy(), groups, len(sketch_keys))
+                  for measure in QUANTILE_MEASURES}
+
+    return Cube(cells, sketch_keys, registers, histograms)
+
+def merge_cubes(cube_a, cube_b):
+    """
+    Une dois cubos (por exemplo, o cubo do histórico e o de um lote novo):
+    contagens e somas são somadas, mínimos e máximos combinados e os
+    sketches das mesmas chaves unidos
+    """
+    cells = merge_stats(concat_frames([cube_a.cells, cube_b.cells]), DIMENSIONS, MEASURES)
+    cells['week_of_year'] = _week_of_year(cells['Order_Date'])
+
+    keys = concat_frames([cube_a.sketch_keys, cube_b.sketch_keys])
+    groups = keys.groupby(SKETCH_DIMENSIONS, observed = True, sort = False).ngroup().to_numpy()
+    sketch_keys = _group_keys(keys.loc[:, SKETCH_DIMENSIONS], groups)
+
+    # HyperLogLog: máximo dos registradores; histogramas: soma das contagens
+    groups_a, groups_b = groups[:len(cube_a.sketch_keys)], groups[len(cube_a.sketch_keys):]
+    registers = _combine_rows(np.maximum, cube_a.distinct_registers, cube_b.distinct_registers,
+                              groups_a, groups_b, len(sketch_keys))
+    histograms = {measure: _combine_rows(np.add, cube_a.histograms[measure], cube_b.histograms[measure],
+                                         groups_a, groups_b, len(sketch_keys))
+                  for measure in QUANTILE_MEASURES}
+
+    return Cube(cells, sketch_keys, registers, histograms)
+
+def load_cube(path = DATASET_PATH):
+    """
+    Retorna o cubo de agregados do dataset, construído uma vez por processo e
+    por versão do arquivo, assim como load_data. Quando só chegaram lotes
+    incrementais novos, o cubo dos lotes é construído e unido ao já existente,
+    sem recalcular o histórico. Quando a leitura em blocos (utils.stream)
+    gravou o cubo do CSV atual, ele é usado no lugar da agregação do dataset
+    completo, e só os lotes são agregados
+    """
+    # Importação aqui: utils.stream usa build_cube e merge_cubes deste módulo
+    from utils.stream import read_stream_cube
+
+    version = source_version(path)
+    names = batch_names(path)
+
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == version and cached[1] == names:
+            return cached[2]
+
+    start = time.perf_counter()
+    if cached is not None and cached[0] == version and names[:len(cached[1])] == cached[1]:
+        new_names = names[len(cached[1]):]
+        cube = merge_cubes(cached[2], build_cube(concat_frames(read_batches(path, new_names))))
+        mode = 'merge'
+    else:
+        cube = read_stream_cube(path)
+        mode = 'stream'
+        if cube is not None and names:
+            cube = merge_cubes(cube, build_cube(concat_frames(read_batches(path, names))))
+        elif cube is None:
+            dataset = load_data(path)
+            start = time.perf_counter()
+            # Um cubo por segmento (base e lotes), sem concatenar as linhas
+            cube = build_cube(dataset.segments[0])
+            for segment in dataset.segments[1:]:
+                cube = merge_cubes(cube, build_cube(segment))
+            mode = 'full'
+    observe('curry_cube_build_seconds', time.perf_counter() - start, mode = mode)
+
+    with _cache_lock:
+        _cache[path] = (version, names, cube)
+
+    return cube
+
+def filter_cube(cube, date_slider, traffic_options):
+    """
+    Recebe como parâmetro o cubo, a data limite e a lista de tipos de trânsito
+    e retorna um novo cubo só com as células selecionadas
+    """
+    cells = cube.cells
+    linhas_selecionadas = ( (cells['Order_Date'] < date_slider) &
+                            (cells['Road_traffic_density'].isin( traffic_options )) )
+
+    keys = cube.sketch_keys
+    chaves_selecionadas = ( (keys['Order_Date'] < date_slider) &
+                            (keys['Road_traffic_density'].isin( traffic_options )) ).to_numpy()
+
+    return Cube(cells.loc[linhas_selecionadas, :],
+                keys.loc[chaves_selecionadas, :].reset_index(drop = True),
+                cube.distinct_registers[chaves_selecionadas],
+                {measure: counts[chaves_selecionadas] for measure, counts in cube.histograms.items()})
+
+def order_count(cube, dims):
+    """
+    Retorna um dataframe com a quantidade de pedidos ('count') por dimensões
+    """
+    return group_stats(cube, dims, []).reset_index(drop = True)
+
+def distinct_count(cube, by = None):
+    """
+    Estimativa (HyperLogLog) da quantidade de entregadores distintos.
+    Sem o parâmetro by, retorna um inteiro para todo o cubo; com by (uma
+    coluna de sketch_keys, por exemplo 'week_of_year'), retorna um
+    dataframe com a estimativa por valor da coluna
+    """
+    if by is None:
+        return hll_estimate(hll_merge(cube.distinct_registers))
+
+    rows = cube.sketch_keys.groupby(by, observed = True).indices
+    df_aux = pd.DataFrame({
+        # Com o tipo da coluna de origem, também quando o cubo filtrado está vazio
+        by: pd.Series(list(rows.keys()), dtype = cube.sketch_keys[by].dtype),
+        'distinct': [hll_estimate(hll_merge(cube.distinct_registers[idx])) for idx in rows.values()]
+    })
+    return df_aux.sort_values(by).reset_index(drop = True)
@@ -0,0 +1,592 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.geo import add_distance
+from utils.telemetry import inc, observe
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+DATASET_PATH = './datasets/train.csv'
+
+# Versão do formato do cache em disco. Deve ser incrementada sempre que a
+# preparação (prepare_data) mudar o conteúdo ou os tipos do dataframe gerado
+CACHE_FORMAT_VERSION = '7'
+
+# Colunas de texto com poucos valores distintos, lidas como categóricas
+CATEGORICAL_COLUMNS = ['City', 'Road_traffic_density', 'Weatherconditions',
+                       'Type_of_order', 'Type_of_vehicle', 'Festival',
+                       'Delivery_person_ID', 'Time_Orderd', 'Time_Order_picked']
+
+# Colunas inteiras, guardadas no menor tipo inteiro que comporta os valores
+INTEGER_COLUMNS = ['Delivery_person_Age', 'Vehicle_condition', 'multiple_deliveries', 'Time_taken(min)']
+
+# Coordenadas em float32: precisão de ~0,2 m, suficiente para distâncias em km
+COORDINATE_COLUMNS = ['Restaurant_latitude', 'Restaurant_longitude',
+                      'Delivery_location_latitude', 'Delivery_location_longitude']
+
+# O ID do pedido é quase sempre único e não se beneficia de categorias: com
+# o pyarrow, o texto fica em um único buffer contíguo em vez de um objeto por linha
+ID_DTYPE = 'string[pyarrow]' if pa is not None else object
+
+# Tipos declarados na leitura do CSV: textos repetidos como categorias (o
+# tempo de entrega, '(min) 24', tem poucas dezenas de valores), números como
+# números e o ID já no tipo final
+RAW_DTYPES = {col: 'category' for col in CATEGORICAL_COLUMNS + ['Time_taken(min)']}
+RAW_DTYPES.update({'Delivery_person_Age': 'float32', 'Delivery_person_Ratings': 'float64',
+                   'multiple_deliveries': 'float32', 'Vehicle_condition': 'int8', 'ID': ID_DTYPE})
+
+# Marcadores de valor ausente do dataset, convertidos em NaN já na leitura.
+# São declarados por coluna: nas demais (Road_traffic_density, Time_Orderd),
+# o texto 'NaN ' continua sendo um valor, como no dataset original
+RAW_NA_VALUES = {'Delivery_person_Age': ['NaN ', 'NaN'],
+                 'Delivery_person_Ratings': ['NaN ', 'NaN'],
+                 'multiple_deliveries': ['NaN ', 'NaN'],
+                 'Weatherconditions': ['conditions NaN'],
+                 'Festival': ['NaN ', 'NaN'],
+                 'City': ['NaN ', 'NaN']}
+
+# Colunas das partições do dataset: as linhas de cada arquivo colunar (base e
+# lotes) ficam ordenadas por dia e tipo de trânsito, e cada combinação ocupa
+# um intervalo contíguo do arquivo
+PARTITION_COLUMNS = ['Order_Date', 'Road_traffic_density']
+
+# Com CURRY_SHARED_DATASET=0, cada processo guarda a própria cópia do
+# dataframe (modo anterior); no padrão, as colunas numéricas e o ID ficam no
+# arquivo colunar mapeado em memória, compartilhado por todos os processos
+SHARED_DATASET = os.environ.get('CURRY_SHARED_DATASET', '1') != '0'
+
+# Chaves usadas nos metadados do arquivo colunar para guardar a versão da
+# fonte e os lotes incrementais já incorporados
+_METADATA_KEY = b'curry_source_version'
+_BATCHES_KEY = b'curry_batches'
+
+# Cache do processo: caminho do arquivo -> (versão do CSV, lotes, Dataset).
+# É o identificador da versão em uso, trocado de uma vez só sob _cache_lock
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+# ===================================
+#               Classes
+# ===================================
+
+
+class Dataset:
+    """
+    Dataset carregado por load_data: o arquivo colunar base e os lotes
+    incrementais, cada um mapeado em memória como um dataframe separado.
+    Os segmentos nunca são concatenados no processo, então o histórico
+    continua sendo uma única cópia na memória da máquina.
+      - segments: dataframes limpos (base e lotes, na ordem de ingestão); o
+        índice de cada lote continua a numeração do anterior, como em
+        concat_frames, para que os rótulos do dataset sejam únicos
+      - partitions: índice de partições (partition_index) de cada segmento,
+        ou None para um segmento que não está ordenado pelas partições
+      - next_label: rótulo do índice do próximo lote acrescentado
+    """
+
+    def __init__(self, segments, partitions, next_label):
+        self.segments = tuple(segments)
+        self.partitions = tuple(partitions)
+        self.next_label = next_label
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def append(self, frames):
+        """
+        Retorna um novo Dataset com os lotes frames acrescentados como
+        segmentos, com o índice renumerado após o último segmento e o índice
+        de partições de cada lote. Os segmentos já carregados são
+        reaproveitados sem cópia: o custo depende só do tamanho dos lotes
+        """
+        segments, partitions, label = list(self.segments), list(self.partitions), self.next_label
+        for frame in frames:
+            if not len(frame):
+                continue
+            # Cópia rasa: as colunas continuam apontando para o arquivo mapeado
+            frame = frame.copy(deep = False)
+            frame.index = pd.RangeIndex(label, label + len(frame))
+            label += len(frame)
+            segments.append(frame)
+            partitions.append(partition_index(frame))
+        return Dataset(segments, partitions, label)
+
+    def to_frame(self, columns = None):
+        """
+        Concatena os segmentos (só as colunas informadas, ou todas) em um
+        único dataframe. O resultado é uma cópia privada do processo: serve
+        para quem monta estruturas próprias a partir de todas as linhas,
+        como os índices espaciais
+        """
+        segments = [segment if columns is None else segment.loc[:, columns] for segment in self.segments]
+        return concat_frames(segments, renumber = False)
+
+    def rows(self, ids):
+        """
+        Retorna as linhas com os rótulos ids do índice, na ordem de ids
+        """
+        ids = np.asarray(ids)
+
+        # Os rótulos do arquivo base vêm antes do primeiro rótulo de cada lote
+        bounds = [segment.index[0] for segment in self.segments[1:]]
+        owner = np.searchsorted(bounds, ids, side = 'right')
+        pieces = [segment.loc[ids[owner == i], :] for i, segment in enumerate(self.segments)]
+        return concat_frames(pieces, renumber = False).loc[ids, :]
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def read_raw(path = DATASET_PATH, **kwargs):
+    """
+    Lê o CSV bruto já declarando os tipos das colunas (RAW_DTYPES) e os
+    marcadores de valor ausente (RAW_NA_VALUES): os textos com poucos valores
+    distintos viram categorias, evitando milhares de strings repetidas, e as
+    colunas numéricas chegam como números
+    """
+    return pd.read_csv(path, dtype = RAW_DTYPES, na_values = RAW_NA_VALUES, **kwargs)
+
+def raw_types(df):
+    """
+    Recebe como parâmetro um dataframe bruto que não veio de read_raw (por
+    exemplo, gerado em memória, com todas as colunas como texto) e retorna
+    uma cópia com os mesmos marcadores de ausência e tipos de read_raw
+    """
+    df = df.copy()
+    for col, markers in RAW_NA_VALUES.items():
+        df[col] = df[col].mask(df[col].isin(markers))
+    return df.astype(RAW_DTYPES)
+
+def _strip_categories(serie):
+    """
+    Remove os espaços das categorias de uma coluna categórica, trabalhando só
+    sobre as categorias (poucos valores) e não sobre cada linha
+    """
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+
+    serie = serie.cat.remove_unused_categories()
+    categories = serie.cat.categories.str.strip()
+
+    if categories.is_unique:
+        return serie.cat.rename_categories(categories)
+
+    # Categorias que só diferem por espaços precisam ser unificadas
+    return serie.astype(str).str.strip().astype('category')
+
+def clean_code(df1):
+
+    """
+     Esta função tem a responsabilidade de limpar o dataframe
+     Tipos de limpeza:
+      1. Remoção dos dados NaN
+      2. Mudança do tipo de coluna de dados
+      3. Remoção dos espaços vazios das variáveis de texto
+      2. Formatação da coluna de data
+      2. Limpeza da coluna de tempo (remoção do texto da variável numérica)
+      3. Tipos compactos: inteiros reduzidos, coordenadas em float32 e
+         categorias para os textos repetidos
+
+      Input: Dataframe
+      Output: Dataframe
+    """
+
+    # 1 - Selecionando as linhas sem valores ausentes (os marcadores 'NaN ' já
+    #     chegam como NaN de read_raw)
+    df1 = df1.loc[df1[list(RAW_NA_VALUES)].notna().all(axis = 1), :].copy()
+
+    # 2 - Convertendo as colunas Delivery_person_Age, multiple_deliveries e
+    #     Vehicle_condition (lidas como números) para o menor tipo inteiro
+    for col in ['Delivery_person_Age', 'multiple_deliveries', 'Vehicle_condition']:
+        df1[col] = pd.to_numeric( df1[col], downcast = 'integer' )
+
+    # 3 - Delivery_person_Ratings já é lida como float
+
+    # 4 - Convertendo a coluna Order_Date para datetime
+    df1['Order_Date'] = pd.to_datetime( df1['Order_Date'], format='%d-%m-%Y' )
+
+    # 5 - Limpando a coluna time taken ('(min) 24' -> 24) só nas categorias
+    #     (poucos valores), como _strip_categories, e não em cada linha. As
+    #     categorias das linhas removidas no passo 1 são descartadas antes, e
+    #     cada linha recebe o número da sua categoria pelo código ('(min) 24'
+    #     e '(min) 24 ' viram o mesmo valor)
+    tempo = df1['Time_taken(min)'].astype('category').cat.remove_unused_categories()
+    minutos = pd.to_numeric( pd.Series( tempo.cat.categories.str.removeprefix( '(min) ' ) ), downcast = 'integer' )
+    df1['Time_taken(min)'] = pd.Series( minutos.to_numpy()[tempo.cat.codes.to_numpy()], index = df1.index )
+
+    # 6 - Removendo os espaços dentro de strings (o ID já vem como ID_DTYPE)
+    df1['ID'] = df1['ID'].str.strip().astype( ID_DTYPE )
+    for col in ['Road_traffic_density', 'Type_of_order', 'Type_of_vehicle', 'City', 'Festival']:
+        df1[col] = _strip_categories( df1[col] )
+
+    # 7 - Descartando as categorias que só existiam nas linhas removidas ('conditions NaN', ...)
+    for col in ['Weatherconditions', 'Delivery_person_ID', 'Time_Orderd', 'Time_Order_picked']:
+        df1[col] = df1[col].astype('category').cat.remove_unused_categories()
+
+    # 8 - Coordenadas em float32
+    for col in COORDINATE_COLUMNS:
+        df1[col] = df1[col].astype('float32')
+
+    return df1
+
+def prepare_data(df):
+    """
+    Recebe como parâmetro o dataframe bruto e retorna o dataframe pronto para
+    as páginas: limpo e com as colunas derivadas (distância) já calculadas
+    """
+    df1 = clean_code(df)
+    df1 = add_distance(df1)
+    return df1
+
+def source_version(path = DATASET_PATH):
+    """
+    Recebe como parâmetro o caminho do dataset e retorna uma tupla
+    (mtime em nanossegundos, tamanho em bytes) que identifica a versão do arquivo.
+    Qualquer alteração no arquivo gera uma versão diferente
+    """
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def batches_dir(path = DATASET_PATH):
+    """
+    Diretório com os lotes incrementais já limpos (um arquivo colunar por lote)
+    """
+    return os.path.join(os.path.dirname(path), 'batches')
+
+def read_manifest(path = DATASET_PATH):
+    """
+    Retorna a lista de lotes incrementais já ingeridos, na ordem de ingestão
+    """
+    manifest_path = os.path.join(batches_dir(path), 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return []
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def batch_names(path = DATASET_PATH):
+    """
+    Retorna uma tupla com os nomes dos lotes incrementais já ingeridos
+    """
+    return tuple(entry['name'] for entry in read_manifest(path))
+
+def batch_path(path, name):
+    """
+    Caminho do arquivo colunar de um lote incremental
+    """
+    return os.path.join(batches_dir(path), name + '.feather')
+
+def dataset_version(path = DATASET_PATH):
+    """
+    Retorna a versão completa do dataset: a versão do CSV base seguida dos
+    nomes dos lotes incrementais ingeridos (ver utils.ingest)
+    """
+    return source_version(path) + (batch_names(path),)
+
+def columnar_path(path = DATASET_PATH):
+    """
+    Recebe como parâmetro o caminho do CSV e retorna o caminho do arquivo
+    colunar (Feather) com o dataframe limpo, salvo ao lado do CSV
+    """
+    return os.path.splitext(path)[0] + '.feather'
+
+def _version_tag(version):
+    """
+    Converte a versão do CSV em bytes para gravação nos metadados do arquivo colunar
+    """
+    return '{}:{}:{}'.format(CACHE_FORMAT_VERSION, *version).encode()
+
+def _to_pandas(table):
+    """
+    Converte a tabela lida com memory map em dataframe. Com SHARED_DATASET,
+    cada coluna numérica vira um array somente leitura apontando direto para
+    o arquivo mapeado (sem cópia), e o texto do ID continua no buffer do
+    Arrow (ver ID_DTYPE). Só os códigos das categorias e o índice são copiados
+    """
+    types_mapper = {pa.string(): pd.StringDtype('pyarrow')}.get
+    if not SHARED_DATASET:
+        return table.to_pandas(types_mapper = types_mapper)
+    return table.to_pandas(types_mapper = types_mapper, split_blocks = True)
+
+def _open_columnar(path, version = None):
+    """
+    Abre o arquivo colunar com memory map e retorna uma tupla (metadados,
+    tabela), ou None quando o arquivo não existe ou foi gerado a partir de
+    outra versão do CSV. Com version = None, a versão de origem não é conferida
+    """
+    if pa is None or not os.path.exists(path):
+        return None
+
+    try:
+        source = pa.memory_map(path, 'r')
+        reader = pa.ipc.open_file(source)
+        metadata = reader.schema.metadata or {}
+        if version is not None and metadata.get(_METADATA_KEY) != _version_tag(version):
+            return None
+        return metadata, reader.read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+def read_columnar(path, version = None):
+    """
+    Lê o arquivo colunar com memory map e retorna o dataframe limpo, ou None
+    quando o arquivo não existe ou foi gerado a partir de outra versão do CSV.
+    Com version = None, a versão de origem não é conferida
+    """
+    opened = _open_columnar(path, version)
+    if opened is None:
+        return None
+    return _to_pandas(opened[1])
+
+def read_snapshot(path = DATASET_PATH, version = None):
+    """
+    Lê o arquivo colunar do dataset (CSV base e lotes já incorporados) e
+    retorna uma tupla (nomes dos lotes incorporados, dataframe limpo), ou
+    None quando o arquivo não existe ou foi gerado a partir de outra versão do CSV
+    """
+    opened = _open_columnar(columnar_path(path), version)
+    if opened is None:
+        return None
+    metadata, table = opened
+    return tuple(json.loads(metadata.get(_BATCHES_KEY, b'[]'))), _to_pandas(table)
+
+def write_columnar(df1, path, version, batches = ()):
+    """
+    Grava o dataframe limpo em formato colunar (Feather sem compressão, para
+    permitir memory map), registrando nos metadados a versão do CSV de origem
+    e os lotes incrementais incorporados. Tudo vai em um único bloco de
+    registros, para que a leitura não precise concatenar (copiar) as colunas.
+    A escrita é feita em um arquivo temporário e substituída de forma atômica:
+    quem já mapeou o arquivo anterior continua lendo a versão antiga até
+    trocar de versão
+    """
+    if pa is None:
+        return
+
+    # Colunas com vários blocos (ID de dataframes concatenados) são unidas
+    table = pa.Table.from_pandas(df1).combine_chunks()
+    metadata = dict(table.schema.metadata or {})
+    metadata[_METADATA_KEY] = _version_tag(version)
+    metadata[_BATCHES_KEY] = json.dumps(list(batches)).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        feather.write_feather(table, tmp_path, compression = 'uncompressed',
+                              chunksize = max(len(df1), 1))
+        os.replace(tmp_path, path)
+    except OSError:
+        # Diretório somente leitura: segue sem o cache em disco
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def concat_frames(frames, renumber = True):
+    """
+    Concatena dataframes limpos mantendo as colunas categóricas (unindo as
+    categorias de todos eles). Com renumber, o índice de cada dataframe é
+    renumerado após o anterior, para que o índice continue único; sem ele,
+    os rótulos (já únicos, como os dos segmentos de um Dataset) são mantidos
+    """
+    # Cópias rasas: as colunas e o índice são substituídos, nunca alterados
+    frames = [df.copy(deep = False) for df in frames]
+
+    for col in CATEGORICAL_COLUMNS:
+        if all(col in df and isinstance(df[col].dtype, pd.CategoricalDtype) for df in frames):
+            categories = pd.api.types.union_categoricals([df[col] for df in frames]).categories
+            for df in frames:
+                df[col] = df[col].cat.set_categories(categories)
+
+    if renumber:
+        start = frames[0].index.max() + 1 if len(frames[0]) else 0
+        for df in frames[1:]:
+            df.index = pd.RangeIndex(start, start + len(df))
+            start += len(df)
+
+    return pd.concat(frames)
+
+def sort_partitions(df1):
+    """
+    Ordena o dataframe limpo pelas colunas das partições (dia e tipo de
+    trânsito), mantendo o índice e a ordem original dentro de cada partição
+    """
+    return df1.sort_values(PARTITION_COLUMNS, kind = 'mergesort')
+
+def partition_index(df1):
+    """
+    Recebe como parâmetro o dataframe limpo, ordenado por sort_partitions, e
+    retorna um dataframe com uma linha por partição: dia, tipo de trânsito e
+    o intervalo de linhas [start, stop). Retorna None quando as linhas não
+    estão ordenadas pelas partições
+    """
+    dates = df1['Order_Date'].to_numpy()
+    traffic = df1['Road_traffic_density']
+    if not isinstance(traffic.dtype, pd.CategoricalDtype) or not len(df1):
+        return None
+    codes = traffic.cat.codes.to_numpy()
+
+    change = np.flatnonzero((dates[1:] != dates[:-1]) | (codes[1:] != codes[:-1])) + 1
+    starts = np.concatenate([[0], change])
+    stops = np.concatenate([change, [len(df1)]])
+
+    # Cada partição precisa vir depois da anterior (dia e, no mesmo dia, código)
+    first_dates, first_codes = dates[starts], codes[starts]
+    ordered = ( (first_dates[1:] > first_dates[:-1]) |
+                ((first_dates[1:] == first_dates[:-1]) & (first_codes[1:] > first_codes[:-1])) )
+    if not ordered.all():
+        return None
+
+    return pd.DataFrame({'Order_Date': first_dates,
+                         'Road_traffic_density': traffic.cat.categories[first_codes],
+                         'start': starts,
+                         'stop': stops})
+
+def read_batches(path, names):
+    """
+    Lê os arquivos colunares dos lotes incrementais informados
+    """
+    return [read_columnar(batch_path(path, name)) for name in names]
+
+def load_data(path = DATASET_PATH):
+    """
+    Retorna o Dataset (ver a classe) do dataset informado.
+    O CSV base limpo fica no arquivo colunar salvo ao lado do CSV, mapeado
+    em memória por todos os processos do servidor: as colunas ocupam uma
+    única cópia na memória da máquina, independente da quantidade de
+    processos e sessões. Esse arquivo só é refeito quando o CSV muda
+    (leitura e limpeza completas). Os lotes incrementais continuam nos
+    próprios arquivos colunares (ver utils.ingest), também mapeados, e
+    entram como segmentos separados: nenhum processo concatena o histórico,
+    e a chegada de um lote novo só mapeia o arquivo dele.
+    Dentro do processo, a versão em uso só é trocada depois que a nova está
+    pronta; execuções em andamento continuam com a versão anterior.
+    As linhas de cada arquivo ficam ordenadas por dia e tipo de trânsito
+    (partições), de forma que filter_data lê só os intervalos selecionados
+    pelos filtros. O resultado é compartilhado e somente leitura: use
+    filter_data para obter um dataframe filtrado
+    """
+    version = source_version(path)
+    names = batch_names(path)
+
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == version and cached[1] == names:
+            return cached[2]
+
+        start = time.perf_counter()
+        if cached is not None and cached[0] == version and names[:len(cached[1])] == cached[1]:
+            # Mesmo CSV: os segmentos já carregados são mantidos e só os lotes
+            # novos são mapeados, com custo proporcional ao tamanho deles
+            included, dataset = cached[1], cached[2]
+            source = 'batches'
+        else:
+            snapshot = read_snapshot(path, version)
+            if snapshot is not None and names[:len(snapshot[0])] == snapshot[0]:
+                included, df1 = snapshot
+                source = 'columnar'
+            else:
+                included, df1 = (), sort_partitions(prepare_data(read_raw(path)))
+                source = 'csv'
+
+                # Grava o CSV base limpo e passa a usar a versão mapeada do
+                # arquivo, compartilhada com os outros processos
+                write_columnar(df1, columnar_path(path), version)
+                snapshot = read_snapshot(path, version)
+                if snapshot is not None and not snapshot[0]:
+                    df1 = snapshot[1]
+
+            dataset = Dataset([df1], [partition_index(df1)], df1.index.max() + 1 if len(df1) else 0)
+
+        dataset = dataset.append(read_batches(path, names[len(included):]))
+
+        _cache[path] = (version, names, dataset)
+        observe('curry_data_load_seconds', time.perf_counter() - start, source = source)
+
+    return dataset
+
+def compact_batches(path = DATASET_PATH):
+    """
+    Incorpora os lotes incrementais ao arquivo colunar base: o dataset
+    completo é ordenado pelas partições e regravado uma única vez, e os
+    processos que carregarem a versão seguinte mapeiam menos arquivos.
+    É opcional (os lotes já são mapeados sem cópia) e o custo é proporcional
+    ao histórico: python -m utils.ingest --compact.
+    Retorna a quantidade de lotes incorporados
+    """
+    version = source_version(path)
+    names = batch_names(path)
+    df1 = sort_partitions(load_data(path).to_frame())
+    write_columnar(df1, columnar_path(path), version, names)
+    return len(names)
+
+def _filter_segment(df1, partitions, date_slider, traffic_options):
+    """
+    Filtra um dataframe limpo: pelos intervalos das partições selecionadas,
+    quando há índice de partições, ou pela máscara sobre todas as linhas
+    """
+    if partitions is not None:
+        selecionadas = partitions.loc[ (partitions['Order_Date'] < date_slider) &
+                                       (partitions['Road_traffic_density'].isin( traffic_options )) ]
+        starts, stops = selecionadas['start'].to_numpy(), selecionadas['stop'].to_numpy()
+        if not len(starts):
+            return df1.iloc[:0].copy()
+
+        # Partições vizinhas (todos os tipos de trânsito de dias seguidos)
+        # formam um único intervalo, copiado sem lista de posições
+        novo = np.concatenate([[True], starts[1:] != stops[:-1]])
+        starts, stops = starts[novo], stops[np.concatenate([novo[1:], [True]])]
+        if len(starts) == 1:
+            return df1.iloc[starts[0]:stops[0]].copy()
+
+        return df1.take(np.concatenate([np.arange(start, stop) for start, stop in zip(starts, stops)]))
+
+    linhas_selecionadas = ( (df1['Order_Date'] < date_slider) &
+                            (df1['Road_traffic_density'].isin( traffic_options )) )
+    return df1.loc[linhas_selecionadas, :].copy()
+
+def filter_data(df1, date_slider, traffic_options):
+    """
+    Recebe como parâmetro o Dataset de load_data (ou um dataframe limpo), a
+    data limite e a lista de tipos de trânsito selecionados na sidebar e
+    retorna um dataframe filtrado.
+    Em cada segmento do Dataset, os filtros são aplicados às partições: só
+    as linhas dos dias anteriores à data limite e dos tipos de trânsito
+    selecionados são lidas, sem percorrer o restante do dataset, e só essas
+    linhas são copiadas. O resultado é o mesmo da máscara aplicada a todas
+    as linhas, na ordem dos segmentos. Em um dataframe, ou em um segmento
+    sem índice de partições, a máscara é aplicada; o contador
+    curry_filter_calls_total{mode="mask"} registra esses casos
+    """
+    if not isinstance(df1, Dataset):
+        inc('curry_filter_calls_total', mode = 'mask')
+        return _filter_segment(df1, None, date_slider, traffic_options)
+
+    pruned = all(partitions is not None for partitions in df1.partitions)
+    inc('curry_filter_calls_total', mode = 'partitions' if pruned else 'mask')
+    pieces = [_filter_segment(segment, partitions, date_slider, traffic_options)
+              for segment, partitions in zip(df1.segments, df1.partitions)]
+    if len(pieces) == 1:
+        return pieces[0]
+    return concat_frames(pieces, renumber = False)
@@ -0,0 +1,276 @@
+"""
+Gráficos das páginas, montados a partir do cubo de agregados ou de dados já
+agregados. Ficam fora das páginas para que o aquecimento do cache
+(utils.warmup) possa calculá-los sem uma sessão do Streamlit.
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from utils.cube import order_count
+from utils.metrics import avg_distance, orders_by_week_person, time_avg_std, time_percentiles
+from utils.timeseries import auto_granularity, downsample, granularity_name, period_sum, render_mode
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Tamanho do mapa da Visão Geográfica, em pixels (o padrão do folium_static)
+MAP_WIDTH = 700
+MAP_HEIGHT = 500
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+# ----- Visão Empresa -----
+
+def order_metric(cube):
+    """
+    Esta função recebe como parâmetro o cubo de agregados e retorna um gráfico de barras da 
+    quantidade de pedidos feitos por dia. Em períodos longos, as barras passam a ser por
+    semana ou mês, com no máximo SERIES_MAX_POINTS barras
+    """
+    df_aux = order_count(cube, ['Order_Date'])
+    granularidade = auto_granularity(df_aux['Order_Date'])
+    df_aux = downsample(period_sum(df_aux, 'Order_Date', 'count', granularidade), 'Order_Date', 'count')
+
+    fig = px.bar(df_aux, x = 'Order_Date', y = 'count')
+    fig.update_layout(
+        title = {
+            'text': 'Quantidade de Pedidos por {}'.format(granularity_name(granularidade)),
+            'y': 0.95,
+            'x': 0.5,
+            'xanchor': 'center',
+            'yanchor': 'top',
+            'font': {'size': 16}
+        }
+    )
+    fig.update_xaxes(title_text = None)
+    fig.update_yaxes(title_text = None)
+    return fig
+
+def traffic_order_share_pie(cube):
+    """
+    Esta função recebe como parâmetro o cubo de agregados e retorna um gráfico de pizza da
+    distribuição da quantidade de pedidos por tipo de tráfego
+    """
+    df_aux = order_count(cube, ['Road_traffic_density'])
+
+    # Criando uma coluna com a porcentagem
+    df_aux['perc_ID'] = 100 * (df_aux['count'] / df_aux['count'].sum())
+
+    # Formatando o gráfico
+    fig = px.pie( df_aux, values = 'perc_ID', names = 'Road_traffic_density')
+    fig.update_layout(
+    title = {
+        'text': 'Quantidade de Pedidos por Tráfego',
+        'y': 0.95,
+        'x': 0.5,
+        'xanchor': 'center',
+        'yanchor': 'top',
+        'font': {'size': 16}
+        },
+    legend = dict(orientation="h", yanchor="bottom", y = -0.15, xanchor="center", x=0.5)
+    )
+    fig.update_traces(
+        hovertemplate="Tipo de tráfego: %{label}")
+    return fig
+
+def traffic_order_share_scatter(cube):
+    """
+    Esta função recebe como parâmetro o cubo de agregados e retorna um gráfico de bolha da
+    quantidade de pedidos por cidade e tipo de tráfego
+    """
+    df_aux = order_count(cube, ['City', 'Road_traffic_density'])
+    fig = px.scatter(df_aux, x = 'City', y = 'Road_traffic_density', size = 'count')
+    fig.update_layout(
+        title = {
+            'text': 'Quantidade de Pedidos por Cidade e Tráfego',
+            'y': 0.95,
+            'x': 0.5,
+            'xanchor': 'center',
+            'yanchor': 'top',
+            'font': {'size': 16}
+        }
+    )
+    return fig
+    
+def order_by_week(cube):
+    """
+    Esta função recebe como parâmetro o cubo de agregados e retorna um gráfico de linhas da
+    quantidade de pedidos por semana. Com mais de um ano de dados, as semanas são
+    identificadas pela data de início (ou passam a ser meses, em períodos longos)
+    """ 
+    df_aux = order_count(cube, ['Order_Date'])
+    granularidade = auto_granularity(df_aux['Order_Date'], minimum = 'W')
+
+    if granularidade == 'W' and df_aux['Order_Date'].dt.year.nunique() <= 1:
+        # Um único ano: semanas no formato '%U', como na versão original
+        x = 'week_of_year'
+        df_aux = order_count(cube, ['week_of_year'])
+    else:
+        x = 'Order_Date'
+        df_aux = downsample(period_sum(df_aux, 'Order_Date', 'count', granularidade), 'Order_Date', 'count')
+
+    fig = px.line(df_aux, x = x, y = 'count', render_mode = render_mode(len(df_aux)))
+    fig.update_layout(
+        title = {
+            'text': 'Quantidade de Pedidos por {}'.format(granularity_name(granularidade)),
+            'y': 0.95,
+            'x': 0.5,
+            'xanchor': 'center',
+            'yanchor': 'top',
+            'font': {'size': 16}
+        }
+    )
+    return fig
+
+def order_by_week_person(cube):
+    """
+    Esta função recebe como parâmetro o cubo de agregados e retorna um gráfico de linhas da
+    quantidade de pedidos por semana e por entregador (entregadores distintos
+    estimados pelo HyperLogLog do cubo)
+    """
+    df_aux = orders_by_week_person(cube)
+
+    # Grafico
+    fig = px.line(df_aux, x = 'week_of_year', y = 'order_by_delivery')
+    fig.update_layout(
+        title = {
+            'text': 'Quantidade de Pedidos por Entregador por Semana',
+            'y': 0.95,
+            'x': 0.5,
+            'xanchor': 'center',
+            'yanchor': 'top',
+            'font': {'size': 16}
+        }
+    )
+    return fig
+
+def map_html(locations):
+    """
+    Esta função recebe como parâmetro uma tupla com a localização central de
+    cada cidade e tipo de trânsito e as células da grade de entregas (já
+    agregadas no servidor) e retorna o HTML de um mapa com um marcador por
+    localização central e uma camada de calor com todas as entregas. O HTML
+    já pronto é guardado no cache, e a página só precisa enviá-lo ao navegador
+    """
+    # folium é a importação mais pesada das páginas (~2 s): só é carregada
+    # quando o mapa é montado
+    import folium
+    from folium.plugins import HeatMap
+
+    centers, bins = locations
+    map = folium.Map()
+
+    for index, location_info in centers.iterrows():
+        folium.Marker(
+            [
+                location_info['Delivery_location_latitude'],
+                location_info['Delivery_location_longitude']
+            ],
+            popup = '{} - {}'.format(location_info['City'], location_info['Road_traffic_density'])
+        ).add_to(map)
+
+    if not bins.empty:
+        HeatMap( bins[['lat', 'lon', 'count']].to_numpy().tolist(), radius = 12 ).add_to(map)
+        map.fit_bounds( [[bins['lat'].min(), bins['lon'].min()], [bins['lat'].max(), bins['lon'].max()]] )
+
+    return folium.Figure().add_child(map).render()
+
+
+# ----- Visão Restaurantes -----
+
+def distance(cube, fig):
+    """
+    Recebe como parâmetro o cubo de agregados e calcula a distância média entre
+    restaurante e entrega a partir da coluna 'distance', calculada uma única
+    vez na preparação dos dados
+    Parâmetro fig:
+        - True: retorna o gráfico da distância média para o tipo de cidade
+        - False: retorna o valor da distância média geral
+    """
+    if fig:
+        df_aux = avg_distance(cube, ['City'])
+    
+        fig = go.Figure(
+            data = [ go.Pie( labels = df_aux['City'],
+                            values = df_aux['distance'],
+                            pull = [0, 0.1, 0] ) ] 
+        )
+        fig.update_layout(
+        title = {
+            'text': 'Distância Média por Cidade',
+            'y': 0.95,
+            'x': 0.5,
+            'xanchor': 'center',
+            'yanchor': 'top',
+            'font': {'size': 16}
+        }
+    )
+        return fig
+    else:
+        dist_med = avg_distance(cube, []).loc[0, 'distance']
+        dist_med = round(float(dist_med), 2)
+        return dist_med
+
+    
+
+def avg_std_time_graph(cube):
+    """
+    Recebe como parâmetro o cubo de agregados e retorna um gráfico de linha com
+    a média e desvio padrão do tempo de entrega por cidade
+    """
+    df_aux = time_avg_std(cube, ['City'])
+    fig = go.Figure()
+    fig.add_trace( go.Bar( name = 'Control',
+                           x = df_aux['City'],
+                           y = df_aux['avg_time'],
+                          error_y = dict( type = 'data', array = df_aux['std_time'] )) )
+    fig.update_layout(barmode = 'group')
+    return fig
+
+def percentile_time_graph(cube):
+    """
+    Recebe como parâmetro o cubo de agregados e retorna um gráfico de barras com
+    os percentis 50, 90 e 99 do tempo de entrega por cidade
+    """
+    df_aux = time_percentiles(cube, ['City'])
+    fig = go.Figure()
+    for col in ['p50', 'p90', 'p99']:
+        fig.add_trace( go.Bar( name = col, x = df_aux['City'], y = df_aux[col] ) )
+    fig.update_layout(barmode = 'group', yaxis_title = 'Tempo de entrega (min)')
+    return fig
+
+def std_distribution_chart(cube):
+    """
+    Recebe como parâmetro o cubo de agregados e retorna um gráfico de explosão solar com
+    o desvio padrão do tempo de entrega por cidade e trânsito
+    """
+    df_aux = time_avg_std(cube, ['City', 'Road_traffic_density'])
+    # O sunburst monta a hierarquia a partir de texto, não de categorias
+    df_aux[['City', 'Road_traffic_density']] = df_aux[['City', 'Road_traffic_density']].astype(str)
+    fig = px.sunburst(df_aux, path = ['City', 'Road_traffic_density'], values = 'avg_time', color = 'std_time',
+                     color_continuous_scale = 'RdBu_r', color_continuous_midpoint = np.average(df_aux['std_time']))
+    fig.update_layout(
+        title = {
+            'text': 'Distribuição do desvio padrão por<br>cidade e trânsito',
+            'y': 0.95,
+            'x': 0.5,
+            'xanchor': 'center',
+            'yanchor': 'top',
+            'font': {'size': 16}
+        }
+    )
+    return fig
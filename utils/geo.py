@@ -0,0 +1,90 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import numpy as np
+import pandas as pd
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Raio médio da Terra em km, o mesmo usado pela biblioteca haversine
+EARTH_RADIUS_KM = 6371.0088
+
+# Grade do mapa: tamanho inicial da célula em graus (~1 km) e máximo de células
+MAP_CELL_DEGREES = 0.01
+MAP_MAX_BINS = 2000
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def haversine_np(lat1, lon1, lat2, lon2):
+    """
+    Recebe como parâmetro arrays (ou escalares) de latitude e longitude em graus
+    e retorna a distância de grande círculo em km entre os pares de pontos,
+    calculada de forma vetorizada com NumPy
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def add_distance(df1):
+    """
+    Recebe como parâmetro o dataframe limpo e adiciona a coluna 'distance'
+    (float32, em km) com a distância entre o restaurante e o local de entrega
+    """
+    # As coordenadas ficam em float32 no dataframe; o cálculo é feito em float64
+    df1['distance'] = haversine_np(
+        df1['Restaurant_latitude'].to_numpy(dtype = np.float64),
+        df1['Restaurant_longitude'].to_numpy(dtype = np.float64),
+        df1['Delivery_location_latitude'].to_numpy(dtype = np.float64),
+        df1['Delivery_location_longitude'].to_numpy(dtype = np.float64)
+    ).astype(np.float32)
+
+    return df1
+
+def bin_locations(df1, max_bins = MAP_MAX_BINS, cell = MAP_CELL_DEGREES):
+    """
+    Recebe como parâmetro um dataframe e agrupa os locais de entrega em uma
+    grade de células de 'cell' graus, retornando um dataframe com a posição
+    média (lat, lon) e a quantidade de entregas ('count') de cada célula.
+    A grade fica duas vezes mais grossa até caber em max_bins células, de
+    forma que o tamanho do mapa enviado ao navegador é limitado
+    """
+    lat = df1['Delivery_location_latitude'].to_numpy(dtype = np.float64)
+    lon = df1['Delivery_location_longitude'].to_numpy(dtype = np.float64)
+
+    while True:
+        lat_bin = np.floor(lat / cell).astype(np.int64)
+        lon_bin = np.floor(lon / cell).astype(np.int64)
+        key = lat_bin * (1 << 32) + lon_bin
+        if len(pd.unique(key)) <= max_bins:
+            break
+        cell *= 2
+
+    bins = ( pd.DataFrame({'key': key, 'lat': lat, 'lon': lon})
+               .groupby('key')
+               .agg(lat = ('lat', 'mean'), lon = ('lon', 'mean'), count = ('lat', 'size'))
+               .reset_index(drop = True) )
+    return bins
+
+def city_centers(df1):
+    """
+    Recebe como parâmetro um dataframe e retorna a localização central (mediana)
+    das entregas para cada cidade e tipo de trânsito
+    """
+    col = ['City','Road_traffic_density','Delivery_location_latitude','Delivery_location_longitude']
+    col_groupby = ['City', 'Road_traffic_density']
+
+    return df1.loc[:, col].groupby(col_groupby, observed = True).median().reset_index()
@@ -0,0 +1,107 @@
+"""
+Ingestão incremental de novos lotes de pedidos.
+
+Os lotes são arquivos CSV, com o mesmo formato do train.csv, colocados em
+datasets/incoming/. Cada lote novo é limpo com as mesmas regras do dataset
+base (prepare_data), gravado em formato colunar em datasets/batches/ e
+registrado no manifest.json. Os lotes são tratados como somente acréscimo:
+um arquivo já ingerido não é lido de novo.
+
+As páginas percebem a mudança pelo manifest (dataset_version): o dataframe
+e o cubo já carregados recebem apenas os lotes novos. Com --compact, os
+lotes acumulados são incorporados ao arquivo colunar base (compact_batches),
+que volta a ser o único arquivo mapeado pelos processos.
+
+Uso: python -m utils.ingest [--watch SEGUNDOS] [--compact]
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import argparse
+import glob
+import json
+import os
+import time
+
+from utils.data import (DATASET_PATH, batch_path, batches_dir, compact_batches, pa,
+                        prepare_data, read_manifest, read_raw, sort_partitions,
+                        source_version, write_columnar)
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def incoming_dir(path = DATASET_PATH):
+    """
+    Diretório onde os novos lotes em CSV são colocados
+    """
+    return os.path.join(os.path.dirname(path), 'incoming')
+
+def write_manifest(path, manifest):
+    """
+    Grava o manifest dos lotes de forma atômica
+    """
+    manifest_path = os.path.join(batches_dir(path), 'manifest.json')
+    tmp_path = '{}.{}.tmp'.format(manifest_path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent = 2)
+    os.replace(tmp_path, manifest_path)
+
+def ingest_batches(path = DATASET_PATH):
+    """
+    Limpa e grava em formato colunar cada CSV novo de incoming_dir, na ordem
+    dos nomes dos arquivos, e retorna a lista dos lotes ingeridos.
+    O custo é proporcional ao tamanho dos lotes novos, não ao histórico
+    """
+    if pa is None:
+        raise RuntimeError('A ingestão incremental precisa do pacote pyarrow')
+
+    os.makedirs(batches_dir(path), exist_ok = True)
+    manifest = read_manifest(path)
+    done = {entry['name'] for entry in manifest}
+
+    ingested = []
+    for csv_path in sorted(glob.glob(os.path.join(incoming_dir(path), '*.csv'))):
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        if name in done:
+            continue
+
+        # Ordenado pelas partições, para que filter_data pode o lote também
+        df1 = sort_partitions(prepare_data(read_raw(csv_path)))
+        version = source_version(csv_path)
+        write_columnar(df1, batch_path(path, name), version)
+        if not os.path.exists(batch_path(path, name)):
+            raise OSError('Não foi possível gravar o lote {}'.format(name))
+
+        # O manifest é gravado a cada lote, depois do arquivo colunar
+        manifest.append({'name': name, 'rows': len(df1), 'source_version': list(version)})
+        write_manifest(path, manifest)
+        ingested.append(name)
+
+    return ingested
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Ingestão incremental de lotes de pedidos')
+    parser.add_argument('--dataset', default = DATASET_PATH, help = 'CSV base do dataset')
+    parser.add_argument('--watch', type = float, default = 0,
+                        help = 'verifica novos lotes a cada N segundos (0 = executa uma vez)')
+    parser.add_argument('--compact', action = 'store_true',
+                        help = 'incorpora os lotes já ingeridos ao arquivo colunar base e encerra')
+    args = parser.parse_args()
+
+    if args.compact:
+        print('Lotes incorporados:', compact_batches(args.dataset))
+        raise SystemExit
+
+    while True:
+        for name in ingest_batches(args.dataset):
+            print('Lote ingerido:', name)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
@@ -0,0 +1,185 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.data import DATASET_PATH, dataset_version
+from utils.profiling import timed
+from utils.telemetry import observe, record_filters, record_scan, rows_of
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Limite de memória do cache de resultados, em MB (configurável por variável de ambiente)
+MAX_MEMORY_MB = float(os.environ.get('CURRY_CACHE_MAX_MB', 256))
+
+
+# ===================================
+#               Classes
+# ===================================
+
+
+class PanelCache:
+    """
+    Cache LRU, compartilhado por todas as sessões do processo, dos resultados
+    dos gráficos e tabelas para cada combinação de filtros. Quando o tamanho
+    estimado dos resultados passa de max_bytes, os itens usados há mais tempo
+    são descartados. Uma chave em cálculo é calculada uma única vez: quem
+    pede a mesma chave nesse meio tempo (outra sessão ou o aquecimento do
+    cache, utils.warmup) espera pelo resultado
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._pending = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """
+        Retorna o resultado guardado para a chave ou, se não existir, executa
+        compute(), guarda o resultado e o retorna
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key][0]
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = threading.Event()
+                self.misses += 1
+
+        if pending is not None:
+            # Outra thread já está calculando: espera e lê o resultado. Se o
+            # cálculo falhou ou o resultado não coube no cache, calcula aqui
+            pending.wait()
+            with self._lock:
+                if key in self._items:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return self._items[key][0]
+                self.misses += 1
+            return compute()
+
+        # O cálculo acontece fora do lock para não bloquear as outras sessões
+        try:
+            value = compute()
+            size = size_of(value)
+
+            with self._lock:
+                if key not in self._items and size <= self.max_bytes:
+                    self._items[key] = (value, size)
+                    self._bytes += size
+                    while self._bytes > self.max_bytes:
+                        _, (_, old_size) = self._items.popitem(last = False)
+                        self._bytes -= old_size
+                        self.evictions += 1
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+
+        return value
+
+    def clear(self):
+        """
+        Descarta todos os resultados guardados
+        """
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Retorna um dicionário com os contadores do cache
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'items': len(self._items),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def size_of(value):
+    """
+    Estimativa, em bytes, da memória ocupada por um resultado
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index = True, deep = True).sum())
+    try:
+        return len(pickle.dumps(value, protocol = pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+def _freeze(value):
+    """
+    Converte listas e conjuntos em tuplas para que possam fazer parte da chave
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    return value
+
+def filter_key(date_slider, traffic_options, path = DATASET_PATH):
+    """
+    Retorna a parte da chave do cache que identifica o estado dos filtros:
+    (versão do dataset, data limite, conjunto de tipos de trânsito). O
+    estado também vai para a telemetria da execução em andamento, de onde o
+    aquecimento do cache tira as combinações mais usadas
+    """
+    record_filters(date_slider, traffic_options)
+    return (dataset_version(path), date_slider, frozenset(traffic_options))
+
+def cached(func, filtros, data, *params):
+    """
+    Executa func(data, *params) usando o cache de resultados compartilhado.
+    A chave é formada pelo estado dos filtros (filter_key), pelo nome da
+    função e pelos parâmetros extras; o dataframe ou cubo em data não faz
+    parte da chave, pois é determinado pelos filtros. O tempo de cada chamada
+    e as linhas lidas vão para a telemetria (utils.telemetry) e, no modo de
+    perfil, para o resumo da execução (utils.profiling)
+    """
+    key = filtros + (func.__name__, _freeze(params))
+    computed = []
+
+    def compute():
+        computed.append(True)
+        record_scan(func.__name__, rows_of(data))
+        return func(data, *params)
+
+    start = time.perf_counter()
+    with timed('dados', func.__name__):
+        value = panel_cache.get_or_compute(key, compute)
+    observe('curry_panel_seconds', time.perf_counter() - start,
+            function = func.__name__, cache = 'miss' if computed else 'hit')
+    return value
+
+
+panel_cache = PanelCache(int(MAX_MEMORY_MB * 1024 * 1024))
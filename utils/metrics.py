@@ -0,0 +1,184 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import numpy as np
+import pandas as pd
+
+from utils.cube import distinct_count, order_count
+from utils.stats import group_stats, rollup
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def _courier_stat(df1, stat):
+    """
+    Estatística ('max', 'mean' ou 'p90') do tempo de entrega de cada
+    entregador em cada cidade
+    """
+    grouped = ( df1.loc[:, ['City', 'Delivery_person_ID', 'Time_taken(min)']]
+                   .groupby(['City', 'Delivery_person_ID'], observed = True)['Time_taken(min)'] )
+    if stat == 'p90':
+        return grouped.quantile(0.9)
+    if stat in ('max', 'mean'):
+        return grouped.agg(stat)
+    raise ValueError('Estatística desconhecida: {}'.format(stat))
+
+def _smallest(vals, n):
+    """
+    Posições dos n menores valores de vals, em ordem crescente. O n-ésimo
+    valor é achado por seleção parcial (np.partition); os empates nesse
+    limite ficam com as primeiras posições, para que o resultado não dependa
+    da ordem interna da seleção
+    """
+    if n < len(vals):
+        limite = np.partition(vals, n - 1)[n - 1]
+        menores = np.flatnonzero(vals < limite)
+        empates = np.flatnonzero(vals == limite)[:n - len(menores)]
+        selected = np.concatenate([menores, empates])
+    else:
+        selected = np.arange(len(vals))
+    return selected[np.lexsort((selected, vals[selected]))]
+
+def rank_delivers(df1, k = 10, stat = 'max'):
+    """
+    Recebe como parâmetro um dataframe, a quantidade k de entregadores por
+    cidade e a estatística do tempo de entrega ('max', 'mean' ou 'p90') e
+    retorna uma tupla (mais rápidos, mais lentos) com os k entregadores de
+    cada cidade presente nos dados.
+    A estatística é calculada em um único groupby e, em cada cidade, os k
+    menores e k maiores são escolhidos por seleção parcial, sem ordenar os
+    entregadores pelo tempo. As cidades seguem a ordem das categorias de
+    City e os empates ficam com o menor ID de entregador
+    """
+    per_courier = _courier_stat(df1, stat)
+    values = per_courier.to_numpy()
+
+    # Posições na ordem das categorias de City e, dentro da cidade, de
+    # Delivery_person_ID: os níveis do groupby ficam na ordem de aparição
+    index = per_courier.index
+    cities = pd.Categorical(index.levels[0]).codes[index.codes[0]]
+    couriers = pd.Categorical(index.levels[1]).codes[index.codes[1]]
+    order = np.lexsort((couriers, cities))
+    bounds = np.flatnonzero(np.diff(cities[order])) + 1
+
+    fastest, slowest = [], []
+    for positions in np.split(order, bounds):
+        vals = values[positions]
+        n = min(k, len(vals))
+        if n == 0:
+            continue
+
+        fastest.append(positions[_smallest(vals, n)])
+        slowest.append(positions[_smallest(-vals, n)])
+
+    def _table(parts):
+        positions = np.concatenate(parts) if parts else np.empty(0, dtype = np.int64)
+        return per_courier.iloc[positions].reset_index()
+
+    return _table(fastest), _table(slowest)
+
+def top_deliver(df1, top_asc, k = 10, stat = 'max'):
+    """
+    Recebe como parâmetro um dataframe e a forma de ordenamento da coluna de tempo e
+    retorna um dataframe com os k entregadores de cada cidade ordenados pelo tempo
+    de entrega (True: mais rápidos, False: mais lentos)
+    """
+    df_rapidos, df_lentos = rank_delivers(df1, k, stat)
+    return df_rapidos if top_asc else df_lentos
+
+def rating_by_deliver(df1):
+    """
+    Recebe como parâmetro um dataframe e retorna um dataframe com a avaliação
+    média de cada entregador
+    """
+    table_med_ent = ( df1.loc[:, ['Delivery_person_ID', 'Delivery_person_Ratings']]
+                        .groupby('Delivery_person_ID', observed = True)
+                        .mean()
+                        .reset_index() )
+    return table_med_ent
+
+def rating_avg_std(cube, col):
+    """
+    Recebe como parâmetro o cubo de agregados e o nome de uma coluna (string) e retorna
+    um dataframe com a média e desvio padrão das avaliações organizados pela coluna informada
+    """
+    df_aux = rollup(cube, [col], 'Delivery_person_Ratings')
+    df_med_std = ( df_aux.loc[:, [col, 'mean', 'std']]
+                         .rename(columns = {'mean': 'delivery_mean', 'std': 'delivery_std'}) )
+    return df_med_std
+
+def festival_stat(cube, festival, stat):
+    """
+    Recebe como parâmetro o cubo de agregados e retorna a estatística ('mean' ou 'std')
+    do tempo de entrega quando tem ou não festival ('Yes' ou 'No').
+    Retorna None quando não há pedidos no filtro selecionado
+    """
+    df_aux = rollup(cube, ['Festival'], 'Time_taken(min)')
+    df_aux = df_aux.loc[df_aux['Festival'] == festival, stat]
+    if df_aux.empty:
+        return None
+    tempo = round(float(df_aux.iloc[0]), 2)
+    return tempo
+
+def festival_mean(cube, festival):
+    """
+    Recebe como parâmetro o cubo de agregados e calcula o tempo médio de entrega
+    quando tem ou não festival ('Yes' ou 'No')
+    """
+    return festival_stat(cube, festival, 'mean')
+
+def festival_std(cube, festival):
+    """
+    Recebe como parâmetro o cubo de agregados e calcula o desvio padrão do tempo de entrega
+    quando tem ou não festival ('Yes' ou 'No')
+    """
+    return festival_stat(cube, festival, 'std')
+
+def time_avg_std(cube, dims):
+    """
+    Recebe como parâmetro o cubo de agregados e a lista de dimensões e retorna um
+    dataframe com a média ('avg_time') e o desvio padrão ('std_time') do tempo de entrega
+    """
+    df_aux = rollup(cube, dims, 'Time_taken(min)')
+    df_aux = df_aux.loc[:, dims + ['mean', 'std']].rename(columns = {'mean': 'avg_time', 'std': 'std_time'})
+    return df_aux
+
+def time_percentiles(cube, dims, quantiles = (0.5, 0.9, 0.99)):
+    """
+    Recebe como parâmetro o cubo de agregados, a lista de dimensões (entre dia,
+    trânsito, cidade e semana) e os quantis e retorna um dataframe com os
+    percentis do tempo de entrega ('p50', 'p90', 'p99'), calculados pelos
+    histogramas do cubo
+    """
+    df_aux = group_stats(cube, dims, ['Time_taken(min)'], quantiles)
+    columns = {'Time_taken(min)_p{:g}'.format(q * 100): 'p{:g}'.format(q * 100) for q in quantiles}
+    return df_aux.loc[:, dims + list(columns)].rename(columns = columns)
+
+def orders_by_week_person(cube):
+    """
+    Recebe como parâmetro o cubo de agregados e retorna um dataframe com a
+    quantidade de pedidos por entregador em cada semana ('order_by_delivery'),
+    com os entregadores distintos estimados pelo HyperLogLog do cubo
+    """
+    df_aux1 = order_count(cube, ['week_of_year'])
+    df_aux2 = distinct_count(cube, 'week_of_year')
+
+    # Fazendo a junção dos data frames anteriores
+    df_aux = pd.merge(df_aux1, df_aux2, how = 'inner')
+
+    # Fazendo o calculo
+    df_aux['order_by_delivery'] = df_aux['count'] / df_aux['distinct']
+    return df_aux
+
+def avg_distance(cube, dims):
+    """
+    Recebe como parâmetro o cubo de agregados e a lista de dimensões e retorna
+    um dataframe com a distância média ('distance') entre restaurante e entrega
+    """
+    df_aux = rollup(cube, dims, 'distance')
+    return df_aux.loc[:, dims + ['mean']].rename(columns = {'mean': 'distance'})
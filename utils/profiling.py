@@ -0,0 +1,211 @@
+"""
+Modo de perfil das páginas.
+
+Ligado pela variável de ambiente CURRY_PROFILE=1 (padrão para todas as
+sessões) ou pela opção 'Modo de perfil' da sidebar. Em cada execução da
+página, mede:
+  - cada função de dados executada por utils.memo.cached (resultado
+    calculado ou lido do cache) e os carregamentos marcados com timed()
+  - cada chamada de st.plotly_chart, st.dataframe e components.html (mapa)
+e mostra o resumo em um expander no fim da página. Com 'Gravar perfil',
+a execução inteira também é gravada com cProfile em CURRY_PROFILE_DIR
+(.prof, para pstats ou snakeviz) ou, se o pacote pyinstrument estiver
+instalado e CURRY_PROFILER=pyinstrument, em HTML.
+
+Desligado, o custo é uma leitura de variável local da thread por função de
+dados; as funções do Streamlit só são substituídas na primeira vez que o
+modo é ligado no processo.
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Modo de perfil ligado por padrão para todas as sessões
+PROFILE_ENABLED = os.environ.get('CURRY_PROFILE', '0') == '1'
+
+# Diretório dos perfis gravados e ferramenta usada ('cprofile' ou 'pyinstrument')
+PROFILE_DIR = os.environ.get('CURRY_PROFILE_DIR', './profiles')
+PROFILER = os.environ.get('CURRY_PROFILER', 'cprofile')
+
+# Chamadas de renderização medidas: (módulo, atributo)
+RENDER_CALLS = [('streamlit', 'plotly_chart'), ('streamlit', 'dataframe'),
+                ('streamlit.components.v1', 'html')]
+
+# Cada sessão do Streamlit executa a página em uma thread própria
+_local = threading.local()
+_hooks_lock = threading.Lock()
+_hooks_installed = False
+
+
+# ===================================
+#               Classes
+# ===================================
+
+
+class Profiler:
+    """
+    Tempos de uma execução da página: uma lista de (tipo, nome, segundos) e,
+    opcionalmente, o perfil completo (cProfile ou pyinstrument)
+    """
+
+    def __init__(self, page, record = False):
+        self.page = page
+        self.records = []
+        self.start = time.perf_counter()
+        self.full = None
+
+        if record:
+            if PROFILER == 'pyinstrument' and pyinstrument is not None:
+                self.full = pyinstrument.Profiler()
+                self.full.start()
+            else:
+                import cProfile
+                self.full = cProfile.Profile()
+                self.full.enable()
+
+    def add(self, kind, name, seconds):
+        self.records.append((kind, name, seconds))
+
+    def stop(self):
+        """
+        Encerra a medição e, se o perfil completo estiver ligado, grava o
+        arquivo em PROFILE_DIR e retorna o caminho
+        """
+        self.elapsed = time.perf_counter() - self.start
+        if self.full is None:
+            return None
+
+        os.makedirs(PROFILE_DIR, exist_ok = True)
+        stem = os.path.join(PROFILE_DIR, '{}-{}'.format(self.page, datetime.now().strftime('%Y%m%d-%H%M%S-%f')))
+        if pyinstrument is not None and isinstance(self.full, pyinstrument.Profiler):
+            self.full.stop()
+            path = stem + '.html'
+            with open(path, 'w') as f:
+                f.write(self.full.output_html())
+        else:
+            self.full.disable()
+            path = stem + '.prof'
+            self.full.dump_stats(path)
+        return path
+
+    def summary(self):
+        """
+        Retorna uma lista de (tipo, nome, chamadas, ms), do maior tempo para o menor
+        """
+        totals = defaultdict(lambda: [0, 0.0])
+        for kind, name, seconds in self.records:
+            totals[(kind, name)][0] += 1
+            totals[(kind, name)][1] += seconds
+        rows = [(kind, name, calls, seconds * 1000) for (kind, name), (calls, seconds) in totals.items()]
+        return sorted(rows, key = lambda row: -row[3])
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def current():
+    """
+    Profiler da execução em andamento nesta thread, ou None com o modo desligado
+    """
+    return getattr(_local, 'profiler', None)
+
+def timed(kind, name):
+    """
+    Context manager que mede o bloco no profiler ativo; sem profiler, não faz nada
+    """
+    profiler = current()
+    if profiler is None:
+        return nullcontext()
+    return _measure(profiler, kind, name)
+
+@contextmanager
+def _measure(profiler, kind, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.add(kind, name, time.perf_counter() - start)
+
+def _wrap_render(func, name):
+    """
+    Envolve uma função de renderização para medi-la quando houver profiler ativo
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = current()
+        if profiler is None:
+            return func(*args, **kwargs)
+        with _measure(profiler, 'render', name):
+            return func(*args, **kwargs)
+    return wrapper
+
+def install_hooks():
+    """
+    Substitui, uma vez por processo, as funções de RENDER_CALLS por versões
+    medidas. Só é chamada quando o modo de perfil é ligado
+    """
+    global _hooks_installed
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+        import importlib
+        for module_name, attr in RENDER_CALLS:
+            try:
+                module = importlib.import_module(module_name)
+            except ImportError:
+                continue
+            setattr(module, attr, _wrap_render(getattr(module, attr), attr))
+        _hooks_installed = True
+
+def start_profiling(page, enabled, record = False):
+    """
+    Inicia a medição da execução da página nesta thread e retorna o profiler,
+    ou None com o modo desligado
+    """
+    if not enabled:
+        _local.profiler = None
+        return None
+
+    install_hooks()
+    _local.profiler = Profiler(page, record)
+    return _local.profiler
+
+def finish_profiling(profiler):
+    """
+    Encerra a medição e mostra o resumo da execução em um expander
+    """
+    _local.profiler = None
+    if profiler is None:
+        return
+
+    import streamlit as st
+
+    path = profiler.stop()
+    with st.expander('Perfil desta execução ({:.0f} ms)'.format(profiler.elapsed * 1000)):
+        st.table([{'tipo': kind, 'função': name, 'chamadas': calls, 'ms': round(ms, 1)}
+                  for kind, name, calls, ms in profiler.summary()])
+        if path:
+            st.caption('Perfil completo gravado em {}'.format(path))
@@ -0,0 +1,144 @@
+"""
+Sketches mergeáveis usados pelo cubo de agregados.
+
+HyperLogLog (entregadores distintos)
+    Erro padrão relativo de 1,04 / sqrt(2^HLL_PRECISION): ~1,6% com a
+    precisão 12. A união de sketches (máximo dos registradores) tem o mesmo
+    erro de um sketch construído sobre todas as linhas, de forma que semanas
+    e filtros combinam sketches diários sem voltar às linhas. Para
+    cardinalidades pequenas a estimativa usa linear counting.
+
+Histograma de tempos (percentis do tempo de entrega)
+    Contagens em classes de 1 minuto de 0 a HIST_MAX_MINUTES. Para tempos
+    inteiros dentro da faixa, como os do dataset, os percentis são exatos e
+    iguais aos do pandas (interpolação linear). Valores fracionários são
+    arredondados para o minuto mais próximo (erro máximo de 0,5 minuto) e
+    valores fora da faixa, limitados a ela. A união é a soma das contagens.
+
+A precisão dos dois sketches é conferida por python -m benchmarks.sketches
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import numpy as np
+import pandas as pd
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Precisão do HyperLogLog: 2^12 registradores, erro padrão ~1,6%
+HLL_PRECISION = 12
+
+# Faixa do histograma de tempos, em minutos (classes de 1 minuto)
+HIST_MAX_MINUTES = 120
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def hash_values(values):
+    """
+    Recebe como parâmetro uma Series e retorna os hashes (uint64) de cada valor,
+    estáveis entre processos
+    """
+    return pd.util.hash_pandas_object(values, index = False).to_numpy()
+
+def hll_registers(hashes, groups, n_groups, precision = HLL_PRECISION):
+    """
+    Constrói os registradores de um HyperLogLog para cada grupo.
+    Recebe como parâmetro os hashes (uint64), o código do grupo de cada hash
+    (inteiros de 0 a n_groups - 1) e retorna uma matriz uint8 com uma linha
+    de registradores por grupo
+    """
+    m = 1 << precision
+    width = 64 - precision
+
+    # Os primeiros bits escolhem o registrador, o restante define a posição
+    # do primeiro bit 1 (rho)
+    index = (hashes >> np.uint64(width)).astype(np.int64)
+    rest = hashes & np.uint64((1 << width) - 1)
+    bit_length = np.frexp(rest.astype(np.float64))[1]
+    rho = (width - bit_length + 1).astype(np.uint8)
+
+    registers = np.zeros((n_groups, m), dtype = np.uint8)
+    if len(hashes) == 0:
+        return registers
+
+    # Máximo de rho por (grupo, registrador), sem laço em Python
+    key = np.asarray(groups, dtype = np.int64) * m + index
+    best = pd.Series(rho).groupby(key).max()
+    registers.reshape(-1)[best.index.to_numpy()] = best.to_numpy()
+
+    return registers
+
+def hll_merge(registers):
+    """
+    Une os registradores de vários HyperLogLog (uma linha por sketch) em um só
+    """
+    if len(registers) == 0:
+        return np.zeros(registers.shape[-1], dtype = np.uint8)
+    return registers.max(axis = 0)
+
+def hll_estimate(registers):
+    """
+    Recebe como parâmetro os registradores de um HyperLogLog e retorna a
+    estimativa da quantidade de valores distintos
+    """
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+
+    # Correção para cardinalidades pequenas (linear counting)
+    zeros = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and zeros > 0:
+        estimate = m * np.log(m / zeros)
+
+    return int(round(estimate))
+
+def hist_counts(values, groups, n_groups, max_value = HIST_MAX_MINUTES):
+    """
+    Constrói o histograma de tempos de cada grupo.
+    Recebe como parâmetro os valores, o código do grupo de cada valor
+    (inteiros de 0 a n_groups - 1) e retorna uma matriz uint32 com uma linha
+    de contagens por grupo (coluna i = valores arredondados para i minutos)
+    """
+    width = max_value + 1
+    bins = np.clip(np.rint(np.asarray(values, dtype = np.float64)), 0, max_value).astype(np.int64)
+    key = np.asarray(groups, dtype = np.int64) * width + bins
+
+    counts = np.bincount(key, minlength = n_groups * width)
+    return counts.reshape(n_groups, width).astype(np.uint32)
+
+def hist_merge(counts):
+    """
+    Une os histogramas de vários grupos (uma linha por sketch) em um só
+    """
+    return np.asarray(counts, dtype = np.int64).sum(axis = 0)
+
+def hist_quantile(counts, q):
+    """
+    Recebe como parâmetro um histograma e o quantil (entre 0 e 1) e retorna o
+    valor correspondente, com a mesma interpolação linear do pandas.
+    Retorna NaN para um histograma vazio
+    """
+    cum = np.cumsum(counts)
+    n = cum[-1] if len(cum) else 0
+    if n == 0:
+        return np.nan
+
+    # Posição do quantil nos valores ordenados (começando em 0) e os valores
+    # nas posições vizinhas, encontrados pela contagem acumulada
+    position = (n - 1) * q
+    lower = int(np.floor(position))
+    low_value = np.searchsorted(cum, lower, side = 'right')
+    high_value = np.searchsorted(cum, min(lower + 1, n - 1), side = 'right')
+
+    return float(low_value + (position - lower) * (high_value - low_value))
@@ -0,0 +1,191 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import threading
+
+import numpy as np
+
+from utils.data import DATASET_PATH, Dataset, dataset_version, load_data
+from utils.geo import EARTH_RADIUS_KM, haversine_np
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Tamanho da célula da grade em graus (~5,5 km de latitude)
+CELL_DEGREES = 0.05
+
+# Quilômetros por grau de latitude
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+# Colunas usadas pelos índices espaciais
+SPATIAL_COLUMNS = ['Restaurant_latitude', 'Restaurant_longitude',
+                   'Delivery_location_latitude', 'Delivery_location_longitude']
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+# ===================================
+#               Classes
+# ===================================
+
+
+class GridIndex:
+    """
+    Índice espacial por baldes de uma grade de latitude/longitude.
+    Os pontos ficam ordenados pela chave (linha, coluna) da célula, de forma
+    que cada linha da grade dentro de um raio é um intervalo contíguo,
+    encontrado com busca binária. O filtro final usa a distância haversine
+    """
+
+    def __init__(self, lat, lon, ids = None, cell = CELL_DEGREES):
+        lat = np.asarray(lat, dtype = np.float64)
+        lon = np.asarray(lon, dtype = np.float64)
+        ids = np.arange(len(lat)) if ids is None else np.asarray(ids)
+
+        keys = self._key(self._row(lat, cell), self._col(lon, cell))
+        order = np.argsort(keys, kind = 'stable')
+
+        self.cell = cell
+        self.keys = keys[order]
+        self.lat = lat[order]
+        self.lon = lon[order]
+        self.ids = ids[order]
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def _row(lat, cell):
+        return np.floor(np.asarray(lat) / cell).astype(np.int64)
+
+    @staticmethod
+    def _col(lon, cell):
+        return np.floor(np.asarray(lon) / cell).astype(np.int64)
+
+    @staticmethod
+    def _key(row, col):
+        return row * (1 << 32) + col
+
+    def _candidates(self, lat, lon, radius_km):
+        """
+        Posições (no índice ordenado) dos pontos nas células que cobrem o raio
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        cos_lat = max(np.cos(np.radians(min(abs(lat) + dlat, 90.0))), 1e-6)
+        dlon = min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+
+        row_lo, row_hi = self._row(lat - dlat, self.cell), self._row(lat + dlat, self.cell)
+        col_lo, col_hi = self._col(lon - dlon, self.cell), self._col(lon + dlon, self.cell)
+
+        rows = np.arange(row_lo, row_hi + 1)
+        starts = np.searchsorted(self.keys, self._key(rows, col_lo), side = 'left')
+        ends = np.searchsorted(self.keys, self._key(rows, col_hi), side = 'right')
+
+        if len(starts) == 0:
+            return np.empty(0, dtype = np.int64)
+        return np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+
+    def within(self, lat, lon, radius_km):
+        """
+        Retorna uma tupla (ids, distâncias em km) dos pontos a até radius_km
+        do ponto (lat, lon), ordenados pela distância
+        """
+        pos = self._candidates(lat, lon, radius_km)
+        dist = haversine_np(lat, lon, self.lat[pos], self.lon[pos])
+
+        selected = dist <= radius_km
+        pos, dist = pos[selected], dist[selected]
+        order = np.argsort(dist, kind = 'stable')
+
+        return self.ids[pos[order]], dist[order]
+
+    def nearest(self, lat, lon, k = 5):
+        """
+        Retorna uma tupla (ids, distâncias em km) dos k pontos mais próximos
+        de (lat, lon). O raio de busca começa em uma célula e dobra até conter
+        k pontos; como todo ponto dentro do raio é avaliado, o resultado é exato
+        """
+        k = min(k, len(self))
+        radius = self.cell * KM_PER_DEGREE
+
+        while radius < np.pi * EARTH_RADIUS_KM:
+            ids, dist = self.within(lat, lon, radius)
+            if len(ids) >= k:
+                return ids[:k], dist[:k]
+            radius *= 2
+
+        # Raio maior que meia volta na Terra: compara com todos os pontos
+        dist = haversine_np(lat, lon, self.lat, self.lon)
+        order = np.argsort(dist, kind = 'stable')[:k]
+        return self.ids[order], dist[order]
+
+
+class SpatialIndex:
+    """
+    Índices espaciais do dataset:
+      - restaurants: coordenadas distintas dos restaurantes (ids = linha de 'restaurants')
+      - deliveries: local de entrega de cada pedido (ids = índice do dataframe limpo)
+    """
+
+    def __init__(self, df1):
+        self.restaurants = ( df1.loc[:, ['Restaurant_latitude', 'Restaurant_longitude']]
+                                .drop_duplicates()
+                                .sort_values(['Restaurant_latitude', 'Restaurant_longitude'])
+                                .reset_index(drop = True) )
+        self.restaurant_index = GridIndex(self.restaurants['Restaurant_latitude'],
+                                          self.restaurants['Restaurant_longitude'])
+        self.delivery_index = GridIndex(df1['Delivery_location_latitude'],
+                                        df1['Delivery_location_longitude'],
+                                        ids = df1.index.to_numpy())
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def load_spatial_index(path = DATASET_PATH):
+    """
+    Retorna os índices espaciais do dataset, construídos uma vez por processo
+    e por versão do arquivo, assim como load_data
+    """
+    version = dataset_version(path)
+
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    index = SpatialIndex(load_data(path).to_frame(SPATIAL_COLUMNS))
+
+    with _cache_lock:
+        _cache[path] = (version, index)
+
+    return index
+
+def orders_within(index, df1, lat, lon, radius_km):
+    """
+    Recebe como parâmetro os índices espaciais, o Dataset de load_data (ou
+    um dataframe limpo), um ponto e um raio em km e retorna os pedidos
+    entregues a até radius_km do ponto, com a coluna 'distance_km' até ele
+    """
+    ids, dist = index.delivery_index.within(lat, lon, radius_km)
+    df_aux = df1.rows(ids) if isinstance(df1, Dataset) else df1.loc[ids, :].copy()
+    df_aux['distance_km'] = dist
+    return df_aux
+
+def nearest_restaurants(index, lat, lon, k = 5):
+    """
+    Recebe como parâmetro os índices espaciais, um ponto e k e retorna um
+    dataframe com os k restaurantes mais próximos e a distância até eles
+    """
+    ids, dist = index.restaurant_index.nearest(lat, lon, k)
+    df_aux = index.restaurants.loc[ids, :].reset_index(drop = True)
+    df_aux['distance_km'] = dist
+    return df_aux
@@ -0,0 +1,179 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import numpy as np
+import pandas as pd
+
+from utils.sketches import hist_merge, hist_quantile
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def _stat_columns(measures):
+    """
+    Colunas de estatísticas suficientes das medidas e a forma de combiná-las
+    """
+    funcs = {'count': 'sum'}
+    for measure in measures:
+        funcs[measure + '_sum'] = 'sum'
+        funcs[measure + '_sumsq'] = 'sum'
+        funcs[measure + '_min'] = 'min'
+        funcs[measure + '_max'] = 'max'
+    return funcs
+
+def _aggregate(df, dims, funcs):
+    """
+    Agrega o dataframe por dims com as funções de cada coluna em um único
+    groupby. Com dims vazio, retorna uma linha com o total
+    """
+    if dims:
+        return df.groupby(dims, observed = True).agg(funcs).reset_index()
+    return pd.DataFrame({col: [df[col].agg(func)] for col, func in funcs.items()})
+
+def sufficient_stats(df, dims, measures):
+    """
+    Recebe como parâmetro um dataframe de pedidos, a lista de dimensões e a
+    lista de medidas e retorna, em uma única passada, as estatísticas
+    suficientes de cada grupo: 'count' e, por medida, '<medida>_sum',
+    '<medida>_sumsq', '<medida>_min' e '<medida>_max'
+    """
+    values = df.loc[:, dims].copy()
+    values['count'] = 1
+    for measure in measures:
+        # Somas em float64 ou int64 (as colunas inteiras podem ser int8);
+        # mínimo e máximo mantêm o tipo original da coluna
+        column = df[measure]
+        as_float = column.astype(np.float64)
+        values[measure + '_sum'] = as_float if column.dtype.kind == 'f' else column.astype(np.int64)
+        values[measure + '_sumsq'] = as_float ** 2
+        values[measure + '_min'] = column
+        values[measure + '_max'] = column
+
+    return _aggregate(values, dims, _stat_columns(measures))
+
+def merge_stats(cells, dims, measures):
+    """
+    Recebe como parâmetro células de estatísticas suficientes e reagrega por
+    dims, somando contagens e somas e combinando mínimos e máximos
+    """
+    return _aggregate(cells, dims, _stat_columns(measures))
+
+def finalize_stats(stats, dims, measures):
+    """
+    Converte estatísticas suficientes em count e, por medida, '<medida>_mean',
+    '<medida>_std' (amostral, ddof = 1, como no pandas), '<medida>_min' e '<medida>_max'
+    """
+    result = stats.loc[:, dims].copy()
+    result['count'] = stats['count'].astype(np.int64)
+    count = stats['count'].astype(np.float64)
+
+    for measure in measures:
+        total = stats[measure + '_sum'].astype(np.float64)
+        mean = total / count
+        var = (stats[measure + '_sumsq'] - total * mean) / (count - 1)
+
+        result[measure + '_mean'] = mean
+        result[measure + '_std'] = np.sqrt(var.clip(lower = 0)).where(count > 1)
+        result[measure + '_min'] = stats[measure + '_min']
+        result[measure + '_max'] = stats[measure + '_max']
+
+    return result
+
+def _cube_measures(cube):
+    """
+    Medidas disponíveis nas células do cubo
+    """
+    return [col[:-len('_sumsq')] for col in cube.cells.columns if col.endswith('_sumsq')]
+
+def _quantile_column(measure, q):
+    """
+    Nome da coluna de um quantil, por exemplo 'Time_taken(min)_p90'
+    """
+    return '{}_p{:g}'.format(measure, q * 100)
+
+def _cube_quantiles(cube, dims, measures, quantiles):
+    """
+    Quantis das medidas por dimensões, combinando os histogramas do cubo.
+    As dimensões precisam estar nas chaves dos sketches (dia, trânsito,
+    cidade ou semana)
+    """
+    missing = [col for col in dims if col not in cube.sketch_keys.columns]
+    missing += [measure for measure in measures if measure not in cube.histograms]
+    if missing:
+        raise ValueError('Quantis não disponíveis no cubo para: {}'.format(', '.join(missing)))
+
+    if dims:
+        rows = cube.sketch_keys.groupby(dims, observed = True).indices
+        keys = list(rows.keys())
+        df_aux = pd.DataFrame(keys if len(dims) > 1 else {dims[0]: keys}, columns = dims)
+    else:
+        rows = {None: np.arange(len(cube.sketch_keys))}
+        df_aux = pd.DataFrame(index = [0])
+
+    for measure in measures:
+        merged = [hist_merge(cube.histograms[measure][idx]) for idx in rows.values()]
+        for q in quantiles:
+            df_aux[_quantile_column(measure, q)] = [hist_quantile(counts, q) for counts in merged]
+
+    return df_aux
+
+def group_stats(source, dims, measures = None, quantiles = ()):
+    """
+    Motor único de estatísticas agrupadas. Recebe como parâmetro um cubo de
+    agregados ou um dataframe de pedidos, a lista de dimensões e as medidas
+    (todas as do cubo, se omitidas) e retorna count, mean, std, min e max de
+    cada medida por dimensões, calculados em um único groupby.
+
+    Com um cubo, o resultado de cada conjunto de dimensões é calculado para
+    todas as medidas de uma vez e guardado no próprio cubo, de forma que as
+    chamadas seguintes da mesma renderização (e das seguintes, já que o cubo
+    filtrado fica no cache de resultados) apenas selecionam colunas.
+
+    Quantis podem ser pedidos em quantiles (por exemplo, (0.5, 0.9)) e são
+    retornados como '<medida>_p50', '<medida>_p90'. Com um dataframe são
+    exatos; com o cubo, vêm dos histogramas por dia, trânsito e cidade
+    (apenas para as medidas e dimensões dos sketches)
+    """
+    dims = list(dims)
+
+    if hasattr(source, 'cells'):
+        key = tuple(dims)
+        stats = source.stats_cache.get(key)
+        if stats is None:
+            all_measures = _cube_measures(source)
+            stats = finalize_stats(merge_stats(source.cells, dims, all_measures), dims, all_measures)
+            source.stats_cache[key] = stats
+        measures = _cube_measures(source) if measures is None else list(measures)
+        if quantiles:
+            quantis = _cube_quantiles(source, dims, measures, quantiles)
+            stats = stats.merge(quantis, on = dims, how = 'left') if dims else pd.concat([stats, quantis], axis = 1)
+    else:
+        measures = list(measures or [])
+        stats = finalize_stats(sufficient_stats(source, dims, measures), dims, measures)
+        for q in quantiles:
+            for measure in measures:
+                column = _quantile_column(measure, q)
+                if dims:
+                    values = source.groupby(dims, observed = True)[measure].quantile(q).to_numpy()
+                else:
+                    values = [source[measure].quantile(q)]
+                stats[column] = values
+
+    columns = dims + ['count'] + [col for col in stats.columns
+                                  if col not in dims and col != 'count'
+                                  and any(col.startswith(measure + '_') for measure in measures)]
+    return stats.loc[:, columns]
+
+def rollup(source, dims, measure):
+    """
+    Recebe como parâmetro o cubo (ou um dataframe), a lista de dimensões e o
+    nome de uma medida e retorna um dataframe com count, mean, std, min e max
+    da medida por dimensões. Com dims vazio, retorna uma linha com o total
+    """
+    df_aux = group_stats(source, dims, [measure])
+    return df_aux.rename(columns = {measure + '_' + stat: stat for stat in ['mean', 'std', 'min', 'max']})
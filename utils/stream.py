@@ -0,0 +1,253 @@
+"""
+Leitura em blocos (streaming) de datasets maiores que a memória.
+
+O CSV é lido em blocos de linhas com read_raw(chunksize = ...). Cada bloco
+é limpo com as mesmas regras do dataset base (prepare_data) e em seguida:
+  - unido ao cubo de agregados (build_cube do bloco + merge_cubes), cujo
+    tamanho depende da quantidade de dias, cidades e tipos de trânsito, e
+    não da quantidade de pedidos;
+  - gravado no armazenamento particionado, um arquivo colunar por bloco em
+    cada partição de mês e cidade (<csv>_parts/month=2022-03/City=Urban/).
+
+Só um bloco fica na memória por vez: o pico de memória depende do tamanho
+do bloco, calculado a partir do orçamento CURRY_MEMORY_BUDGET_MB (ver
+chunk_rows_for), e não do tamanho do arquivo. O armazenamento é gravado em
+um diretório temporário e trocado de uma vez só ao final, com um
+_manifest.json que registra a versão do CSV de origem e as linhas de cada
+partição, e com o cubo de agregados resultante (_cube.pkl).
+
+Enquanto o manifest estiver em dia com o CSV, load_cube usa o cubo gravado
+(read_stream_cube) em vez de carregar e agregar o dataset completo. As
+visões por linha (visão geográfica e consultas espaciais) continuam lendo o
+dataframe de load_data: passar essas visões para read_partitions, com os
+meses e cidades dos filtros, está fora do escopo deste módulo.
+
+Uso: python -m utils.stream [--dataset CSV] [--budget MB]
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import argparse
+import json
+import os
+import pickle
+import shutil
+import time
+
+from utils.cube import build_cube, merge_cubes
+from utils.data import (CACHE_FORMAT_VERSION, DATASET_PATH, concat_frames, pa,
+                        prepare_data, read_raw, source_version)
+from utils.telemetry import observe
+
+if pa is not None:
+    import pyarrow.feather as feather
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Orçamento de memória da leitura em blocos, em MB
+MEMORY_BUDGET_MB = float(os.environ.get('CURRY_MEMORY_BUDGET_MB', 256))
+
+# Parte do orçamento reservada ao que não depende do bloco: bibliotecas
+# carregadas na primeira passada, cubo de agregados acumulado (alguns meses
+# de pedidos) e memória retida pelo alocador entre os blocos
+RESERVED_MB = 56
+
+# Linhas lidas para estimar a memória de cada linha do CSV
+SAMPLE_ROWS = 5000
+
+# Memória de trabalho de um bloco em relação ao bloco bruto: leitura,
+# cópias da limpeza, cubo do bloco e união com o cubo acumulado
+CHUNK_OVERHEAD = 4
+
+_MANIFEST = '_manifest.json'
+_CUBE = '_cube.pkl'
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def partitions_dir(path = DATASET_PATH):
+    """
+    Recebe como parâmetro o caminho do CSV e retorna o diretório do
+    armazenamento particionado, salvo ao lado do CSV
+    """
+    return os.path.splitext(path)[0] + '_parts'
+
+def chunk_rows_for(path = DATASET_PATH, budget_mb = MEMORY_BUDGET_MB):
+    """
+    Recebe como parâmetro o caminho do CSV e o orçamento de memória e retorna
+    a quantidade de linhas por bloco: o orçamento menos RESERVED_MB, dividido
+    pela memória de trabalho de cada linha. A memória de cada linha bruta é
+    medida nas primeiras SAMPLE_ROWS linhas do arquivo
+    """
+    sample = read_raw(path, nrows = SAMPLE_ROWS)
+    row_bytes = sample.memory_usage(index = False, deep = True).sum() / max(len(sample), 1)
+    return max(1000, int((budget_mb - RESERVED_MB) * 1024 ** 2 / (row_bytes * CHUNK_OVERHEAD)))
+
+def iter_clean_chunks(path = DATASET_PATH, chunk_rows = None):
+    """
+    Lê o CSV em blocos de chunk_rows linhas e gera cada bloco já limpo
+    (prepare_data). Blocos sem nenhuma linha válida são ignorados
+    """
+    chunk_rows = chunk_rows or chunk_rows_for(path)
+    with read_raw(path, chunksize = chunk_rows) as reader:
+        for chunk in reader:
+            df1 = prepare_data(chunk)
+            if len(df1):
+                yield df1
+
+def partition_path(root, month, city):
+    """
+    Diretório de uma partição (mês no formato 'AAAA-MM' e cidade)
+    """
+    return os.path.join(root, 'month={}'.format(month), 'City={}'.format(city))
+
+def write_partitions(df1, root, part):
+    """
+    Grava o bloco limpo no armazenamento, um arquivo colunar (Feather sem
+    compressão, para permitir memory map) por partição de mês e cidade, e
+    retorna um dicionário partição -> linhas gravadas
+    """
+    months = df1['Order_Date'].dt.strftime('%Y-%m')
+    rows = {}
+    for (month, city), df_aux in df1.groupby([months, 'City'], observed = True, sort = False):
+        directory = partition_path(root, month, city)
+        os.makedirs(directory, exist_ok = True)
+
+        table = pa.Table.from_pandas(df_aux, preserve_index = False)
+        feather.write_feather(table, os.path.join(directory, 'part-{:05d}.feather'.format(part)),
+                              compression = 'uncompressed')
+        rows[os.path.relpath(directory, root)] = len(df_aux)
+    return rows
+
+def stream_dataset(path = DATASET_PATH, budget_mb = MEMORY_BUDGET_MB, chunk_rows = None, write_store = True):
+    """
+    Recebe como parâmetro o caminho do CSV e o orçamento de memória e processa
+    o arquivo em blocos: cada bloco é limpo, unido ao cubo de agregados e,
+    com write_store, gravado no armazenamento particionado, junto com o cubo
+    final (ver read_stream_cube). Retorna uma tupla
+    (cubo, manifest), em que o manifest traz a versão do CSV, o tamanho do
+    bloco e as linhas de cada partição
+    """
+    if write_store and pa is None:
+        raise RuntimeError('O armazenamento particionado precisa do pacote pyarrow')
+
+    start = time.perf_counter()
+    version = source_version(path)
+    chunk_rows = chunk_rows or chunk_rows_for(path, budget_mb)
+
+    root = partitions_dir(path)
+    tmp_root = '{}.{}.tmp'.format(root, os.getpid())
+    if write_store:
+        shutil.rmtree(tmp_root, ignore_errors = True)
+        os.makedirs(tmp_root)
+
+    cube = None
+    partitions = {}
+    total = 0
+    try:
+        for part, df1 in enumerate(iter_clean_chunks(path, chunk_rows)):
+            chunk_cube = build_cube(df1)
+            cube = chunk_cube if cube is None else merge_cubes(cube, chunk_cube)
+            if write_store:
+                for name, rows in write_partitions(df1, tmp_root, part).items():
+                    partitions[name] = partitions.get(name, 0) + rows
+            total += len(df1)
+            del df1, chunk_cube
+
+        manifest = {'format': CACHE_FORMAT_VERSION, 'source_version': list(version),
+                    'chunk_rows': chunk_rows, 'rows': total,
+                    'partitions': dict(sorted(partitions.items()))}
+
+        if write_store:
+            if cube is not None:
+                with open(os.path.join(tmp_root, _CUBE), 'wb') as f:
+                    pickle.dump(cube, f, protocol = pickle.HIGHEST_PROTOCOL)
+            with open(os.path.join(tmp_root, _MANIFEST), 'w') as f:
+                json.dump(manifest, f, indent = 2)
+
+            # Troca do armazenamento: quem já listou as partições anteriores
+            # pode falhar ao abrir um arquivo, mas nunca lê uma mistura das duas
+            old_root = '{}.{}.old'.format(root, os.getpid())
+            if os.path.exists(root):
+                os.replace(root, old_root)
+            os.replace(tmp_root, root)
+            shutil.rmtree(old_root, ignore_errors = True)
+    finally:
+        shutil.rmtree(tmp_root, ignore_errors = True)
+
+    observe('curry_data_load_seconds', time.perf_counter() - start, source = 'stream')
+    return cube, manifest
+
+def read_manifest(path = DATASET_PATH):
+    """
+    Retorna o manifest do armazenamento particionado, ou None quando ele não
+    existe ou foi gerado a partir de outra versão do CSV
+    """
+    manifest_path = os.path.join(partitions_dir(path), _MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != CACHE_FORMAT_VERSION or manifest.get('source_version') != list(source_version(path)):
+        return None
+    return manifest
+
+def read_stream_cube(path = DATASET_PATH):
+    """
+    Retorna o cubo de agregados gravado por stream_dataset, ou None quando o
+    armazenamento não existe ou não está em dia com o CSV. O cubo cobre só o
+    CSV base; os lotes incrementais são unidos por load_cube
+    """
+    if read_manifest(path) is None:
+        return None
+    try:
+        with open(os.path.join(partitions_dir(path), _CUBE), 'rb') as f:
+            return pickle.load(f)
+    except OSError:
+        return None
+
+def read_partitions(path = DATASET_PATH, months = None, cities = None):
+    """
+    Lê do armazenamento particionado só as partições dos meses ('AAAA-MM') e
+    cidades informados (todas, quando omitidos) e retorna o dataframe limpo,
+    ou None quando o armazenamento não está em dia com o CSV ou nenhuma
+    partição foi selecionada
+    """
+    manifest = read_manifest(path)
+    if manifest is None:
+        return None
+
+    root = partitions_dir(path)
+    frames = []
+    for name in manifest['partitions']:
+        month, city = [value.split('=', 1)[1] for value in name.split(os.sep)]
+        if (months is not None and month not in months) or (cities is not None and city not in cities):
+            continue
+        directory = os.path.join(root, name)
+        for file_name in sorted(os.listdir(directory)):
+            frames.append(feather.read_table(os.path.join(directory, file_name)).to_pandas())
+
+    if not frames:
+        return None
+    return concat_frames(frames)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Leitura em blocos do dataset para o armazenamento particionado')
+    parser.add_argument('--dataset', default = DATASET_PATH, help = 'CSV no formato do train.csv')
+    parser.add_argument('--budget', type = float, default = MEMORY_BUDGET_MB, help = 'orçamento de memória em MB')
+    args = parser.parse_args()
+
+    cube, manifest = stream_dataset(args.dataset, args.budget)
+    print('{} linhas em blocos de {}, {} partições em {}'.format(
+        manifest['rows'], manifest['chunk_rows'], len(manifest['partitions']), partitions_dir(args.dataset)))
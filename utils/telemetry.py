@@ -0,0 +1,342 @@
+"""
+Telemetria contínua do dashboard, sem dependências externas.
+
+Métricas mantidas em memória pelo processo:
+    curry_page_run_seconds          latência de cada execução das páginas
+    curry_page_rows_scanned         linhas lidas por execução (dataframe ou células do cubo)
+    curry_data_load_seconds         carregamento do dataset (CSV, colunar ou lotes)
+    curry_cube_build_seconds        construção do cubo de agregados
+    curry_warmup_seconds            aquecimento do cache para um estado dos filtros (utils.warmup)
+    curry_panel_seconds             funções de dados e gráficos, por resultado do cache
+    curry_rows_scanned_total        linhas lidas pelas funções de dados
+    curry_filter_calls_total        filtros da sidebar por partições ou por máscara (utils.data)
+    curry_cache_*                   contadores do cache de resultados (utils.memo)
+    curry_process_*                 memória residente atual e pico do processo
+
+Formas de exportação (ambas opcionais e locais):
+  - CURRY_METRICS_PORT=9464: endpoint /metrics no formato texto do
+    Prometheus, servido em 127.0.0.1 por uma thread do próprio processo
+    (com vários processos, use uma porta por processo). A API de
+    indicadores (utils.api) também responde em /metrics.
+  - CURRY_TELEMETRY_LOG=telemetry.jsonl: uma linha JSON por execução de
+    página, em arquivo com rotação (10 MB x 5 arquivos)
+
+O estado dos filtros de cada execução também é contado (e gravado no log
+JSON): o aquecimento do cache usa as combinações mais frequentes.
+
+Para conferir localmente: python -m benchmarks.scrape_metrics
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+METRICS_PORT = int(os.environ.get('CURRY_METRICS_PORT', 0))
+TELEMETRY_LOG = os.environ.get('CURRY_TELEMETRY_LOG', '')
+
+# Limites dos baldes dos histogramas: segundos e linhas
+SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+ROWS_BUCKETS = [1e3, 1e4, 1e5, 1e6, 1e7, 1e8]
+
+HELP = {
+    'curry_page_run_seconds': 'Latência de cada execução da página',
+    'curry_page_rows_scanned': 'Linhas lidas por execução da página',
+    'curry_data_load_seconds': 'Tempo de carregamento do dataset',
+    'curry_cube_build_seconds': 'Tempo de construção do cubo de agregados',
+    'curry_warmup_seconds': 'Tempo de aquecimento do cache por estado dos filtros',
+    'curry_panel_seconds': 'Tempo das funções de dados e gráficos',
+    'curry_rows_scanned_total': 'Linhas lidas pelas funções de dados',
+    'curry_filter_calls_total': 'Filtros da sidebar aplicados por partições ou por máscara',
+}
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = defaultdict(float)
+_filters = Counter()
+_log_filters = None
+_local = threading.local()
+_exporter = None
+_logger = None
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+def observe(name, value, buckets = SECONDS_BUCKETS, **labels):
+    """
+    Registra um valor no histograma name com os rótulos informados
+    """
+    key = (name, _labels(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': buckets, 'counts': [0] * (len(buckets) + 1),
+                                            'sum': 0.0, 'count': 0}
+        histogram['counts'][bisect_left(buckets, value)] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+def inc(name, value = 1, **labels):
+    """
+    Soma value ao contador name com os rótulos informados
+    """
+    with _lock:
+        _counters[(name, _labels(labels))] += value
+
+def rows_of(data):
+    """
+    Quantidade de linhas lidas por uma função de dados: linhas do dataframe
+    ou células do cubo
+    """
+    cells = getattr(data, 'cells', data)
+    try:
+        return len(cells)
+    except TypeError:
+        return 0
+
+def record_scan(function, rows):
+    """
+    Registra as linhas lidas por uma função de dados, no total do processo e
+    na execução de página em andamento nesta thread
+    """
+    inc('curry_rows_scanned_total', rows, function = function)
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run['rows'] += rows
+
+def record_filters(date_slider, traffic_options):
+    """
+    Guarda o estado dos filtros da execução de página em andamento nesta
+    thread (data limite, tipos de trânsito na ordem selecionada)
+    """
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run['filters'] = (date_slider.strftime('%Y-%m-%d'), tuple(traffic_options))
+
+def _read_log_filters():
+    """
+    Conta os estados dos filtros gravados no log JSON por processos anteriores
+    """
+    counts = Counter()
+    if not TELEMETRY_LOG or not os.path.exists(TELEMETRY_LOG):
+        return counts
+    with open(TELEMETRY_LOG) as f:
+        for line in f:
+            try:
+                date, traffic = json.loads(line)['filters']
+            except (ValueError, KeyError, TypeError):
+                continue
+            counts[(date, tuple(traffic))] += 1
+    return counts
+
+def frequent_filters(n):
+    """
+    Retorna os n estados dos filtros mais frequentes, como uma lista de
+    tuplas (data limite, lista de tipos de trânsito), somando as execuções
+    deste processo e as do log JSON
+    """
+    global _log_filters
+    with _lock:
+        if _log_filters is None:
+            _log_filters = _read_log_filters()
+        counts = _log_filters + _filters
+
+    return [(datetime.strptime(date, '%Y-%m-%d'), list(traffic))
+            for (date, traffic), _ in counts.most_common(n)]
+
+def memory_mb():
+    """
+    Retorna uma tupla (memória residente atual, pico) do processo em MB
+    """
+    current = 0.0
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        pass
+
+    # ru_maxrss é dado em KB no Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else current
+    return current, max(current, peak)
+
+def start_run(page):
+    """
+    Marca o início de uma execução da página nesta thread e inicia, na
+    primeira vez, os exportadores configurados
+    """
+    if METRICS_PORT and _exporter is None:
+        start_exporter(METRICS_PORT)
+    _local.run = {'page': page, 'start': time.perf_counter(), 'rows': 0}
+
+def finish_run():
+    """
+    Registra a latência e as linhas lidas da execução em andamento nesta thread
+    """
+    run = getattr(_local, 'run', None)
+    _local.run = None
+    if run is None:
+        return
+
+    seconds = time.perf_counter() - run['start']
+    observe('curry_page_run_seconds', seconds, page = run['page'])
+    observe('curry_page_rows_scanned', run['rows'], buckets = ROWS_BUCKETS, page = run['page'])
+    filters = run.get('filters')
+    if filters is not None:
+        with _lock:
+            _filters[filters] += 1
+
+    if TELEMETRY_LOG:
+        from utils.memo import panel_cache
+
+        current, peak = memory_mb()
+        json_logger().info(json.dumps({
+            'ts': time.time(),
+            'page': run['page'],
+            'seconds': round(seconds, 6),
+            'rows_scanned': run['rows'],
+            'cache_hit_ratio': round(panel_cache.stats()['hit_ratio'], 4),
+            'rss_mb': round(current, 1),
+            'peak_rss_mb': round(peak, 1),
+            'filters': filters,
+        }))
+
+def json_logger():
+    """
+    Logger das linhas JSON, com rotação do arquivo CURRY_TELEMETRY_LOG
+    """
+    global _logger
+    with _lock:
+        if _logger is None:
+            _logger = logging.getLogger('curry.telemetry')
+            _logger.setLevel(logging.INFO)
+            _logger.propagate = False
+            handler = RotatingFileHandler(TELEMETRY_LOG, maxBytes = 10 * 1024 ** 2, backupCount = 5)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            _logger.addHandler(handler)
+    return _logger
+
+def _format_labels(labels, extra = ()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(key, str(value).replace('"', '\\"')) for key, value in pairs) + '}'
+
+def render_prometheus():
+    """
+    Retorna todas as métricas no formato texto do Prometheus
+    """
+    from utils.memo import panel_cache
+
+    lines = []
+    with _lock:
+        histograms = {key: dict(value, counts = list(value['counts'])) for key, value in _histograms.items()}
+        counters = dict(_counters)
+
+    for name in sorted({name for name, _ in histograms}):
+        lines += ['# HELP {} {}'.format(name, HELP.get(name, name)), '# TYPE {} histogram'.format(name)]
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(histogram['buckets'] + ['+Inf'], histogram['counts']):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(name, _format_labels(labels, [('le', bound)]), cumulative))
+            lines.append('{}_sum{} {}'.format(name, _format_labels(labels), histogram['sum']))
+            lines.append('{}_count{} {}'.format(name, _format_labels(labels), histogram['count']))
+
+    for name in sorted({name for name, _ in counters}):
+        lines += ['# HELP {} {}'.format(name, HELP.get(name, name)), '# TYPE {} counter'.format(name)]
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append('{}{} {}'.format(name, _format_labels(labels), value))
+
+    stats = panel_cache.stats()
+    current, peak = memory_mb()
+    gauges = [
+        ('curry_cache_hits_total', 'counter', stats['hits']),
+        ('curry_cache_misses_total', 'counter', stats['misses']),
+        ('curry_cache_evictions_total', 'counter', stats['evictions']),
+        ('curry_cache_hit_ratio', 'gauge', stats['hit_ratio']),
+        ('curry_cache_items', 'gauge', stats['items']),
+        ('curry_cache_bytes', 'gauge', stats['bytes']),
+        ('curry_process_resident_memory_mb', 'gauge', round(current, 1)),
+        ('curry_process_peak_resident_memory_mb', 'gauge', round(peak, 1)),
+    ]
+    for name, kind, value in gauges:
+        lines += ['# TYPE {} {}'.format(name, kind), '{} {}'.format(name, value)]
+
+    return '\n'.join(lines) + '\n'
+
+def start_exporter(port, host = '127.0.0.1'):
+    """
+    Inicia, uma vez por processo, o endpoint /metrics em uma thread. Se a
+    porta já estiver em uso (outro processo do dashboard), o erro é ignorado
+    e o processo segue sem endpoint
+    """
+    global _exporter
+    with _lock:
+        if _exporter is not None:
+            return _exporter
+        try:
+            _exporter = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError:
+            _exporter = False
+            return None
+        _exporter.daemon_threads = True
+
+    threading.Thread(target = _exporter.serve_forever, name = 'curry-metrics', daemon = True).start()
+    return _exporter
+
+
+# ===================================
+#               Classes
+# ===================================
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Responde GET /metrics com render_prometheus
+    """
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,113 @@
+# ===================================
+#               Importações
+# ===================================
+
+
+import os
+
+import numpy as np
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+# Máximo de pontos enviados ao navegador por gráfico de série temporal
+# (configurável por variável de ambiente)
+SERIES_MAX_POINTS = int(os.environ.get('CURRY_SERIES_MAX_POINTS', 500))
+
+# A partir desta quantidade de pontos, as linhas são desenhadas com WebGL
+WEBGL_MIN_POINTS = 200
+
+# Granularidades em ordem crescente: código do pandas e nome usado nos títulos
+GRANULARITIES = [('D', 'Dia'), ('W', 'Semana'), ('M', 'Mês')]
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def auto_granularity(dates, max_points = SERIES_MAX_POINTS, minimum = 'D'):
+    """
+    Recebe como parâmetro as datas da série e retorna o código da menor
+    granularidade ('D', 'W' ou 'M'), a partir de minimum, em que o período
+    selecionado cabe em max_points pontos
+    """
+    codes = [code for code, _ in GRANULARITIES]
+    codes = codes[codes.index(minimum):]
+
+    for code in codes:
+        if dates.dt.to_period(code).nunique() <= max_points:
+            return code
+    return codes[-1]
+
+def granularity_name(code):
+    """
+    Nome da granularidade para os títulos ('Dia', 'Semana' ou 'Mês')
+    """
+    return dict(GRANULARITIES)[code]
+
+def period_sum(df, date_col, value_col, code):
+    """
+    Recebe como parâmetro um dataframe com uma coluna de datas e uma de valores
+    e retorna a soma dos valores por período ('D', 'W' ou 'M'), com a data de
+    início de cada período
+    """
+    periods = df[date_col].dt.to_period(code).dt.start_time.rename(date_col)
+    return df.groupby(periods)[value_col].sum().reset_index()
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: recebe como parâmetro os arrays x e y de
+    uma série e retorna as posições dos n_out pontos que preservam a forma
+    visual da série (o primeiro e o último pontos são sempre mantidos)
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype = np.float64)
+    y = np.asarray(y, dtype = np.float64)
+
+    # n_out - 2 baldes entre o primeiro e o último ponto
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.int64)
+    selected = np.empty(n_out, dtype = np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+
+        # Ponto do balde que forma o maior triângulo com o ponto escolhido
+        # no balde anterior e a média do próximo balde
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+def downsample(df, x, y, max_points = SERIES_MAX_POINTS):
+    """
+    Recebe como parâmetro um dataframe ordenado por x e retorna no máximo
+    max_points linhas, escolhidas por LTTB. Datas em x são tratadas como números
+    """
+    if len(df) <= max_points:
+        return df
+
+    x_values = df[x].to_numpy()
+    if np.issubdtype(x_values.dtype, np.datetime64):
+        x_values = x_values.astype('datetime64[ns]').astype(np.int64)
+    elif not np.issubdtype(x_values.dtype, np.number):
+        x_values = np.arange(len(df))
+
+    return df.iloc[lttb(x_values, df[y].to_numpy(), max_points)]
+
+def render_mode(n_points):
+    """
+    Modo de desenho das linhas do plotly.express: WebGL para séries longas
+    """
+    return 'webgl' if n_points >= WEBGL_MIN_POINTS else 'svg'
@@ -0,0 +1,173 @@
+"""
+Aquecimento do cache de resultados (utils.memo) em segundo plano.
+
+A maior parte das visitas chega com os filtros padrão da sidebar (data
+limite 2022-03-05 e os quatro tipos de trânsito). Uma thread do processo,
+iniciada pela primeira página executada, calcula para esse estado dos
+filtros, e para os CURRY_WARMUP_TOP estados mais frequentes na telemetria
+(utils.telemetry), os mesmos resultados que as três páginas pedem ao cache:
+o cubo e as linhas filtradas, as tabelas, os gráficos do plotly e o HTML do
+mapa. A primeira visita passa a ser só leitura do cache.
+
+A cada CURRY_WARMUP_INTERVAL segundos a thread confere a versão do dataset
+(novos lotes, CSV alterado) e os estados mais frequentes, e calcula só o que
+ainda não foi aquecido. Uma sessão que pede um resultado em cálculo pela
+thread espera por ele em vez de calculá-lo de novo.
+
+Com CURRY_WARMUP=0, o aquecimento fica desligado.
+"""
+
+# ===================================
+#               Importações
+# ===================================
+
+
+import logging
+import os
+import threading
+import time
+
+from utils.api import DEFAULT_DATE, DEFAULT_TRAFFIC
+from utils.cube import distinct_count, filter_cube, load_cube
+from utils.data import DATASET_PATH, dataset_version, filter_data, load_data
+from utils.figures import (avg_std_time_graph, distance, map_html, order_by_week, order_by_week_person,
+                           order_metric, percentile_time_graph, std_distribution_chart,
+                           traffic_order_share_pie, traffic_order_share_scatter)
+from utils.geo import bin_locations, city_centers
+from utils.memo import cached, filter_key
+from utils.metrics import (festival_mean, festival_std, rank_delivers, rating_avg_std, rating_by_deliver,
+                           time_avg_std, time_percentiles)
+from utils.telemetry import frequent_filters, observe
+
+
+# ===================================
+#               Constantes
+# ===================================
+
+
+WARMUP_ENABLED = os.environ.get('CURRY_WARMUP', '1') != '0'
+WARMUP_TOP = int(os.environ.get('CURRY_WARMUP_TOP', 3))
+WARMUP_INTERVAL = float(os.environ.get('CURRY_WARMUP_INTERVAL', 30))
+
+# Resultados calculados sobre o cubo filtrado: (função, parâmetros), nos
+# mesmos termos das chamadas a cached() das páginas
+CUBE_PANELS = [
+    # Visão Empresa
+    (order_metric, ()),
+    (traffic_order_share_pie, ()),
+    (traffic_order_share_scatter, ()),
+    (order_by_week, ()),
+    (order_by_week_person, ()),
+    # Visão Entregadores
+    (rating_avg_std, ('Road_traffic_density',)),
+    (rating_avg_std, ('Weatherconditions',)),
+    # Visão Restaurantes
+    (distinct_count, ()),
+    (distance, (False,)),
+    (distance, (True,)),
+    (festival_mean, ('Yes',)),
+    (festival_std, ('Yes',)),
+    (festival_mean, ('No',)),
+    (festival_std, ('No',)),
+    (avg_std_time_graph, ()),
+    (time_avg_std, (['City', 'Type_of_order'],)),
+    (percentile_time_graph, ()),
+    (time_percentiles, (['City', 'Road_traffic_density'],)),
+    (std_distribution_chart, ()),
+]
+
+# Resultados calculados sobre as linhas filtradas (Visão Entregadores, com
+# os valores padrão dos controles da página)
+ROW_PANELS = [
+    (rating_by_deliver, ()),
+    (rank_delivers, (10, 'max')),
+]
+
+_thread = None
+_thread_lock = threading.Lock()
+
+
+# ===================================
+#               Funções
+# ===================================
+
+
+def warm_filters(date_slider, traffic_options, path = DATASET_PATH):
+    """
+    Recebe como parâmetro um estado dos filtros e calcula, pelo cache de
+    resultados, tudo o que as páginas pedem para esse estado. Retorna o
+    tempo gasto em segundos
+    """
+    start = time.perf_counter()
+    filtros = filter_key(date_slider, traffic_options, path)
+
+    cube = cached(filter_cube, filtros, load_cube(path), date_slider, traffic_options)
+    for func, params in CUBE_PANELS:
+        cached(func, filtros, cube, *params)
+
+    df1 = cached(filter_data, filtros, load_data(path), date_slider, traffic_options)
+    for func, params in ROW_PANELS:
+        cached(func, filtros, df1, *params)
+
+    # Mapa da Visão Geográfica: localizações agregadas e o HTML pronto
+    centers = cached(city_centers, filtros, df1)
+    bins = cached(bin_locations, filtros, df1)
+    cached(map_html, filtros, (centers, bins))
+
+    elapsed = time.perf_counter() - start
+    observe('curry_warmup_seconds', elapsed)
+    return elapsed
+
+def warmup_targets(top = WARMUP_TOP):
+    """
+    Estados dos filtros a aquecer: o padrão da sidebar seguido dos top mais
+    frequentes na telemetria, sem repetição
+    """
+    targets = [(DEFAULT_DATE, list(DEFAULT_TRAFFIC))]
+    for date_slider, traffic_options in frequent_filters(top):
+        if (date_slider, traffic_options) not in targets:
+            targets.append((date_slider, traffic_options))
+    return targets
+
+def warmup_loop(path = DATASET_PATH, interval = WARMUP_INTERVAL):
+    """
+    Laço da thread de aquecimento: aquece cada estado dos filtros uma vez por
+    versão do dataset e confere novas versões e estados a cada interval segundos
+    """
+    warmed = set()
+    while True:
+        try:
+            version = dataset_version(path)
+        except OSError:
+            time.sleep(interval)
+            continue
+
+        for date_slider, traffic_options in warmup_targets():
+            key = (version, date_slider, tuple(traffic_options))
+            if key in warmed:
+                continue
+            try:
+                warm_filters(date_slider, traffic_options, path)
+            except Exception:
+                # Um erro no aquecimento não pode derrubar a thread: o estado
+                # é tentado de novo na próxima volta
+                logging.getLogger('curry.warmup').exception('Falha ao aquecer o cache')
+                continue
+            warmed.add(key)
+        warmed = {key for key in warmed if key[0] == version}
+        time.sleep(interval)
+
+def start_warmup(path = DATASET_PATH):
+    """
+    Inicia, uma vez por processo, a thread de aquecimento do cache. Não
+    espera o aquecimento: a página segue normalmente
+    """
+    global _thread
+    if not WARMUP_ENABLED:
+        return None
+
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target = warmup_loop, args = (path,), name = 'curry-warmup', daemon = True)
+            _thread.start()
+    return _thread